@@ -0,0 +1,163 @@
+import csv
+import io
+import sys
+from dataclasses import dataclass, field
+
+
+def enum_name(value) -> str:
+    """Returns the interned name of a Google Ads enum so repeated values share one string."""
+    if value is None:
+        return ""
+    return sys.intern(getattr(value, "name", str(value)))
+
+
+def micros_to_gbp(micros):
+    return micros / 1_000_000 if micros else None
+
+
+@dataclass(slots=True)
+class Keyword:
+    text: str
+    match_type: str
+    status: str
+    cpc_bid_micros: int = 0
+
+
+@dataclass(slots=True)
+class Ad:
+    id: int
+    status: str
+    final_urls: tuple
+    headlines: tuple
+    descriptions: tuple
+
+
+@dataclass(slots=True)
+class AdGroup:
+    id: int
+    name: str
+    status: str
+    ads: list = field(default_factory=list)
+    keywords: list = field(default_factory=list)
+    negative_keywords: list = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class Campaign:
+    id: int
+    name: str
+    budget: float
+    status: str
+    serving_status: str
+    ad_groups: dict = field(default_factory=dict)
+    negative_keywords: list = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class Account:
+    campaigns: dict = field(default_factory=dict)
+
+    def ad_groups(self):
+        for campaign in self.campaigns.values():
+            yield from campaign.ad_groups.values()
+
+
+# ----------------- Building from GoogleAdsRow results -----------------
+
+def add_ad_group_row(account: Account, row, budget: float = None) -> AdGroup:
+    c = row.campaign
+    ag = row.ad_group
+    campaign = account.campaigns.get(c.id)
+    if campaign is None:
+        campaign = account.campaigns[c.id] = Campaign(
+            id=c.id,
+            name=c.name,
+            budget=budget,
+            status=enum_name(c.status),
+            serving_status=enum_name(c.serving_status),
+        )
+    ad_group = campaign.ad_groups.get(ag.id)
+    if ad_group is None:
+        ad_group = campaign.ad_groups[ag.id] = AdGroup(id=ag.id, name=ag.name, status=enum_name(ag.status))
+    return ad_group
+
+
+def ad_from_row(row) -> Ad:
+    ad = row.ad_group_ad.ad
+    rsa = ad.responsive_search_ad
+    return Ad(
+        id=ad.id,
+        status=enum_name(row.ad_group_ad.status),
+        final_urls=tuple(ad.final_urls),
+        headlines=tuple(h.text for h in rsa.headlines),
+        descriptions=tuple(d.text for d in rsa.descriptions),
+    )
+
+
+def keyword_from_criterion(criterion) -> Keyword:
+    return Keyword(
+        text=criterion.keyword.text,
+        match_type=enum_name(criterion.keyword.match_type),
+        status=enum_name(criterion.status),
+        cpc_bid_micros=getattr(criterion, "cpc_bid_micros", 0),
+    )
+
+
+# ----------------- Compact serialization for the LLM -----------------
+
+def csv_table(header: list, rows) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(header)
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+def _negatives(keywords: list) -> str:
+    return "; ".join(f"{kw.text} [{kw.match_type}]" for kw in keywords)
+
+
+def to_compact_text(account: Account) -> str:
+    """
+    Serializes the account as one header line per campaign/ad group followed by
+    CSV tables of ads and keywords, so field names are written once per table
+    rather than once per keyword.
+    """
+    if not account.campaigns:
+        return "No campaigns found."
+
+    parts = []
+    for campaign in account.campaigns.values():
+        budget = f"£{campaign.budget}/day" if campaign.budget is not None else "unknown"
+        parts.append(
+            f"# Campaign {campaign.id}: {campaign.name} | status={campaign.status} "
+            f"serving={campaign.serving_status} budget={budget}\n"
+        )
+        if campaign.negative_keywords:
+            parts.append(f"campaign negative keywords: {_negatives(campaign.negative_keywords)}\n")
+
+        for ad_group in campaign.ad_groups.values():
+            parts.append(f"## Ad group {ad_group.id}: {ad_group.name} | status={ad_group.status}\n")
+            if ad_group.ads:
+                parts.append("ads:\n")
+                parts.append(csv_table(
+                    ["id", "status", "final_urls", "headlines", "descriptions"],
+                    (
+                        (ad.id, ad.status, " ".join(ad.final_urls), " | ".join(ad.headlines), " | ".join(ad.descriptions))
+                        for ad in ad_group.ads
+                    ),
+                ))
+            if ad_group.keywords:
+                parts.append("keywords:\n")
+                parts.append(csv_table(
+                    ["text", "match_type", "status", "cpc_bid_gbp"],
+                    (
+                        (kw.text, kw.match_type, kw.status, micros_to_gbp(kw.cpc_bid_micros) or "")
+                        for kw in ad_group.keywords
+                    ),
+                ))
+            if ad_group.negative_keywords:
+                parts.append(f"negative keywords: {_negatives(ad_group.negative_keywords)}\n")
+        parts.append("\n")
+
+    return "".join(parts)
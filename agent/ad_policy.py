@@ -0,0 +1,167 @@
+from llama_index.core.llms import ChatMessage
+import json
+import re
+import unicodedata
+
+# Responsive Search Ad limits. Lengths match the limits given to the LLM in the prompts,
+# which are stricter than the API's (30/90) to leave room for sanitizing.
+LIMITS = {
+    "headlines": {"max_chars": 28, "min_count": 3, "max_count": 15},
+    "descriptions": {"max_chars": 80, "min_count": 2, "max_count": 4},
+}
+
+REPEATED_PUNCTUATION = re.compile(r"([!?.,;:*#$%&@~^+=|/\\-])\1+")
+SHOUTING = re.compile(r"\b[A-Z]{5,}\b")
+# Symbol characters Google Ads accepts in ad text, common in brand names and product copy
+ALLOWED_SYMBOLS = set("®™©℠°")
+
+
+class AdPolicyError(ValueError):
+    pass
+
+
+def fix_asset(text: str, kind: str) -> str:
+    """Applies the fixes that don't need the LLM: symbols, repeated punctuation and exclamation marks."""
+    text = "".join(ch for ch in str(text) if not _prohibited(ch))
+    text = REPEATED_PUNCTUATION.sub(r"\1", text)
+    if kind == "headlines":
+        text = text.replace("!", "")
+    else:
+        # Descriptions may have a single exclamation mark
+        first = text.find("!")
+        if first != -1:
+            text = text[:first + 1] + text[first + 1:].replace("!", "")
+    return " ".join(text.split())
+
+
+def asset_problems(text: str, kind: str) -> list:
+    """Returns the policy problems left in an asset, empty if it is valid."""
+    problems = []
+    max_chars = LIMITS[kind]["max_chars"]
+    if not text:
+        problems.append("empty")
+    if len(text) > max_chars:
+        problems.append(f"{len(text)} characters, the maximum is {max_chars}")
+    if any(_prohibited(ch) for ch in text):
+        problems.append("contains emoji or prohibited symbols")
+    if REPEATED_PUNCTUATION.search(text):
+        problems.append("repeated punctuation")
+    if kind == "headlines" and "!" in text:
+        problems.append("exclamation marks are not allowed in headlines")
+    return problems
+
+
+def asset_warnings(text: str) -> list:
+    """
+    Things that may break policy but may also be right, e.g. all-caps words that could be
+    brand names or acronyms (NVIDIA, ASICS). The LLM decides; they never fail an ad.
+    """
+    words = SHOUTING.findall(text)
+    if not words:
+        return []
+    return [f"all-caps {', '.join(words)}: keep as is only if it is a brand name or acronym, otherwise use normal capitalization"]
+
+
+def _prohibited(ch: str) -> bool:
+    # Emoji, pictographs, bullets and other symbol/control characters Google Ads disapproves
+    if ch in ALLOWED_SYMBOLS:
+        return False
+    return unicodedata.category(ch) in ("So", "Sk", "Co", "Cs", "Cn", "Cc") or ch in "•★☆✓✔►▶◆■●"
+
+
+def check_ads(ads: list, warnings: bool = True):
+    """
+    Applies local fixes to each ad's {"headlines": [...], "descriptions": [...]} and
+    returns (fixed ads, issues). Issues are the assets the LLM still has to rewrite,
+    plus placeholders for assets needed to reach the minimum count. With warnings, assets
+    the LLM should only look at (see asset_warnings) are included too.
+    """
+    fixed_ads = []
+    issues = []
+    for a, ad in enumerate(ads):
+        fixed = dict(ad)
+        for kind, limits in LIMITS.items():
+            assets = []
+            seen = set()
+            for text in ad.get(kind) or []:
+                text = fix_asset(text, kind)
+                # Duplicate assets are rejected by the API
+                if text and text.lower() not in seen:
+                    seen.add(text.lower())
+                    assets.append(text)
+            # Keep the valid assets first when there are too many
+            assets.sort(key=lambda t: bool(asset_problems(t, kind)))
+            assets = assets[:limits["max_count"]]
+            for i, text in enumerate(assets):
+                problems = asset_problems(text, kind)
+                if warnings:
+                    problems += asset_warnings(text)
+                if problems:
+                    issues.append({"id": f"{a}.{kind}.{i}", "type": kind[:-1], "text": text, "max_chars": limits["max_chars"], "problems": problems})
+            for i in range(len(assets), limits["min_count"]):
+                issues.append({"id": f"{a}.{kind}.{i}", "type": kind[:-1], "text": "", "max_chars": limits["max_chars"], "problems": ["missing, write a new one"]})
+                assets.append("")
+            fixed[kind] = assets
+        fixed_ads.append(fixed)
+    return fixed_ads, issues
+
+
+def _ad_context(ad: dict) -> str:
+    return json.dumps({kind: [t for t in ad[kind] if t] for kind in LIMITS})
+
+
+async def _llm_repair(llm, ads: list, issues: list) -> dict:
+    """One call for every invalid asset across all ads. Returns id -> rewritten text."""
+    context = {str(a): _ad_context(ad) for a, ad in enumerate(ads) if any(i["id"].startswith(f"{a}.") for i in issues)}
+    messages = [
+        ChatMessage(role="system", content=(
+            "You fix Google Ads Responsive Search Ad assets that break Google Ads policy. "
+            "Rewrite each asset so it keeps its meaning but is within max_chars (including spaces), "
+            "has no emoji or special symbols, no repeated punctuation, no exclamation marks in headlines "
+            "and is not a duplicate of the other assets in its ad. For missing assets write a new one that fits the ad. "
+            "All-caps words that are brand names or acronyms stay as they are; if an asset needs no change, return it unchanged. "
+            'Respond ONLY with a JSON object mapping each asset "id" to its new text.'
+        )),
+        ChatMessage(role="user", content=json.dumps({"ads": context, "assets": issues})),
+    ]
+    response = await llm.achat(messages)
+    text = response.message.content or ""
+    match = re.search(r"\{.*\}", text, re.DOTALL)
+    if not match:
+        return {}
+    try:
+        repaired = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return {}
+    return {str(k): str(v) for k, v in repaired.items()} if isinstance(repaired, dict) else {}
+
+
+async def enforce_ad_policy(ads: list, llm) -> list:
+    """
+    Validates and repairs ads before they are sent to Google Ads. Local fixes are applied
+    first and only the assets still invalid, or needing a judgement call (asset_warnings),
+    are sent to the LLM, in one batched call.
+    Raises AdPolicyError if an ad still can't be made valid.
+    """
+    ads, issues = check_ads(ads)
+    if not issues:
+        return ads
+
+    repaired = await _llm_repair(llm, ads, issues)
+    for issue in issues:
+        a, kind, i = issue["id"].split(".")
+        ads[int(a)][kind][int(i)] = repaired.get(issue["id"], issue["text"])
+
+    ads, issues = check_ads(ads, warnings=False)
+    errors = []
+    for a, ad in enumerate(ads):
+        for kind, limits in LIMITS.items():
+            bad = {int(i["id"].split(".")[2]) for i in issues if i["id"].startswith(f"{a}.{kind}.")}
+            valid = [t for n, t in enumerate(ad[kind]) if n not in bad]
+            # Assets the LLM couldn't fix are dropped when the ad has enough without them
+            if len(valid) < limits["min_count"]:
+                errors.extend(f"ad {a + 1} {kind[:-1]} {i['text']!r}: {', '.join(i['problems'])}" for i in issues if i["id"].startswith(f"{a}.{kind}."))
+            ad[kind] = valid
+    if errors:
+        raise AdPolicyError("Ads still break Google Ads policy after repair:\n" + "\n".join(errors))
+    return ads
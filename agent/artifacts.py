@@ -0,0 +1,73 @@
+from dataclasses import dataclass
+
+SUMMARY_CHARS = 160
+
+
+@dataclass(slots=True)
+class Artifact:
+    id: str
+    kind: str
+    name: str
+    path: str
+    # Human readable, e.g. "12000 chars" or "850 keywords"
+    size: str
+    summary: str
+
+    def describe(self) -> str:
+        return f"{self.id} | {self.kind} | {self.name} | {self.size} | {self.summary}"
+
+
+class ArtifactRegistry:
+    """
+    The files a session has produced or received (uploads, keyword reports, idea files,
+    saved tool outputs). Each is recorded once and referred to by ID, so the agent can
+    fetch the content when it needs it instead of it being copied into every prompt.
+    """
+
+    def __init__(self):
+        self._artifacts = {}
+        self._by_path = {}
+
+    def add(self, kind: str, path: str, name: str, size: str, summary: str) -> Artifact:
+        artifact_id = self._by_path.get(path)
+        if artifact_id is None:
+            artifact_id = self._by_path[path] = f"a{len(self._artifacts) + 1}"
+        # Re-registering a path (e.g. a rewritten ideas file) updates it under the same ID
+        artifact = self._artifacts[artifact_id] = Artifact(
+            id=artifact_id, kind=kind, name=name, path=path, size=size, summary=summary,
+        )
+        return artifact
+
+    def get(self, artifact_id: str) -> Artifact:
+        return self._artifacts.get(artifact_id.strip())
+
+    def list(self, *kinds) -> list:
+        return [a for a in self._artifacts.values() if not kinds or a.kind in kinds]
+
+
+def summarize_text(text: str) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= SUMMARY_CHARS else f"{text[:SUMMARY_CHARS]}..."
+
+
+def add_text(registry: ArtifactRegistry, kind: str, path: str, name: str, text: str) -> Artifact:
+    return registry.add(kind, path, name, f"{len(text)} chars", summarize_text(text))
+
+
+# session_id -> ArtifactRegistry
+_registries = {}
+
+
+def get_registry(session_id: str) -> ArtifactRegistry:
+    registry = _registries.get(session_id)
+    if registry is None:
+        registry = _registries[session_id] = ArtifactRegistry()
+    return registry
+
+
+def drop_registry(session_id: str):
+    _registries.pop(session_id, None)
+
+
+async def registry_for(ctx) -> ArtifactRegistry:
+    return get_registry(await ctx.store.get("session_id"))
@@ -0,0 +1,240 @@
+from llama_index.core.llms import ChatMessage
+from llama_index.core.workflow import Event
+from dataclasses import dataclass
+import asyncio
+import math
+import os
+import re
+from . import prompts
+
+# Large requests are split into concurrent Bedrock calls of at most this many ideas each.
+IDEAS_PER_SHARD = int(os.getenv("IDEAS_PER_SHARD", 8))
+# Max idea shards generated at the same time for one request.
+MAX_CONCURRENT_IDEA_SHARDS = int(os.getenv("MAX_CONCURRENT_IDEA_SHARDS", 4))
+
+IDEA_HEADER = re.compile(r"^#\s*Idea\b.*$", re.MULTILINE)
+IDEA_TITLE = re.compile(r"^#\s*Idea\s*#?\s*\d*\s*:?\s*(.+?)\s*$", re.MULTILINE)
+SEPARATOR = re.compile(r"^\s*---\s*$", re.MULTILINE)
+BUDGET = re.compile(r"Budget:\s*£?(\d+(?:\.\d+)?)(?:\s*/\s*day)?", re.IGNORECASE)
+
+DEFAULT_DAILY_BUDGET = 5.0
+DEFAULT_KEYWORD_CPC = 1_500_000
+
+
+class CampaignIdeaProgress(Event):
+    """Streamed to the user while campaign ideas are being generated."""
+    message: str
+
+
+class IdeaStreamParser:
+    """
+    Splits a streamed campaign ideas response into complete "# Idea" blocks as soon
+    as each one ends, i.e. at its "---" separator or at the next idea's header.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+
+    def feed(self, delta: str) -> list:
+        self._buffer += delta
+        blocks = []
+        while True:
+            # Only split on complete lines; the last line may still be streaming
+            complete, newline, _ = self._buffer.rpartition("\n")
+            if not newline:
+                break
+            end = self._find_block_end(complete)
+            if end is None:
+                break
+            block, self._buffer = self._buffer[:end[0]], self._buffer[end[1]:]
+            block = self._trim(block)
+            if block:
+                blocks.append(block)
+        return blocks
+
+    def close(self) -> list:
+        block, self._buffer = self._trim(self._buffer), ""
+        return [block] if block else []
+
+    @staticmethod
+    def _trim(block: str) -> str:
+        """Drops any preamble before the idea header; blocks without a header are discarded."""
+        header = IDEA_HEADER.search(block)
+        return block[header.start():].strip() if header else ""
+
+    @staticmethod
+    def _find_block_end(text: str):
+        """Returns (block end, next block start) for the first finished block in text, if any."""
+        separator = SEPARATOR.search(text)
+        headers = list(IDEA_HEADER.finditer(text, 0, separator.start() if separator else len(text)))
+        if len(headers) > 1:
+            # The model started the next idea without a separator
+            return headers[1].start(), headers[1].start()
+        if separator:
+            return separator.start(), separator.end()
+        return None
+
+
+def idea_title(block: str) -> str:
+    match = IDEA_TITLE.search(block)
+    return match.group(1) if match else block.strip().splitlines()[0]
+
+
+def renumber_idea(block: str, number: int) -> str:
+    """Rewrites the block's header as "# Idea #<number>: <title>"."""
+    return IDEA_TITLE.sub(lambda m: f"# Idea #{number}: {m.group(1)}", block, count=1)
+
+
+def idea_summary(block: str) -> str:
+    """One line per idea for the agent: title, budget and the first line of the summary."""
+    budget = re.search(r"Budget:\s*(.+)", block)
+    summary = re.search(r"Summary:\s*\n?\s*(.+)", block)
+    parts = [idea_title(block)]
+    if budget:
+        parts.append(budget.group(1).strip())
+    if summary:
+        parts.append(summary.group(1).strip())
+    return " | ".join(parts)
+
+
+def idea_key(block: str) -> str:
+    """Campaign name used to de-duplicate ideas from different shards."""
+    return " ".join(re.sub(r"[^\w\s]", " ", idea_title(block).lower()).split())
+
+
+@dataclass(slots=True)
+class ParsedIdea:
+    """The parts of an idea block a search campaign is built from."""
+    budget_daily: float
+    keywords: list
+    # Max CPC in micros for each keyword
+    keyword_cpcs: list
+    negative_keywords: list
+    headlines: list
+    descriptions: list
+    final_url: str
+
+
+def find_idea_block(ideas_text: str, campaign_name: str) -> str:
+    """The first "---"-separated block of an ideas file that mentions campaign_name, or ""."""
+    name = campaign_name.lower()
+    for block in ideas_text.split("---"):
+        if name in block.lower():
+            return block
+    return ""
+
+
+def _section(text: str, section_name: str, next_section_name: str = None) -> str:
+    section = text.split(f"{section_name}:", 1)
+    if len(section) < 2:
+        return ""
+    content = section[1]
+    if next_section_name and next_section_name in content:
+        content = content.split(next_section_name, 1)[0]
+    return content.strip()
+
+
+def _lines(section: str) -> list:
+    lines = []
+    for line in section.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("- "):
+            line = line[2:]
+        lines.append(line)
+    return lines
+
+
+def parse_idea_block(block: str) -> ParsedIdea:
+    budget = BUDGET.search(block)
+
+    keywords = []
+    keyword_cpcs = []
+    for line in _lines(_section(block, "Keywords", "Negative Keywords")):
+        # "keyword {cpc micros}"
+        if "{" in line and "}" in line:
+            keywords.append(line.split("{")[0].strip())
+            try:
+                keyword_cpcs.append(int(line.split("{")[1].replace("}", "").strip()))
+            except Exception:
+                keyword_cpcs.append(DEFAULT_KEYWORD_CPC)
+        else:
+            keywords.append(line)
+            keyword_cpcs.append(DEFAULT_KEYWORD_CPC)
+
+    return ParsedIdea(
+        budget_daily=float(budget.group(1)) if budget else DEFAULT_DAILY_BUDGET,
+        keywords=keywords,
+        keyword_cpcs=keyword_cpcs,
+        negative_keywords=_lines(_section(block, "Negative Keywords", "Headlines")),
+        headlines=_lines(_section(block, "Headlines", "Descriptions")),
+        descriptions=_lines(_section(block, "Descriptions", "Final URL")),
+        final_url=_section(block, "Final URL"),
+    )
+
+
+def shard_sizes(n_ideas: int, per_shard: int = IDEAS_PER_SHARD) -> list:
+    """Splits n_ideas into the fewest shards of at most per_shard ideas, as evenly as possible."""
+    shards = max(1, math.ceil(n_ideas / max(1, per_shard)))
+    base, extra = divmod(n_ideas, shards)
+    return [base + (i < extra) for i in range(shards)]
+
+
+async def stream_ideas(llm, messages: list, on_block):
+    """Streams one ideas response, awaiting on_block(block) for every idea as soon as it is complete."""
+    parser = IdeaStreamParser()
+    response = await llm.astream_chat(messages)
+    async for chunk in response:
+        for block in parser.feed(chunk.delta or ""):
+            await on_block(block)
+    for block in parser.close():
+        await on_block(block)
+
+
+async def generate_ideas(llm, reference_data: str, n_ideas: int, additional_notes: str, on_idea,
+                         per_shard: int = IDEAS_PER_SHARD, max_concurrency: int = MAX_CONCURRENT_IDEA_SHARDS) -> list:
+    """
+    Generates n_ideas campaign ideas with up to max_concurrency LLM calls in flight, each
+    producing a slice of the ideas against the same reference data. Ideas are de-duplicated
+    by campaign name, renumbered in the order they finish and passed to on_idea(block).
+    """
+    sizes = shard_sizes(n_ideas, per_shard)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    # Keeps the file and the numbering in the same order when shards finish ideas together
+    lock = asyncio.Lock()
+    ideas = []
+    seen = set()
+
+    async def add_block(block):
+        async with lock:
+            key = idea_key(block)
+            if len(ideas) >= n_ideas or key in seen:
+                return
+            seen.add(key)
+            block = renumber_idea(block, len(ideas) + 1)
+            ideas.append(block)
+            await on_idea(block)
+
+    async def run_shard(index, size):
+        notes = additional_notes
+        if len(sizes) > 1:
+            notes = (
+                f"{additional_notes}\n\nThese ideas are generated in {len(sizes)} parallel batches and this is batch "
+                f"{index + 1}. Give this batch its own angle on the reference data so its campaigns don't overlap with other batches."
+            )
+        messages = [
+            ChatMessage(role="user", content=f"Reference Data:\n\n{reference_data}"),
+            prompts.campaign_ideas_system_message(size, notes),
+        ]
+        async with semaphore:
+            await stream_ideas(llm, messages, add_block)
+
+    results = await asyncio.gather(*(run_shard(i, size) for i, size in enumerate(sizes)), return_exceptions=True)
+    errors = [r for r in results if isinstance(r, Exception)]
+    for error in errors:
+        print(f"Campaign ideas shard failed: {error}")
+    # Partial results are still useful; only fail if nothing came back
+    if errors and not ideas:
+        raise errors[0]
+    return ideas
@@ -1,50 +1,219 @@
 from llama_index.llms.bedrock_converse import BedrockConverse
 from llama_index.core.agent.workflow import FunctionAgent, AgentWorkflow
 from llama_index.core.workflow import Context
-from llama_index.core.memory import Memory
+from llama_index.core.instrumentation import get_dispatcher
+from llama_index.core.instrumentation.event_handlers import BaseEventHandler
+from llama_index.core.instrumentation.events.exception import ExceptionEvent
+from llama_index.core.instrumentation.events.llm import LLMChatEndEvent, LLMChatInProgressEvent, LLMChatStartEvent
+from llama_index.core.instrumentation.events.span import SpanDropEvent
+from botocore.config import Config
+import asyncio
+import functools
 import os
-from . import tools
+from . import prompts, tools
+from .memory import create_memory
+from helpers.metrics import LLM_TIME_TO_FIRST_TOKEN, LLM_TOKENS, LLM_TOKENS_PER_SECOND, instrument_tool
+from helpers.tracing import trace_tool, tracer
+from opentelemetry.trace import SpanKind, Status, StatusCode
+import time
+
+# Max pooled HTTP connections to Bedrock shared by every session.
+BEDROCK_MAX_CONNECTIONS = int(os.getenv("BEDROCK_MAX_CONNECTIONS", 50))
+
+# A chat call that fails or is cancelled never gets an LLMChatEndEvent: achat's span is dropped
+# (SpanDropEvent) and a stream being read raises an ExceptionEvent, both with the call's span_id.
+CHAT_FAILED_EVENTS = (ExceptionEvent, SpanDropEvent)
+
+# Process-wide, built on first use. Sessions only own their Context and Memory.
+_llm = None
+_agent = None
+_workflow = None
+
+
+class _SharedClientSession:
+    """
+    Stands in for the aioboto3 session BedrockConverse opens a new client from on every call,
+    handing out one long-lived bedrock-runtime client so its connection pool is reused.
+    It replaces BedrockConverse's private _asession, so llama-index-llms-bedrock-converse is
+    pinned and agent/test_core.py checks the client is still shared.
+    """
+
+    def __init__(self, session, client_kwargs: dict):
+        self._session = session
+        self._client_kwargs = client_kwargs
+        self._client = None
+        self._lock = asyncio.Lock()
+
+    def client(self, service_name, **kwargs):
+        return _SharedClient(self)
+
+    async def get_client(self):
+        async with self._lock:
+            if self._client is None:
+                self._client = await self._session.client("bedrock-runtime", **self._client_kwargs).__aenter__()
+        return self._client
+
+
+class _SharedClient:
+    def __init__(self, shared: _SharedClientSession):
+        self._shared = shared
+
+    async def __aenter__(self):
+        return await self._shared.get_client()
+
+    async def __aexit__(self, *exc_info):
+        # The client outlives the call
+        return False
+
+
+class LLMMetricsHandler(BaseEventHandler):
+    """Records Bedrock time to first token, output tokens per second and token usage from llama-index events."""
+
+    # span_id -> (started, first token time)
+    calls: dict = {}
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "LLMMetricsHandler"
+
+    def handle(self, event, **kwargs):
+        now = time.perf_counter()
+        if isinstance(event, LLMChatStartEvent):
+            self.calls[event.span_id] = (now, None)
+        elif isinstance(event, LLMChatInProgressEvent):
+            started, first_token = self.calls.get(event.span_id, (now, None))
+            if first_token is None:
+                self.calls[event.span_id] = (started, now)
+                LLM_TIME_TO_FIRST_TOKEN.observe(now - started)
+        elif isinstance(event, LLMChatEndEvent):
+            started, first_token = self.calls.pop(event.span_id, (None, None))
+            usage = event.response.additional_kwargs if event.response else {}
+            output_tokens = usage.get("completion_tokens", 0)
+            LLM_TOKENS.labels("input").inc(usage.get("prompt_tokens", 0))
+            LLM_TOKENS.labels("output").inc(output_tokens)
+            generating_since = first_token or started
+            if generating_since is not None and output_tokens and now > generating_since:
+                LLM_TOKENS_PER_SECOND.observe(output_tokens / (now - generating_since))
+        elif isinstance(event, CHAT_FAILED_EVENTS):
+            self.calls.pop(event.span_id, None)
+
+
+class LLMTracingHandler(BaseEventHandler):
+    """Opens a span per Bedrock chat call, under whichever span (tool, request) is current when it starts."""
+
+    # llama-index span_id -> (open span, first token seen)
+    spans: dict = {}
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "LLMTracingHandler"
+
+    def handle(self, event, **kwargs):
+        if isinstance(event, LLMChatStartEvent):
+            span = tracer.start_span("Bedrock chat", kind=SpanKind.CLIENT, attributes={"llm.messages": len(event.messages)})
+            self.spans[event.span_id] = (span, False)
+        elif isinstance(event, LLMChatInProgressEvent):
+            span, first_token = self.spans.get(event.span_id, (None, True))
+            if not first_token:
+                span.add_event("first token")
+                self.spans[event.span_id] = (span, True)
+        elif isinstance(event, LLMChatEndEvent):
+            span, _ = self.spans.pop(event.span_id, (None, None))
+            if span is None:
+                return
+            usage = event.response.additional_kwargs if event.response else {}
+            span.set_attribute("llm.input_tokens", usage.get("prompt_tokens", 0))
+            span.set_attribute("llm.output_tokens", usage.get("completion_tokens", 0))
+            span.end()
+        elif isinstance(event, CHAT_FAILED_EVENTS):
+            span, _ = self.spans.pop(event.span_id, (None, None))
+            if span is None:
+                return
+            error = getattr(event, "exception", None)
+            if error is not None:
+                span.record_exception(error)
+            span.set_status(Status(StatusCode.ERROR, str(error) if error is not None else event.err_str))
+            span.end()
 
 
 async def get_llm():
-    return BedrockConverse(
+    global _llm
+    if _llm is None:
+        timeout = 3600.00
+        config = Config(
+            retries={"max_attempts": 10, "mode": "standard"},
+            connect_timeout=timeout,
+            read_timeout=timeout,
+            max_pool_connections=BEDROCK_MAX_CONNECTIONS,
+            tcp_keepalive=True,
+        )
+        llm = BedrockConverse(
             model=os.getenv("AWS_MODEL_NAME", ""),
             aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID", ""),
             aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY", ""),
             region_name=os.getenv("AWS_DEFAULT_REGION", ""),
             max_tokens=int(os.getenv("MAX_TOKENS", 32000)),
-            timeout=3600.00
+            timeout=timeout,
+            botocore_config=config,
         )
+        llm._asession = _SharedClientSession(llm._asession, {"config": config, **llm._boto_client_kwargs})
+        get_dispatcher().add_event_handler(LLMMetricsHandler())
+        get_dispatcher().add_event_handler(LLMTracingHandler())
+        _llm = llm
+    return _llm
 
-async def create_agent():
-    try:
+
+@functools.cache
+def get_tools() -> list:
+    """
+    The agent's tools, each wrapped with the latency metrics and tracing decorators. Built on
+    first use rather than at import, since agent.tools imports this module.
+    """
+    return [instrument_tool(trace_tool(tool)) for tool in [
+        tools.google_ads_keyword_search,
+        tools.create_campaign_ideas_report,
+        tools.generate_search_campaign,
+        tools.get_data_from_urls,
+        tools.get_all_google_ads_campaign_details,
+        tools.query_google_ads_account,
+        tools.manage_ad_group_ads,
+        tools.manage_ad_groups,
+        tools.manage_ad_group_keywords,
+        tools.read_campaign_ideas_names,
+        tools.adjust_campaign_budget,
+        tools.list_artifacts,
+        tools.read_artifact,
+    ]]
+
+
+async def get_agent():
+    """Returns the process-wide agent workflow, building it (LLM, system prompt, tool schemas) once."""
+    global _agent, _workflow
+    system_prompt = prompts.load_prompt("system_prompt.md")
+    # Also rebuilt if the prompt changed on disk (only checked when prompts.RELOAD_PROMPTS is set)
+    if _workflow is None or _agent.system_prompt != system_prompt:
         llm = await get_llm()
 
-        with open("/app/agent/system_prompt.md", 'r') as f:
-            system_prompt = f.read()
-
-        agent = FunctionAgent(
-            tools=[tools.google_ads_keyword_search, 
-                   tools.create_campaign_ideas_report, 
-                   tools.generate_search_campaign, 
-                   tools.get_data_from_urls, 
-                   tools.get_all_google_ads_campaign_details, 
-                   tools.manage_ad_group_ads, 
-                   tools.manage_ad_groups,
-                   tools.manage_ad_group_keywords,
-                   tools.read_campaign_ideas_names,
-                   tools.adjust_campaign_budget],
+        _agent = FunctionAgent(
+            tools=get_tools(),
             llm=llm,
             system_prompt=system_prompt,
         )
+        _workflow = AgentWorkflow(agents=[_agent], timeout=3600.00)
+    return _agent, _workflow
 
-        ctx = Context(agent)
 
-        memory = Memory.from_defaults(token_limit=10000)
+async def create_agent():
+    try:
+        agent, workflow = await get_agent()
+
+        ctx = Context(agent)
 
-        workflow = AgentWorkflow(agents=[agent], timeout=3600.00)
+        memory = create_memory(await get_llm())
+        # Tools look up the session's artifact registry by the memory's session ID
+        await ctx.store.set("session_id", memory.session_id)
 
         return workflow, ctx, memory
     except Exception as e:
         print(f"Error creating agent: {e}")
-        return None
\ No newline at end of file
+        return None
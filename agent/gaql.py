@@ -0,0 +1,188 @@
+import base64
+import hashlib
+import json
+import re
+from .account_model import csv_table, enum_name, micros_to_gbp
+
+STATUSES = ("ENABLED", "PAUSED", "REMOVED")
+MAX_PAGE_SIZE = 500
+
+
+def _text(value):
+    return value
+
+
+def _enum(value):
+    return enum_name(value)
+
+
+def _gbp(value):
+    return micros_to_gbp(value) or ""
+
+
+def _joined(value):
+    return " | ".join(getattr(v, "text", v) for v in value)
+
+
+# resource -> FROM clause, filterable fields, a unique sort order (offset paging relies on it)
+# and the projectable fields as name -> (GAQL field, formatter)
+RESOURCES = {
+    "campaigns": {
+        "from": "campaign",
+        "status": "campaign.status",
+        "text": "campaign.name",
+        "order": ["campaign.id"],
+        "fields": {
+            "campaign_id": ("campaign.id", _text),
+            "campaign_name": ("campaign.name", _text),
+            "status": ("campaign.status", _enum),
+            "serving_status": ("campaign.serving_status", _enum),
+            "budget_gbp": ("campaign_budget.amount_micros", _gbp),
+            "channel_type": ("campaign.advertising_channel_type", _enum),
+        },
+    },
+    "ad_groups": {
+        "from": "ad_group",
+        "status": "ad_group.status",
+        "text": "ad_group.name",
+        "order": ["ad_group.id"],
+        "fields": {
+            "ad_group_id": ("ad_group.id", _text),
+            "ad_group_name": ("ad_group.name", _text),
+            "status": ("ad_group.status", _enum),
+            "cpc_bid_gbp": ("ad_group.cpc_bid_micros", _gbp),
+            "campaign_id": ("campaign.id", _text),
+            "campaign_name": ("campaign.name", _text),
+        },
+    },
+    "keywords": {
+        "from": "ad_group_criterion",
+        "where": ["ad_group_criterion.type = KEYWORD"],
+        "status": "ad_group_criterion.status",
+        "text": "ad_group_criterion.keyword.text",
+        "order": ["ad_group.id", "ad_group_criterion.criterion_id"],  # criterion IDs repeat across ad groups
+        "fields": {
+            "criterion_id": ("ad_group_criterion.criterion_id", _text),
+            "text": ("ad_group_criterion.keyword.text", _text),
+            "match_type": ("ad_group_criterion.keyword.match_type", _enum),
+            "status": ("ad_group_criterion.status", _enum),
+            "negative": ("ad_group_criterion.negative", _text),
+            "cpc_bid_gbp": ("ad_group_criterion.cpc_bid_micros", _gbp),
+            "ad_group_id": ("ad_group.id", _text),
+            "ad_group_name": ("ad_group.name", _text),
+            "campaign_id": ("campaign.id", _text),
+            "campaign_name": ("campaign.name", _text),
+        },
+    },
+    "ads": {
+        "from": "ad_group_ad",
+        "status": "ad_group_ad.status",
+        "text": None,
+        "order": ["ad_group.id", "ad_group_ad.ad.id"],  # an ad is identified within its ad group
+        "fields": {
+            "ad_id": ("ad_group_ad.ad.id", _text),
+            "status": ("ad_group_ad.status", _enum),
+            "final_urls": ("ad_group_ad.ad.final_urls", _joined),
+            "headlines": ("ad_group_ad.ad.responsive_search_ad.headlines", _joined),
+            "descriptions": ("ad_group_ad.ad.responsive_search_ad.descriptions", _joined),
+            "ad_group_id": ("ad_group.id", _text),
+            "campaign_id": ("campaign.id", _text),
+        },
+    },
+}
+
+
+def _numeric_id(name: str, value) -> str:
+    value = str(value).replace("-", "").strip()
+    if not value.isdigit():
+        raise ValueError(f"{name} must be a numeric ID, got {value!r}")
+    return value
+
+
+def _like_literal(text: str) -> str:
+    # Escape GAQL string quoting, then LIKE wildcards
+    text = text.replace("\\", "\\\\").replace("'", "\\'")
+    text = re.sub(r"([%_\[\]])", r"[\1]", text)
+    return f"'%{text}%'"
+
+
+def build_query(resource: str, fields: list = None, campaign_id: str = "", ad_group_id: str = "", status: str = "", text_contains: str = ""):
+    """
+    Builds a GAQL query with the filters and projection pushed down into the
+    WHERE and SELECT clauses. Returns (query, selected field names).
+    """
+    if resource not in RESOURCES:
+        raise ValueError(f"Unknown resource {resource!r}, expected one of: {', '.join(RESOURCES)}")
+    spec = RESOURCES[resource]
+
+    fields = list(fields or spec["fields"])
+    unknown = [f for f in fields if f not in spec["fields"]]
+    if unknown:
+        raise ValueError(f"Unknown fields for {resource}: {', '.join(unknown)}. Available: {', '.join(spec['fields'])}")
+
+    where = list(spec.get("where", []))
+    if campaign_id:
+        where.append(f"campaign.id = {_numeric_id('campaign_id', campaign_id)}")
+    if ad_group_id:
+        if resource == "campaigns":
+            raise ValueError("ad_group_id cannot be used to filter campaigns")
+        where.append(f"ad_group.id = {_numeric_id('ad_group_id', ad_group_id)}")
+    if status:
+        status = status.upper()
+        if status not in STATUSES:
+            raise ValueError(f"status must be one of: {', '.join(STATUSES)}")
+        where.append(f"{spec['status']} = '{status}'")
+    else:
+        where.append(f"{spec['status']} != 'REMOVED'")
+    if text_contains:
+        if not spec["text"]:
+            raise ValueError(f"text_contains is not supported for {resource}")
+        where.append(f"{spec['text']} LIKE {_like_literal(text_contains)}")
+
+    # The sort fields are always selected, so the order doesn't depend on projection
+    select = ", ".join(dict.fromkeys([*(spec["fields"][f][0] for f in fields), *spec["order"]]))
+    query = f"SELECT {select} FROM {spec['from']} WHERE {' AND '.join(where)} ORDER BY {', '.join(spec['order'])}"
+    return query, fields
+
+
+def _get_path(row, path: str):
+    value = row
+    for part in path.split("."):
+        value = getattr(value, part)
+    return value
+
+
+def format_rows(resource: str, fields: list, rows) -> str:
+    spec = RESOURCES[resource]["fields"]
+    return csv_table(
+        fields,
+        ([spec[f][1](_get_path(row, spec[f][0])) for f in fields] for row in rows),
+    )
+
+
+# Cursors are opaque to the agent: a row offset plus a fingerprint of the query
+# they belong to, so a cursor can't be replayed against different filters.
+
+def _fingerprint(query: str) -> str:
+    return hashlib.sha1(query.encode()).hexdigest()[:10]
+
+
+def encode_cursor(query: str, offset: int) -> str:
+    raw = json.dumps({"q": _fingerprint(query), "o": offset}).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(query: str, cursor: str) -> int:
+    if not cursor:
+        return 0
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    # Cursors come back from the LLM, so anything that didn't come from encode_cursor is rejected
+    offset = data.get("o") if isinstance(data, dict) else None
+    if type(offset) is not int or offset < 0:
+        raise ValueError("Invalid cursor")
+    if data.get("q") != _fingerprint(query):
+        raise ValueError("Cursor does not belong to this query, start again without a cursor")
+    return offset
@@ -0,0 +1,161 @@
+from llama_index.core.llms import ChatMessage
+from llama_index.core.memory import BaseMemoryBlock, Memory
+from llama_index.core.storage.chat_store.base_db import MessageStatus
+from pydantic import Field
+from typing import Any, Optional
+import os
+from helpers.file_helpers import save_artifact
+from helpers.metrics import run_in_executor
+from .artifacts import add_text, get_registry
+
+# Per-session memory budget in tokens; history over 70% of it is folded into the summary.
+MEMORY_TOKEN_LIMIT = int(os.getenv("MEMORY_TOKEN_LIMIT", 10000))
+# Messages above this size are saved to disk and replaced by a short reference once their turn is over.
+MAX_MESSAGE_TOKENS = int(os.getenv("MAX_MESSAGE_TOKENS", 1500))
+SUMMARY_MAX_WORDS = 400
+PREVIEW_CHARS = 300
+# Print the prompt size of every LLM call (the token counter hook below)
+LOG_MEMORY_TOKENS = os.getenv("LOG_MEMORY_TOKENS", "false").lower() == "true"
+
+# Called as hook(session_id, tokens) with the size of the chat history sent to the LLM.
+token_hooks = []
+
+
+def add_token_hook(hook):
+    token_hooks.append(hook)
+
+
+def log_tokens(session_id: str, tokens: int):
+    print(f"Memory tokens for session {session_id}: {tokens}", flush=True)
+
+
+if LOG_MEMORY_TOKENS:
+    add_token_hook(log_tokens)
+
+
+class SummaryMemoryBlock(BaseMemoryBlock[str]):
+    """Keeps a running LLM summary of the turns that were flushed out of the chat history."""
+
+    name: str = "conversation_summary"
+    priority: int = 0
+    llm: Any = Field(default=None, exclude=True)
+    summary: str = ""
+
+    async def _aget(self, messages: Optional[list] = None, **block_kwargs: Any) -> str:
+        return self.summary
+
+    async def _aput(self, messages: list) -> None:
+        transcript = "\n".join(
+            f"{m.role.value}: {m.content}" for m in messages if m.content
+        )
+        if not transcript:
+            return
+        try:
+            response = await self.llm.achat([
+                ChatMessage(role="system", content=(
+                    "You maintain a running summary of a conversation between a user and a Google Ads assistant. "
+                    "Merge the new messages into the current summary. Keep the user's goals and decisions, "
+                    "campaign/ad group names and IDs, budgets, file paths and artifact IDs; drop small talk. "
+                    f"Respond with the updated summary only, at most {SUMMARY_MAX_WORDS} words."
+                )),
+                ChatMessage(role="user", content=f"Current summary:\n{self.summary or '(empty)'}\n\nNew messages:\n{transcript}"),
+            ])
+            self.summary = (response.message.content or "").strip()
+        except Exception as e:
+            # Losing detail is better than failing the turn; keep the tail of what was flushed
+            print(f"Error summarizing memory: {e}", flush=True)
+            self.summary = f"{self.summary}\n{transcript[-PREVIEW_CHARS * 4:]}".strip()
+
+
+class SessionMemory(Memory):
+    """
+    Chat memory with bounded size: large messages are moved to on-disk artifacts once
+    their turn is over, and turns over the token limit are folded into a summary block.
+    """
+
+    max_message_tokens: int = MAX_MESSAGE_TOKENS
+
+    def _text_tokens(self, message: ChatMessage) -> int:
+        return len(self.tokenizer_fn(message.content or ""))
+
+    async def _compact(self, message: ChatMessage) -> ChatMessage:
+        if message.role.value == "system" or self._text_tokens(message) <= self.max_message_tokens:
+            return message
+        text = message.content
+        file_path = await run_in_executor(save_artifact, self.session_id, text)
+        artifact = add_text(get_registry(self.session_id), "saved_output", file_path, f"earlier {message.role.value} message", text)
+        reference = (
+            f"[Saved output {artifact.id}: {len(text)} characters, use read_artifact to read it. "
+            f"Preview: {text[:PREVIEW_CHARS]}...]"
+        )
+        # Keep tool call ids etc. so tool results still pair with their calls
+        return ChatMessage(role=message.role, content=reference, additional_kwargs=message.additional_kwargs)
+
+    async def _compact_active(self):
+        """Compacts the turn's user message, which the agent needed in full while it was answering."""
+        active = await self.sql_store.get_messages(self.session_id, status=MessageStatus.ACTIVE)
+        compacted = [await self._compact(m) for m in active]
+        if any(new is not old for new, old in zip(compacted, active)):
+            await self.sql_store.delete_messages(self.session_id, status=MessageStatus.ACTIVE)
+            await self.sql_store.add_messages(self.session_id, compacted, status=MessageStatus.ACTIVE)
+
+    async def aput(self, message: ChatMessage) -> None:
+        if message.role.value == "user":
+            # Not counted against the limit until the turn is over and it has been compacted,
+            # otherwise one large attachment would flush all the earlier turns
+            await self.sql_store.add_message(self.session_id, message, status=MessageStatus.ACTIVE)
+        else:
+            await self.aput_messages([message])
+
+    async def aput_messages(self, messages: list) -> None:
+        # The agent stores its assistant and tool messages once the turn is over, so the whole
+        # turn can be compacted before the queue decides what to flush into the summary
+        await self._compact_active()
+        messages = [await self._compact(m) for m in messages]
+        await super().aput_messages(messages)
+
+    async def aget(self, input=None, **block_kwargs: Any) -> list:
+        messages = await super().aget(input=input, **block_kwargs)
+        if token_hooks:
+            tokens = sum(self._estimate_token_count(m) for m in messages)
+            for hook in token_hooks:
+                hook(self.session_id, tokens)
+        return messages
+
+
+def create_memory(llm, session_id: str = None) -> SessionMemory:
+    return SessionMemory.from_defaults(
+        session_id=session_id,
+        token_limit=MEMORY_TOKEN_LIMIT,
+        memory_blocks=[SummaryMemoryBlock(llm=llm)],
+    )
+
+
+async def dump_memory(memory: SessionMemory) -> dict:
+    """The session's messages (by status) and summary as JSON-ready data, for spilling an idle session to disk."""
+    messages = {}
+    for status in MessageStatus:
+        stored = await memory.sql_store.get_messages(memory.session_id, status=status)
+        messages[status.value] = [m.model_dump(mode="json") for m in stored]
+    return {
+        "session_id": memory.session_id,
+        "summary": memory.memory_blocks[0].summary,
+        "messages": messages,
+    }
+
+
+async def load_memory(data: dict, llm) -> SessionMemory:
+    memory = create_memory(llm, session_id=data["session_id"])
+    memory.memory_blocks[0].summary = data["summary"]
+    for status in MessageStatus:
+        stored = [ChatMessage.model_validate(m) for m in data["messages"].get(status.value, [])]
+        if stored:
+            await memory.sql_store.add_messages(memory.session_id, stored, status=status)
+    return memory
+
+
+async def close_memory(memory: SessionMemory):
+    """Closes the memory's in-memory SQLite database (and the connection's thread)."""
+    engine = getattr(memory.sql_store, "_async_engine", None)
+    if engine is not None:
+        await engine.dispose()
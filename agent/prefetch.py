@@ -0,0 +1,122 @@
+import asyncio
+import hashlib
+import os
+import time
+from helpers import google_ads_client
+
+# How long a prefetched account snapshot is served before it is fetched again.
+PREFETCH_TTL = int(os.getenv("PREFETCH_TTL", 300))
+# Minimum seconds between background prefetches of the same customer, to stay inside API rate limits.
+PREFETCH_MIN_INTERVAL = int(os.getenv("PREFETCH_MIN_INTERVAL", 60))
+# Max account fetches (background or not) running at once across all customers.
+MAX_CONCURRENT_PREFETCHES = int(os.getenv("MAX_CONCURRENT_PREFETCHES", 4))
+
+# Snapshots are cached per (credentials, customer_id): customer IDs are entered freely by users,
+# so a snapshot is only ever served to the credentials that fetched it.
+# key -> (fetched_at, snapshot text)
+_snapshots = {}
+# key -> (generation, running fetch task); at most one per key
+_inflight = {}
+# key -> time the last fetch started
+_last_started = {}
+# customer_id -> counter bumped by every mutate, so fetches that overlap a change aren't cached
+_generations = {}
+# session key -> key prefetched for it
+_sessions = {}
+_semaphore = None
+
+
+def _get_semaphore():
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(MAX_CONCURRENT_PREFETCHES)
+    return _semaphore
+
+
+def cache_key(refresh_token: str, customer_id: str) -> tuple:
+    """Identifies whose credentials a snapshot was fetched with, without keeping the token itself."""
+    return hashlib.sha256(refresh_token.encode()).hexdigest(), customer_id
+
+
+def _fresh(key: tuple):
+    cached = _snapshots.get(key)
+    if cached and time.time() - cached[0] < PREFETCH_TTL:
+        return cached[1]
+    return None
+
+
+def _start(key: tuple, load, *args) -> asyncio.Task:
+    _last_started[key] = time.time()
+    customer_id = key[1]
+    generation = _generations.get(customer_id, 0)
+
+    async def run():
+        async with _get_semaphore():
+            snapshot = await load(*args)
+        if _generations.get(customer_id, 0) == generation:
+            _snapshots[key] = (time.time(), snapshot)
+        return snapshot
+
+    def done(task):
+        if _inflight.get(key, (None, None))[1] is task:
+            del _inflight[key]
+        if not task.cancelled() and task.exception():
+            print(f"Account prefetch failed for {customer_id}: {task.exception()}", flush=True)
+
+    task = asyncio.create_task(run())
+    task.add_done_callback(done)
+    _inflight[key] = (generation, task)
+    return task
+
+
+def start_prefetch(session_key: str, refresh_token: str, customer_id: str, load, *args) -> bool:
+    """
+    Starts fetching the account snapshot in the background with load(*args), unless a fresh
+    snapshot or a fetch for these credentials and customer already exists or one was started
+    too recently.
+    """
+    key = cache_key(refresh_token, customer_id)
+    _sessions[session_key] = key
+    if _fresh(key) is not None or key in _inflight:
+        return False
+    if time.time() - _last_started.get(key, 0) < PREFETCH_MIN_INTERVAL:
+        return False
+    _start(key, load, *args)
+    return True
+
+
+async def get_snapshot(refresh_token: str, customer_id: str, load, *args) -> str:
+    """
+    Returns the snapshot cached for these credentials and customer, waits for the fetch in
+    flight, or fetches it now with load(*args).
+    """
+    key = cache_key(refresh_token, customer_id)
+    snapshot = _fresh(key)
+    if snapshot is not None:
+        return snapshot
+    generation, task = _inflight.get(key, (None, None))
+    # A fetch that started before the last change would return stale data
+    if task is None or generation != _generations.get(customer_id, 0):
+        task = _start(key, load, *args)
+    # Shielded so a cancelled tool call doesn't cancel a fetch other sessions may be waiting on
+    return await asyncio.shield(task)
+
+
+def cancel_prefetch(session_key: str):
+    """Drops an idle session's prefetch: cancels it if still running and forgets the snapshot."""
+    key = _sessions.pop(session_key, None)
+    if key is None or key in _sessions.values():
+        return
+    _, task = _inflight.pop(key, (None, None))
+    if task and not task.done():
+        task.cancel()
+    _snapshots.pop(key, None)
+
+
+def invalidate(customer_id: str):
+    _generations[customer_id] = _generations.get(customer_id, 0) + 1
+    for key in [key for key in _snapshots if key[1] == customer_id]:
+        del _snapshots[key]
+
+
+google_ads_client.mutate_hooks.append(invalidate)
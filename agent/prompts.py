@@ -0,0 +1,73 @@
+from llama_index.core.base.llms.types import CacheControl, CachePoint, TextBlock
+from llama_index.core.llms import ChatMessage
+import os
+
+PROMPTS_DIR = "/app/agent"
+
+# Re-read templates whenever their file changes on disk (development only).
+RELOAD_PROMPTS = os.getenv("RELOAD_PROMPTS", "false").lower() == "true"
+# Adds a Bedrock cache point after the static campaign ideas prompt. Only enable it for models
+# that support prompt caching (AWS_MODEL_NAME); Bedrock rejects cachePoint blocks for the others.
+BEDROCK_PROMPT_CACHING = os.getenv("BEDROCK_PROMPT_CACHING", "false").lower() == "true"
+
+# path -> (mtime, text)
+_templates = {}
+# Rendered campaign ideas prefix and the template mtimes it was rendered from
+_ideas_prefix = (None, "")
+
+
+def load_prompt(name: str) -> str:
+    """Returns the text of a prompt template in PROMPTS_DIR, reading it from disk only once."""
+    path = f"{PROMPTS_DIR}/{name}"
+    cached = _templates.get(path)
+    if cached and not RELOAD_PROMPTS:
+        return cached[1]
+
+    mtime = os.path.getmtime(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    _templates[path] = (mtime, text)
+    return text
+
+
+def campaign_ideas_prefix() -> str:
+    """
+    The static part of the campaign ideas system prompt. It is identical for every
+    request so it can be rendered once (and cached by Bedrock, with BEDROCK_PROMPT_CACHING).
+    """
+    global _ideas_prefix
+    content_gen_prompt = load_prompt("ai_content_generation_prompt.md")
+    campaign_ideas_example = load_prompt("campaign_ideas_layout.md")
+    template_instructions = load_prompt("template_instructions.md")
+
+    version = tuple(_templates[f"{PROMPTS_DIR}/{name}"][0] for name in (
+        "ai_content_generation_prompt.md", "campaign_ideas_layout.md", "template_instructions.md"
+    ))
+    if _ideas_prefix[0] != version:
+        _ideas_prefix = (version, (
+            "You are a helpful assistant. Your job is to generate Google Ads Campaign ideas "
+            f"based on the user's reference data.\n\nUse these guidlines as a reference:\n\n{content_gen_prompt}\n\n"
+            f"Your campaign ideas should follow this exact layout example:\n\n{campaign_ideas_example}, be sure strictly to adhere to these rules when creating the template:\n\n{template_instructions}\n"
+            "YOU MUST STRICTLY ADHERE TO CHARACTER LIMITS FOR HEADLINES (MAX 28 chars) AND DESCRIPTIONS (MAX 80 chars)."
+        ))
+    return _ideas_prefix[1]
+
+
+def campaign_ideas_system_message(n_ideas: int, additional_notes: str) -> ChatMessage:
+    """
+    Builds the campaign ideas system message: the static prefix, a Bedrock cache point when
+    BEDROCK_PROMPT_CACHING is on, then the per-request instructions.
+    """
+    blocks = [TextBlock(text=campaign_ideas_prefix())]
+    if BEDROCK_PROMPT_CACHING:
+        blocks.append(CachePoint(cache_control=CacheControl(type="default")))
+    blocks.append(TextBlock(text=f"Generate exactly {n_ideas} Google Ads Campaign ideas.\nAdditional Notes:\n{additional_notes}\n"))
+    return ChatMessage(role="system", blocks=blocks)
+
+
+def preload():
+    load_prompt("system_prompt.md")
+    campaign_ideas_prefix()
@@ -0,0 +1,254 @@
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from workflows import Context
+from workflows.context.serializers import JsonSerializer
+import asyncio
+import json
+import os
+import time
+from helpers.metrics import run_in_executor
+from .core import get_agent, get_llm
+from .memory import close_memory, dump_memory, load_memory
+
+# Sessions are dropped after this many seconds without a message.
+SESSION_TIMEOUT = int(os.getenv("SESSION_TIMEOUT", 30 * 60))
+# Max sessions kept (in memory or on disk); the least recently active are evicted beyond it. 0 = no limit.
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", 500))
+# Sessions idle for this many seconds are written to disk and reloaded on their next message.
+SPILL_AFTER = int(os.getenv("SPILL_AFTER", 5 * 60))
+# Memory budget: max sessions held in memory; the least recently active are spilled beyond it.
+MAX_RESIDENT_SESSIONS = int(os.getenv("MAX_RESIDENT_SESSIONS", 100))
+SPILL_DIR = os.getenv("SESSION_SPILL_DIR", "/app/sessions")
+
+
+@dataclass(slots=True)
+class SpilledSession:
+    """Stands in for a session whose Context and Memory were written to `path`."""
+    session_id: str
+    path: str
+    google_creds: dict
+    # Files the session created, removed if it expires without being reloaded
+    files: list
+
+
+def google_creds_of(session) -> dict:
+    return session.google_creds if isinstance(session, SpilledSession) else session[3]
+
+
+async def _context_files(context) -> list:
+    keywords_file = await context.store.get('keywords_search_file', '')
+    campaign_ideas_file = await context.store.get('campaign_ideas_file', '')
+    uploaded_files = await context.store.get('uploaded_files', [])
+    return [f for f in [keywords_file, campaign_ideas_file, *uploaded_files] if f]
+
+
+async def release_session(session) -> tuple:
+    """
+    Closes an expired or evicted session, returning (session_id, files to remove).
+    A spilled session's own file is included.
+    """
+    if isinstance(session, SpilledSession):
+        return session.session_id, [*session.files, session.path]
+    _, context, memory, _, _ = session
+    files = await _context_files(context)
+    await close_memory(memory)
+    return memory.session_id, files
+
+
+def _write_json(path: str, data: dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+
+def _read_json(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+async def spill_session(session) -> SpilledSession:
+    _, context, memory, google_creds, _ = session
+    data = {
+        "context": context.to_dict(serializer=JsonSerializer()),
+        "memory": await dump_memory(memory),
+    }
+    path = os.path.join(SPILL_DIR, f"{memory.session_id}.json")
+    await run_in_executor(_write_json, path, data)
+    spilled = SpilledSession(memory.session_id, path, google_creds, await _context_files(context))
+    await close_memory(memory)
+    return spilled
+
+
+async def restore_session(spilled: SpilledSession) -> tuple:
+    data = await run_in_executor(_read_json, spilled.path)
+    agent, workflow = await get_agent()
+    context = Context.from_dict(agent, data["context"], serializer=JsonSerializer())
+    memory = await load_memory(data["memory"], await get_llm())
+    await run_in_executor(os.remove, spilled.path)
+    return workflow, context, memory, spilled.google_creds, time.time()
+
+
+class SessionStore:
+    """
+    user_id -> session, kept in order of last activity. Every write counts as activity and
+    moves the session to the end, so with one timeout for everyone the oldest session is
+    always the next to expire: expiry and eviction only look at the front, past any held sessions.
+
+    Sessions idle for SPILL_AFTER, or beyond the MAX_RESIDENT_SESSIONS budget, are spilled
+    to disk by spill_next and reloaded by load. Sessions held by a running turn are never
+    spilled, expired or evicted; the end of the turn counts as activity.
+
+    on_evict(user_id, session) is called for every expired or evicted session, while the
+    caller still holds whatever lock guards the store, so it should only hand work off.
+    """
+
+    def __init__(self, on_evict, timeout: int = SESSION_TIMEOUT, max_sessions: int = MAX_SESSIONS,
+                 spill_after: int = SPILL_AFTER, max_resident: int = MAX_RESIDENT_SESSIONS):
+        self.on_evict = on_evict
+        self.timeout = timeout
+        self.max_sessions = max_sessions
+        self.spill_after = spill_after
+        self.max_resident = max_resident
+        # user_id -> (last active, session)
+        self._sessions = OrderedDict()
+        # user_ids of the sessions in memory, also in order of last activity
+        self._resident = OrderedDict()
+        # user_id -> turns running
+        self._held = Counter()
+        self._added = asyncio.Event()
+        self._spill_wanted = asyncio.Event()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __contains__(self, user_id):
+        return user_id in self._sessions
+
+    def __getitem__(self, user_id):
+        return self._sessions[user_id][1]
+
+    def __setitem__(self, user_id, session):
+        self._sessions[user_id] = (time.monotonic(), session)
+        self._sessions.move_to_end(user_id)
+        if isinstance(session, SpilledSession):
+            self._resident.pop(user_id, None)
+        else:
+            self._resident[user_id] = None
+            self._resident.move_to_end(user_id)
+            # The spiller may be waiting with nothing to spill, or the budget may now be exceeded
+            self._spill_wanted.set()
+        self._added.set()
+        while self.max_sessions and len(self._sessions) > self.max_sessions:
+            evicted_id = self._first_unheld(exclude=user_id)
+            if evicted_id is None:
+                # Every other session is in a turn; the cap is exceeded until one ends
+                break
+            _, evicted = self._sessions.pop(evicted_id)
+            self._resident.pop(evicted_id, None)
+            print(f"Session limit reached, evicted least recently active user: {evicted_id}", flush=True)
+            self.on_evict(evicted_id, evicted)
+
+    @property
+    def resident(self) -> int:
+        return len(self._resident)
+
+    @property
+    def spilled(self) -> int:
+        return len(self._sessions) - len(self._resident)
+
+    def items(self):
+        return [(user_id, session) for user_id, (_, session) in self._sessions.items()]
+
+    async def load(self, user_id) -> tuple:
+        """The user's session, reloaded from disk first if it was spilled."""
+        session = self[user_id]
+        if isinstance(session, SpilledSession):
+            session = await restore_session(session)
+            self[user_id] = session
+        return session
+
+    def hold(self, user_id):
+        """Marks a turn as running on the session, so it isn't spilled, expired or evicted under it."""
+        self._held[user_id] += 1
+
+    def release(self, user_id):
+        self._held[user_id] -= 1
+        if self._held[user_id] <= 0:
+            del self._held[user_id]
+            if user_id in self._sessions:
+                # The turn just ended, so the session's idle time starts now
+                self._sessions[user_id] = (time.monotonic(), self._sessions[user_id][1])
+                self._sessions.move_to_end(user_id)
+                if user_id in self._resident:
+                    self._resident.move_to_end(user_id)
+            self._added.set()
+            self._spill_wanted.set()
+
+    def _first_unheld(self, exclude=None):
+        """The least recently active session not held by a turn."""
+        for user_id in self._sessions:
+            if user_id not in self._held and user_id != exclude:
+                return user_id
+        return None
+
+    def expire(self) -> int:
+        """Evicts every session idle for longer than the timeout, except held ones. O(expired + held)."""
+        deadline = time.monotonic() - self.timeout
+        expired = []
+        for user_id, (last_active, _) in self._sessions.items():
+            if last_active > deadline:
+                break
+            if user_id not in self._held:
+                expired.append(user_id)
+        for user_id in expired:
+            _, session = self._sessions.pop(user_id)
+            self._resident.pop(user_id, None)
+            self.on_evict(user_id, session)
+        return len(expired)
+
+    async def wait_for_expiry(self):
+        """
+        Sleeps until the oldest session not in a turn is due to expire, or until there is such
+        a session at all.
+        """
+        user_id = self._first_unheld()
+        if user_id is None:
+            self._added.clear()
+            await self._added.wait()
+            return
+        last_active, _ = self._sessions[user_id]
+        await asyncio.sleep(max(0.0, last_active + self.timeout - time.monotonic()))
+
+    def _spill_candidate(self):
+        """The least recently active resident session not held by a turn."""
+        for user_id in self._resident:
+            if user_id not in self._held:
+                return user_id
+        return None
+
+    async def spill_next(self) -> bool:
+        """Spills one session if any is idle or the resident budget is exceeded. Returns whether it did."""
+        user_id = self._spill_candidate()
+        if user_id is None:
+            return False
+        last_active, session = self._sessions[user_id]
+        over_budget = self.max_resident and len(self._resident) > self.max_resident
+        if not over_budget and time.monotonic() - last_active < self.spill_after:
+            return False
+        spilled = await spill_session(session)
+        # Keeps its place in the activity order
+        self._sessions[user_id] = (last_active, spilled)
+        del self._resident[user_id]
+        return True
+
+    async def wait_for_spill(self):
+        """Sleeps until the next session becomes idle, the budget is exceeded or a turn ends."""
+        self._spill_wanted.clear()
+        user_id = self._spill_candidate()
+        timeout = None
+        if user_id is not None:
+            timeout = max(0.0, self._sessions[user_id][0] + self.spill_after - time.monotonic())
+        try:
+            await asyncio.wait_for(self._spill_wanted.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
@@ -0,0 +1,76 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from .ad_policy import AdPolicyError, asset_problems, check_ads, enforce_ad_policy, fix_asset
+
+
+class FakeLLM:
+    def __init__(self, content):
+        self.content = content
+        self.calls = 0
+
+    async def achat(self, messages):
+        self.calls += 1
+        return SimpleNamespace(message=SimpleNamespace(content=self.content))
+
+
+def valid_ad():
+    return {"headlines": ["Fresh Widgets", "Widgets Near You", "Order Widgets Today"],
+            "descriptions": ["Premium widgets for small businesses.", "Free delivery on every order!"]}
+
+
+def test_fix_asset_keeps_allowed_symbols():
+    assert fix_asset("Acme® Widgets™ 20°C", "headlines") == "Acme® Widgets™ 20°C"
+
+
+def test_fix_asset_removes_emoji_and_cleans_punctuation():
+    assert fix_asset("🔥 Amazing widgets!!! ★", "headlines") == "Amazing widgets"
+    assert fix_asset("Great deals! Buy now!", "descriptions") == "Great deals! Buy now"
+
+
+def test_asset_problems():
+    assert asset_problems("Widgets", "headlines") == []
+    assert asset_problems("x" * 29, "headlines") == ["29 characters, the maximum is 28"]
+    assert "exclamation marks are not allowed in headlines" in asset_problems("Buy!", "headlines")
+
+
+def test_check_ads_dedupes_and_pads_to_the_minimum():
+    ads, issues = check_ads([{"headlines": ["Widgets", "widgets"], "descriptions": ["Buy widgets."]}])
+    assert ads[0]["headlines"] == ["Widgets", "", ""]
+    assert [i["id"] for i in issues] == ["0.headlines.1", "0.headlines.2", "0.descriptions.1"]
+
+
+def test_valid_ads_skip_the_llm():
+    llm = FakeLLM("{}")
+    assert asyncio.run(enforce_ad_policy([valid_ad()], llm)) == [valid_ad()]
+    assert llm.calls == 0
+
+
+def test_invalid_assets_are_repaired_in_one_call():
+    ad = valid_ad()
+    ad["headlines"].append("Widgets that last for many years")
+    llm = FakeLLM('Here you go: {"0.headlines.3": "Long Lasting Widgets"}')
+    ads = asyncio.run(enforce_ad_policy([ad, valid_ad()], llm))
+    assert ads[0]["headlines"][3] == "Long Lasting Widgets"
+    assert llm.calls == 1
+
+
+def test_unrepairable_ads_raise():
+    ad = {"headlines": ["Widgets"], "descriptions": valid_ad()["descriptions"]}
+    with pytest.raises(AdPolicyError, match="ad 1 headline"):
+        asyncio.run(enforce_ad_policy([ad], FakeLLM("not json")))
+
+
+def test_all_caps_words_are_left_to_the_llm():
+    assert fix_asset("NVIDIA Graphics Cards", "headlines") == "NVIDIA Graphics Cards"
+    ad = valid_ad()
+    ad["headlines"][0] = "NVIDIA Graphics Cards"
+    ad["headlines"][1] = "MASSIVE SAVINGS Now"
+    _, issues = check_ads([ad])
+    assert [i["id"] for i in issues] == ["0.headlines.0", "0.headlines.1"]
+    assert "MASSIVE, SAVINGS" in issues[1]["problems"][0]
+    assert check_ads([ad], warnings=False)[1] == []
+
+    llm = FakeLLM('{"0.headlines.0": "NVIDIA Graphics Cards", "0.headlines.1": "Massive Savings Now"}')
+    [fixed] = asyncio.run(enforce_ad_policy([ad], llm))
+    assert fixed["headlines"][:2] == ["NVIDIA Graphics Cards", "Massive Savings Now"]
@@ -0,0 +1,75 @@
+from .campaign_ideas import IdeaStreamParser, idea_key, parse_idea_block, renumber_idea, shard_sizes
+
+IDEAS = """Here are your ideas.
+
+# Idea 1: Widget Sale
+Budget: £12.50/day
+Keywords:
+- buy widgets {2000000}
+- cheap widgets
+Negative Keywords:
+- free
+Headlines:
+- Widgets On Sale
+Descriptions:
+- Premium widgets for less.
+Final URL: https://example.com/widgets
+---
+# Idea 2: Gadget Launch
+Budget: £5/day
+---
+"""
+
+
+def feed_in_chunks(parser, text, size):
+    blocks = []
+    for i in range(0, len(text), size):
+        blocks.extend(parser.feed(text[i:i + size]))
+    return blocks + parser.close()
+
+
+def test_blocks_are_emitted_as_they_end_whatever_the_chunking():
+    for size in (1, 7, 64, len(IDEAS)):
+        blocks = feed_in_chunks(IdeaStreamParser(), IDEAS, size)
+        assert [b.splitlines()[0] for b in blocks] == ["# Idea 1: Widget Sale", "# Idea 2: Gadget Launch"]
+
+
+def test_block_is_emitted_at_its_separator_before_the_next_one_starts():
+    parser = IdeaStreamParser()
+    assert parser.feed("# Idea 1: Widget Sale\nBudget: £5/day\n") == []
+    assert parser.feed("---\n# Idea 2: Gad") == ["# Idea 1: Widget Sale\nBudget: £5/day"]
+    assert parser.close() == ["# Idea 2: Gad"]
+
+
+def test_next_header_ends_a_block_without_separator():
+    parser = IdeaStreamParser()
+    blocks = parser.feed("# Idea 1: A\nBudget: £5\n# Idea 2: B\nBudget: £6\n")
+    assert blocks == ["# Idea 1: A\nBudget: £5"]
+    assert parser.close() == ["# Idea 2: B\nBudget: £6"]
+
+
+def test_text_without_an_idea_header_is_dropped():
+    parser = IdeaStreamParser()
+    assert parser.feed("I can't help with that.\n---\n") == []
+    assert parser.close() == []
+
+
+def test_parse_idea_block():
+    idea = parse_idea_block(feed_in_chunks(IdeaStreamParser(), IDEAS, 64)[0])
+    assert idea.budget_daily == 12.5
+    assert idea.keywords == ["buy widgets", "cheap widgets"]
+    assert idea.keyword_cpcs == [2000000, 1500000]
+    assert idea.negative_keywords == ["free"]
+    assert idea.headlines == ["Widgets On Sale"]
+    assert idea.descriptions == ["Premium widgets for less."]
+    assert idea.final_url == "https://example.com/widgets"
+
+
+def test_renumber_and_key():
+    assert renumber_idea("# Idea 3: Widget Sale!\nBudget: £5", 1) == "# Idea #1: Widget Sale!\nBudget: £5"
+    assert idea_key("# Idea #4: Widget  Sale!") == "widget sale"
+
+
+def test_shard_sizes():
+    assert shard_sizes(20, 8) == [7, 7, 6]
+    assert shard_sizes(3, 8) == [3]
@@ -0,0 +1,98 @@
+import asyncio
+import os
+
+os.environ.setdefault("APP_URL", "http://localhost")
+
+from llama_index.core.instrumentation import get_dispatcher  # noqa: E402
+from llama_index.core.llms import ChatMessage  # noqa: E402
+import pytest  # noqa: E402
+from . import core  # noqa: E402
+
+RESPONSE = {
+    "output": {"message": {"role": "assistant", "content": [{"text": "Hello"}]}},
+    "stopReason": "end_turn",
+    "usage": {"inputTokens": 10, "outputTokens": 2, "totalTokens": 12},
+}
+
+
+class FakeBedrockClient:
+    def __init__(self, error=None):
+        self.error = error
+        self.calls = 0
+
+    async def converse(self, **kwargs):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return RESPONSE
+
+    async def converse_stream(self, **kwargs):
+        raise asyncio.CancelledError()
+
+
+class FakeClientContext:
+    def __init__(self, session):
+        self.session = session
+
+    async def __aenter__(self):
+        self.session.clients += 1
+        return self.session.client_
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+class FakeSession:
+    """An aioboto3 session that counts the clients opened from it."""
+
+    def __init__(self, error=None):
+        self.client_ = FakeBedrockClient(error)
+        self.clients = 0
+
+    def client(self, service_name, **kwargs):
+        assert service_name == "bedrock-runtime"
+        return FakeClientContext(self)
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    monkeypatch.setattr(core, "_llm", None)
+    # get_llm registers its event handlers once per process
+    monkeypatch.setattr(get_dispatcher(), "event_handlers", list(get_dispatcher().event_handlers))
+    for handler in get_dispatcher().event_handlers[:]:
+        if isinstance(handler, (core.LLMMetricsHandler, core.LLMTracingHandler)):
+            get_dispatcher().event_handlers.remove(handler)
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "eu-west-2")
+    monkeypatch.setenv("AWS_MODEL_NAME", "anthropic.claude-3-5-haiku-20241022-v1:0")
+    return asyncio.run(core.get_llm())
+
+
+def test_one_bedrock_client_is_shared_across_calls(llm):
+    session = FakeSession()
+    llm._asession._session = session
+
+    async def run():
+        for _ in range(2):
+            response = await llm.achat([ChatMessage(role="user", content="Hi")])
+            assert response.message.content == "Hello"
+
+    asyncio.run(run())
+    assert (session.clients, session.client_.calls) == (1, 2)
+
+
+def test_failed_and_cancelled_calls_are_cleaned_up(llm):
+    llm._asession._session = FakeSession(error=ValueError("throttled"))
+    llm.max_retries = 1
+
+    async def run():
+        with pytest.raises(ValueError):
+            await llm.achat([ChatMessage(role="user", content="Hi")])
+        stream = await llm.astream_chat([ChatMessage(role="user", content="Hi")])
+        with pytest.raises(asyncio.CancelledError):
+            async for _ in stream:
+                pass
+
+    asyncio.run(run())
+    handlers = get_dispatcher().event_handlers
+    assert [h.calls for h in handlers if isinstance(h, core.LLMMetricsHandler)] == [{}]
+    assert [h.spans for h in handlers if isinstance(h, core.LLMTracingHandler)] == [{}]
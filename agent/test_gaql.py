@@ -0,0 +1,67 @@
+import base64
+import json
+import pytest
+from .gaql import RESOURCES, _fingerprint, build_query, decode_cursor, encode_cursor
+
+
+def test_projection_and_filters_are_pushed_down():
+    query, fields = build_query("ad_groups", ["ad_group_name"], campaign_id="123-456", status="paused")
+    assert fields == ["ad_group_name"]
+    assert query == (
+        "SELECT ad_group.name, ad_group.id FROM ad_group "
+        "WHERE campaign.id = 123456 AND ad_group.status = 'PAUSED' ORDER BY ad_group.id"
+    )
+
+
+def test_all_fields_and_no_removed_rows_by_default():
+    query, fields = build_query("campaigns")
+    assert fields == list(RESOURCES["campaigns"]["fields"])
+    assert "campaign.status != 'REMOVED'" in query
+
+
+def test_keywords_are_ordered_uniquely_without_selecting_sort_fields_twice():
+    query, _ = build_query("keywords", ["text", "ad_group_id"])
+    assert query.startswith("SELECT ad_group_criterion.keyword.text, ad_group.id, ad_group_criterion.criterion_id FROM")
+    assert query.endswith("ORDER BY ad_group.id, ad_group_criterion.criterion_id")
+
+
+def test_text_filter_escapes_quotes_and_wildcards():
+    query, _ = build_query("campaigns", text_contains="50%_o'clock")
+    assert "campaign.name LIKE '%50[%][_]o\\'clock%'" in query
+
+
+@pytest.mark.parametrize("kwargs, message", [
+    ({"resource": "budgets"}, "Unknown resource"),
+    ({"resource": "ads", "fields": ["ad_name"]}, "Unknown fields"),
+    ({"resource": "campaigns", "campaign_id": "1 OR 1=1"}, "numeric ID"),
+    ({"resource": "campaigns", "ad_group_id": "1"}, "cannot be used"),
+    ({"resource": "ads", "text_contains": "x"}, "not supported"),
+    ({"resource": "ads", "status": "DELETED"}, "status must be"),
+])
+def test_invalid_arguments(kwargs, message):
+    with pytest.raises(ValueError, match=message):
+        build_query(**kwargs)
+
+
+def test_cursor_round_trip_and_query_binding():
+    query, _ = build_query("campaigns")
+    other, _ = build_query("campaigns", status="ENABLED")
+    cursor = encode_cursor(query, 200)
+    assert decode_cursor(query, cursor) == 200
+    assert decode_cursor(query, "") == 0
+    with pytest.raises(ValueError, match="does not belong"):
+        decode_cursor(other, cursor)
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(query, "not a cursor")
+
+
+@pytest.mark.parametrize("data", [
+    [1, 2], "cursor", 7, {"q": "x"}, {"o": "10"}, {"o": 1.5}, {"o": True}, {"o": -100},
+])
+def test_malformed_cursors_are_invalid(data):
+    query, _ = build_query("campaigns")
+    if isinstance(data, dict):
+        data = {"q": _fingerprint(query), **data}
+    cursor = base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(query, cursor)
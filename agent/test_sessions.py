@@ -0,0 +1,137 @@
+import asyncio
+import os
+
+os.environ.setdefault("APP_URL", "http://localhost")
+
+from llama_index.core.llms import ChatMessage  # noqa: E402
+from llama_index.core.llms.mock import MockFunctionCallingLLM  # noqa: E402
+from . import core, sessions  # noqa: E402
+from .sessions import SessionStore, SpilledSession  # noqa: E402
+
+
+def make_store(**kwargs):
+    evicted = []
+    store = SessionStore(lambda user_id, session: evicted.append(user_id), **kwargs)
+    return store, evicted
+
+
+def backdate(store, user_id, seconds):
+    last_active, session = store._sessions[user_id]
+    store._sessions[user_id] = (last_active - seconds, session)
+
+
+def test_expire_evicts_idle_sessions_only():
+    store, evicted = make_store(timeout=60)
+    store["a"] = "A"
+    store["b"] = "B"
+    backdate(store, "a", 61)
+    assert store.expire() == 1
+    assert evicted == ["a"]
+    assert "b" in store
+
+
+def test_expire_skips_held_sessions():
+    store, evicted = make_store(timeout=60)
+    store["a"] = "A"
+    store["b"] = "B"
+    store.hold("a")
+    backdate(store, "a", 120)
+    backdate(store, "b", 61)
+    assert store.expire() == 1
+    assert evicted == ["b"]
+    # The end of the turn counts as activity
+    store.release("a")
+    assert store.expire() == 0
+    assert list(store._sessions) == ["a"]
+
+
+def test_session_limit_evicts_least_recently_active_unheld():
+    store, evicted = make_store(max_sessions=2)
+    store["a"] = "A"
+    store["b"] = "B"
+    store.hold("a")
+    store["c"] = "C"
+    assert evicted == ["b"]
+    store.hold("c")
+    # Everyone else is in a turn, so the limit is exceeded rather than cutting one short
+    store["d"] = "D"
+    assert evicted == ["b"]
+    assert len(store) == 3
+
+
+def test_wait_for_expiry_waits_for_an_unheld_session():
+    async def run():
+        store, _ = make_store(timeout=60)
+        store["a"] = "A"
+        store.hold("a")
+        waiter = asyncio.create_task(store.wait_for_expiry())
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+        store.release("a")
+        await asyncio.wait_for(waiter, 1)
+
+    asyncio.run(run())
+
+
+def test_spill_skips_held_sessions(monkeypatch):
+    async def fake_spill(session):
+        return SpilledSession(session, f"/tmp/{session}.json", {}, [])
+
+    monkeypatch.setattr(sessions, "spill_session", fake_spill)
+
+    async def run():
+        store, _ = make_store(spill_after=60, max_resident=0)
+        store["a"] = "A"
+        store["b"] = "B"
+        store.hold("a")
+        backdate(store, "a", 61)
+        backdate(store, "b", 61)
+        assert await store.spill_next()
+        assert isinstance(store["b"], SpilledSession)
+        assert store["a"] == "A"
+        assert not await store.spill_next()
+        assert (store.resident, store.spilled) == (1, 1)
+
+    asyncio.run(run())
+
+
+def count_user_messages(messages, **kwargs):
+    """Replies with how many user messages the agent was sent, so a lost history shows up."""
+    n = sum(m.role.value == "user" for m in messages)
+    return ChatMessage(role="assistant", content=f"{n} user messages")
+
+
+def test_spilled_session_keeps_its_history(monkeypatch, tmp_path):
+    monkeypatch.setattr(core, "_llm", MockFunctionCallingLLM(response_generator=count_user_messages))
+    monkeypatch.setattr(core, "_agent", None)
+    monkeypatch.setattr(core, "_workflow", None)
+    monkeypatch.setattr(sessions, "SPILL_DIR", str(tmp_path))
+
+    async def turn(session, message):
+        workflow, context, memory, _, _ = session
+        return str(await workflow.run(user_msg=message, ctx=context, memory=memory))
+
+    async def run():
+        workflow, context, memory = await core.create_agent()
+        await context.store.set("user_id", "a")
+        session = (workflow, context, memory, {"refresh_token": "t"}, 0)
+        assert await turn(session, "Find keywords for my shop") == "1 user messages"
+
+        spilled = await sessions.spill_session(session)
+        assert os.path.exists(spilled.path)
+        session = await sessions.restore_session(spilled)
+        assert not os.path.exists(spilled.path)
+        assert session[2].session_id == memory.session_id
+        assert session[3] == {"refresh_token": "t"}
+        assert await session[1].store.get("user_id") == "a"
+        assert await turn(session, "Now make a campaign") == "2 user messages"
+
+    asyncio.run(run())
+
+
+def test_writes_move_sessions_to_the_end():
+    store, _ = make_store()
+    store["a"] = "A"
+    store["b"] = "B"
+    store["a"] = "A2"
+    assert [user_id for user_id, _ in store.items()] == ["b", "a"]
@@ -1,19 +1,23 @@
 import asyncio
-import aiohttp
-import functools
-from google.ads.googleads.client import GoogleAdsClient
+import heapq
+from contextlib import aclosing
 from google.ads.googleads.v22.common.types import AdTextAsset
 from google.ads.googleads.v22.enums.types import AdGroupAdStatusEnum
 from google.protobuf.field_mask_pb2 import FieldMask
 from llama_index.core.workflow import Context
-from llama_index.core.llms import ChatMessage
-from helpers.file_helpers import create_keyword_report_file, file_to_text, create_ads_campaign_file, sanitize_text, text_to_file
-from . import core
+from helpers.file_helpers import FileExpiredError, KeywordReportWriter, append_to_file, file_to_text, finish_report, create_ads_campaign_file, read_text_range, sanitize_text, text_to_file
+from helpers.google_ads_client import AsyncGoogleAdsClient
+from helpers.metrics import run_in_executor
+from helpers.scraper import CRAWL_MAX_PAGES, crawl as crawl_site, scrape
+from .ad_policy import AdPolicyError, enforce_ad_policy
+from .artifacts import add_text, registry_for, summarize_text
+from .account_model import Account, add_ad_group_row, ad_from_row, csv_table, keyword_from_criterion, micros_to_gbp, to_compact_text
+from .gaql import MAX_PAGE_SIZE, build_query, decode_cursor, encode_cursor, format_rows
+from .campaign_ideas import DEFAULT_KEYWORD_CPC, CampaignIdeaProgress, find_idea_block, generate_ideas, idea_summary, idea_title, parse_idea_block
+from . import core, prefetch
 import os
-import re
 import time
 import base64
-from bs4 import BeautifulSoup
 
 
 DEVELOPER_TOKEN = os.getenv("GOOGLE_ADS_DEVELOPER_TOKEN", "")
@@ -32,16 +36,7 @@ async def get_google_client(ctx: Context):
         url_safe_id = base64.urlsafe_b64encode(user_id.encode()).decode()
         return f"To use this tool, the user must authenticate via this link: {APP_URL}/authenticate?userId={url_safe_id}"
 
-    credentials = {
-        "developer_token": DEVELOPER_TOKEN,
-        "refresh_token": refresh_token,
-        "client_id": CLIENT_ID,
-        "client_secret": CLIENT_SECRET,
-        "use_proto_plus": True,
-        "login_customer_id": MANAGER_ID
-    }
-
-    return GoogleAdsClient.load_from_dict(credentials)
+    return AsyncGoogleAdsClient(refresh_token, DEVELOPER_TOKEN, login_customer_id=MANAGER_ID)
 
 
 async def run_blocking(func, *args, **kwargs):
@@ -49,50 +44,109 @@ async def run_blocking(func, *args, **kwargs):
     Run a blocking function in the default ThreadPoolExecutor and return result.
     Use this to wrap any blocking I/O, network calls that are not async, CPU heavy tasks, etc.
     """
-    loop = asyncio.get_running_loop()
-    partial = functools.partial(func, *args, **kwargs)
-    return await loop.run_in_executor(None, partial)
+    return await run_in_executor(func, *args, **kwargs)
 
 
-async def get_data_from_urls(ctx: Context, urls: list) -> str:
-    """Reads raw text data from URLs and saves to the user's data store."""
-    organized = ""
+async def get_data_from_urls(ctx: Context, urls: list, crawl: bool = False, max_pages: int = CRAWL_MAX_PAGES) -> str:
+    """
+    Reads raw text data from URLs and saves it to the user's data store as artifacts, which are used as
+    reference data for campaign ideas. Returns the artifact IDs; use read_artifact to read the text.
+    Set crawl to True to read a whole website instead: each URL (a page or a sitemap.xml) is the start of a crawl
+    of up to max_pages pages on the same site, saved as one artifact per site.
+    """
+    saved = []
+    failed = []
     try:
         user_id = await ctx.store.get("user_id")
         uploaded_files = await ctx.store.get("uploaded_files", [])
-
-        async with aiohttp.ClientSession() as session:
-            for url in urls:
-                try:
-                    async with session.get(url) as response:
-                        response.raise_for_status()
-                        data = await response.text()
-                        soup = BeautifulSoup(data, "html.parser")
-                        data = soup.get_text(separator=" ", strip=True)
-                except Exception as inner_e:
-                    print(f"Failed to fetch {url}: {inner_e}")
+        registry = await registry_for(ctx)
+
+        if crawl:
+            max_pages = max(1, min(int(max_pages), CRAWL_MAX_PAGES))
+            sites = await asyncio.gather(*(crawl_site(url, max_pages=max_pages) for url in urls))
+            for url, pages in zip(urls, sites):
+                if not pages:
+                    failed.append(f"{url} (no pages could be read)")
+                    continue
+                corpus = "\n\n".join(f"URL: {page.url}\n{page.text}" for page in pages)
+                local_path = await run_blocking(text_to_file, user_id, corpus, "site_data")
+                uploaded_files.append(local_path)
+                saved.append(add_text(registry, "url_data", local_path, f"{url} ({len(pages)} pages)", corpus))
+        else:
+            for page in await scrape(urls):
+                if page.error:
+                    print(f"Failed to fetch {page.url}: {page.error}")
+                    failed.append(f"{page.url} ({page.error})")
                     continue
-                if not data:
+                if not page.text:
                     continue
                 # Prepare organized text
-                wrapped = f"URL:\n{url}\n\nContent:\n{data}\n"
-                organized += wrapped
+                wrapped = f"URL:\n{page.url}\n\nContent:\n{page.text}\n"
 
                 # Save to file
-                local_path = text_to_file(user_id, wrapped, "url_data")
+                local_path = await run_blocking(text_to_file, user_id, wrapped, "url_data")
 
                 # Track uploaded files
                 uploaded_files.append(local_path)
+                saved.append(add_text(registry, "url_data", local_path, page.url, page.text))
 
         await ctx.store.set("uploaded_files", uploaded_files)
-        return organized
+        failures = f"\n\nCould not read: {', '.join(failed)}" if failed else ""
+        if not saved:
+            return "No data could be read from the URLs." + failures
+        return "Saved URL data (artifact ID | kind | name | size | summary):\n" + "\n".join(a.describe() for a in saved) + failures
     except Exception as e:
         print(f"Error in get_data_from_urls: {e}", flush=True)
         return ""
 
 
+# Total keyword ideas kept across all seeds.
+KEYWORD_RESULTS_LIMIT = 1000
+# Number of top keywords (by search volume, then lowest competition) returned to the agent.
+KEYWORD_SUMMARY_SIZE = int(os.getenv("KEYWORD_SUMMARY_SIZE", 50))
+
+
+def keyword_rank(row: dict):
+    return (row["avg_monthly_searches"], -row["competition_index"])
+
+
+def normalize_keyword(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def merge_keyword_idea(index: dict, row: dict) -> bool:
+    """
+    Adds a keyword idea to the index keyed by normalized keyword text. When the keyword
+    is already present the row with the better metrics is kept. Returns True for new keywords.
+    """
+    key = normalize_keyword(row["keyword"])
+    existing = index.get(key)
+    if existing is None:
+        index[key] = row
+        return True
+    if keyword_rank(row) > keyword_rank(existing):
+        index[key] = row
+    return False
+
+
+def summarize_keywords(rows) -> str:
+    """Formats the top keyword ideas as a compact CSV table, best first."""
+    top = heapq.nlargest(KEYWORD_SUMMARY_SIZE, rows, key=keyword_rank)
+    return csv_table(
+        ["keyword", "avg_monthly_searches", "competition", "low_bid_gbp", "high_bid_gbp"],
+        (
+            (row["keyword"], row["avg_monthly_searches"], row["competition"],
+             micros_to_gbp(row["low_bid"]) or 0, micros_to_gbp(row["high_bid"]) or 0)
+            for row in top
+        ),
+    )
+
+
 async def google_ads_keyword_search(ctx: Context, keywords: list) -> str:
-    """Conducts a Google Ads Keyword search and returns keyword stats, up to 2000 total results."""
+    """
+    Conducts a Google Ads Keyword search, up to 1000 unique keywords in total. All results are written to a downloadable
+    spreadsheet; the top keywords by search volume and competition are returned with their stats.
+    """
     try:
         print(f"Keywords: {keywords}", flush=True)
         client = await get_google_client(ctx)
@@ -100,7 +154,6 @@ async def google_ads_keyword_search(ctx: Context, keywords: list) -> str:
             return client
         
         customer_id = await ctx.store.get("google_customer_id", "")
-        keyword_plan_idea_service = client.get_service("KeywordPlanIdeaService")
 
         language_id = "1000"  # English
         language_resource_name = f"languageConstants/{language_id}"
@@ -108,12 +161,16 @@ async def google_ads_keyword_search(ctx: Context, keywords: list) -> str:
         uk_geo_target_id = "2840"
         geo_target_resource_name = f"geoTargetConstants/{uk_geo_target_id}"
 
-        results = []
+        # Overlapping seeds return many of the same ideas, so merge them on normalized keyword text
+        index = {}
 
-        # Limit per keyword
-        per_seed_limit = max(1, 1000 // len(keywords))
+        for n_seed, seed_word in enumerate(keywords):
+            # Limit per keyword. Quota a seed doesn't use (too few ideas) passes on to the remaining seeds.
+            remaining = KEYWORD_RESULTS_LIMIT - len(index)
+            if remaining <= 0:
+                break
+            per_seed_limit = max(1, remaining // (len(keywords) - n_seed))
 
-        for seed_word in keywords:
             request = client.get_type("GenerateKeywordIdeasRequest")
             request.customer_id = customer_id
             request.keyword_plan_network = client.enums.KeywordPlanNetworkEnum.GOOGLE_SEARCH_AND_PARTNERS
@@ -122,36 +179,52 @@ async def google_ads_keyword_search(ctx: Context, keywords: list) -> str:
             request.keyword_seed.keywords.append(seed_word)
 
             await asyncio.sleep(4)
-            response = await run_blocking(keyword_plan_idea_service.generate_keyword_ideas, request=request)
-            await asyncio.sleep(1)
-            ideas = list(response)
-
-            # Apply limit safely, no index error
-            limited_ideas = ideas[:per_seed_limit]
-
-            for idea in limited_ideas:
-                metrics = idea.keyword_idea_metrics
-                results.append({
-                    "keyword": idea.text,
-                    "avg_monthly_searches": metrics.avg_monthly_searches,
-                    "competition": metrics.competition.name,
-                    "low_bid": metrics.low_top_of_page_bid_micros,
-                    "high_bid": metrics.high_top_of_page_bid_micros,
-                    "competition_index": metrics.competition_index,
-                })
+            n_new = 0
+            # Closed right away on break, ending the RPC's metrics and span instead of leaving them to GC
+            async with aclosing(client.generate_keyword_ideas(request)) as ideas:
+                async for idea in ideas:
+                    # Stop reading (and paging) once the per-seed limit of new keywords is reached.
+                    # Duplicates of earlier seeds' ideas don't use up the quota.
+                    if n_new >= per_seed_limit:
+                        break
+                    metrics = idea.keyword_idea_metrics
+                    row = {
+                        "keyword": idea.text,
+                        "avg_monthly_searches": metrics.avg_monthly_searches,
+                        "competition": metrics.competition.name,
+                        "low_bid": metrics.low_top_of_page_bid_micros,
+                        "high_bid": metrics.high_top_of_page_bid_micros,
+                        "competition_index": metrics.competition_index,
+                    }
+                    if merge_keyword_idea(index, row):
+                        n_new += 1
 
             await asyncio.sleep(1)
 
-        if not results:
+        if not index:
             return "No keyword data found for the provided search terms."
 
-        report_download_url, report_file_path = await create_keyword_report_file(results)
+        writer = KeywordReportWriter(owner=await ctx.store.get("user_id", ""))
+        try:
+            for row in index.values():
+                await writer.write(row)
+            report_download_url, report_file_path = await writer.close()
+        except BaseException:
+            # Also on cancellation, so a half-written report isn't left behind
+            await asyncio.shield(writer.abort())
+            raise
         await ctx.store.set('keywords_search_file', report_file_path)
+        registry = await registry_for(ctx)
+        artifact = registry.add(
+            "keywords", report_file_path, f"keyword search: {', '.join(keywords)}", f"{len(index)} keywords",
+            summarize_text(", ".join(row["keyword"] for row in heapq.nlargest(10, index.values(), key=keyword_rank))),
+        )
 
         return (
             f"In-depth keyword statistics spreadsheet download URL:\n{report_download_url}\n\n"
-            f"Keyword search data file path:\n{report_file_path}\n\n"
-            f"Keyword search data:\n{str(results)}."
+            f"Keyword search data artifact ID: {artifact.id}\n\n"
+            f"Top {min(KEYWORD_SUMMARY_SIZE, len(index))} of {len(index)} unique keywords by search volume and competition (full data is in the file):\n"
+            f"{summarize_keywords(index.values())}"
         )
 
     except Exception as e:
@@ -159,22 +232,28 @@ async def google_ads_keyword_search(ctx: Context, keywords: list) -> str:
         return f"Error conducting keyword search: {str(e)}"
 
 
-async def create_campaign_ideas_report(ctx: Context, additional_notes: str, n_ideas: int) -> str:
+async def create_campaign_ideas_report(ctx: Context, additional_notes: str, n_ideas: int, artifact_ids: list = None) -> str:
     '''
-    Uses an LLM to generate n Google Ads Campaign ideas based on the given reference data. Keyword searches and user uploads are automatically given to the LLM.
+    Uses an LLM to generate n Google Ads Campaign ideas based on the given reference data. The latest keyword search and the user's uploads/URL data are automatically given to the LLM,
+    or pass artifact_ids to choose the reference data yourself.
     Use additional_notes for any requests the user has about the campaign idea generation or any additional instructions you have for the ideas generation AI.
     '''
     try:
         llm = await core.get_llm()
+        registry = await registry_for(ctx)
 
         reference_data_file_paths = []
-        keywords_file = await ctx.store.get('keywords_search_file', '')
-        uploaded_files = await ctx.store.get('uploaded_files', [])
-
-        if keywords_file:
-            reference_data_file_paths.append(keywords_file)
-        if uploaded_files:
-            reference_data_file_paths.extend(uploaded_files)
+        if artifact_ids:
+            for artifact_id in artifact_ids:
+                artifact = registry.get(str(artifact_id))
+                if artifact is None:
+                    return f"Unknown artifact ID: {artifact_id}. Use list_artifacts to see the available artifacts."
+                reference_data_file_paths.append(artifact.path)
+        else:
+            keywords_file = await ctx.store.get('keywords_search_file', '')
+            if keywords_file:
+                reference_data_file_paths.append(keywords_file)
+            reference_data_file_paths.extend(a.path for a in registry.list("upload", "url_data"))
 
         reference_data_parts = []
         for data_file in reference_data_file_paths:
@@ -183,36 +262,66 @@ async def create_campaign_ideas_report(ctx: Context, additional_notes: str, n_id
 
         reference_data = "\n\n".join(reference_data_parts)
 
-        # Read prompts/templates from files
-        def read_file(path):
-            with open(path, "r", encoding="utf-8") as f:
-                return f.read()
+        # Ideas are written to the file, and reported to the user, as soon as each one is complete
+        user_id = await ctx.store.get("user_id", "")
+        download_url, file_path = await run_blocking(create_ads_campaign_file, "", user_id)
+        await ctx.store.set('campaign_ideas_file', file_path)
+
+        async def add_idea(block):
+            await run_blocking(append_to_file, file_path, f"{block}\n\n---\n\n")
+            ctx.write_event_to_stream(CampaignIdeaProgress(message=f"Campaign idea ready: {idea_title(block)}"))
+
+        ideas = await generate_ideas(llm, reference_data, n_ideas, additional_notes, add_idea)
+        ideas_file = await run_blocking(finish_report, file_path, user_id)
+        await ctx.store.set('campaign_ideas_file', ideas_file)
 
-        content_gen_prompt = await run_blocking(read_file, "/app/agent/ai_content_generation_prompt.md")
-        campaign_ideas_example = await run_blocking(read_file, "/app/agent/campaign_ideas_layout.md")
-        template_instructions = await run_blocking(read_file, "/app/agent/template_instructions.md")
+        if not ideas:
+            return "The campaign ideas generator did not return any ideas, try again."
+        artifact = registry.add("campaign_ideas", ideas_file, "campaign ideas", f"{len(ideas)} ideas", summarize_text(", ".join(idea_title(b) for b in ideas)))
 
-        system_prompt = (
-            f"You are a helpful assistant. Your job is to generate exactly {n_ideas} Google Ads Campaign ideas "
-            f"based on the user's reference data.\n\nUse these guidlines as a reference:\n\n{content_gen_prompt}\n\n"
-            f"Your campaign ideas should follow this exact layout example:\n\n{campaign_ideas_example}, be sure strictly to adhere to these rules when creating the template:\n\n{template_instructions}\nAdditional Notes:\n{additional_notes}\n"
-            "YOU MUST STRICTLY ADHERE TO CHARACTER LIMITS FOR HEADLINES (MAX 28 chars) AND DESCRIPTIONS (MAX 80 chars)."
+        idea_lines = "\n".join(f"- {idea_summary(block)}" for block in ideas)
+        return (
+            f"Google Ads Campaign ideas download URL for user: {download_url}.\n"
+            f"Campaign ideas artifact ID: {artifact.id}\n\n"
+            f"Generated {len(ideas)} campaign ideas (full details are in the file):\n{idea_lines}\n\n"
+            "Next see if the user would like to select a campaign from the generated ideas and use the generate_search_campaign function to do this."
         )
+    except FileExpiredError as e:
+        return str(e)
+    except Exception as e:
+        print(e)
+        return f"Error generating campaign ideas: {e}"
 
-        messages = [
-            ChatMessage(role="user", content=f"Reference Data:\n\n{reference_data}"),
-            ChatMessage(role="system", content=system_prompt)
-        ]
 
-        response = await llm.achat(messages)
+async def list_artifacts(ctx: Context) -> str:
+    """
+    Lists the files available in this session (uploads, URL data, keyword searches, campaign ideas and saved earlier outputs)
+    with their artifact ID, size and a short summary. Use read_artifact to read one.
+    """
+    artifacts = (await registry_for(ctx)).list()
+    if not artifacts:
+        return "There are no artifacts in this session."
+    return "artifact ID | kind | name | size | summary\n" + "\n".join(a.describe() for a in artifacts)
 
-        download_url, file_path = await run_blocking(create_ads_campaign_file, str(response))
-        await ctx.store.set('campaign_ideas_file', file_path)
 
-        return f"Google Ads Campaign ideas download URL for user: {download_url}.\n\nCampaign ideas file contents:\n{str(response)}\n\nNext see if the user would like to select a campaign from the generated ideas and use the generate_search_campaign function to do this."
+async def read_artifact(ctx: Context, artifact_id: str, offset: int = 0, max_chars: int = 4000) -> str:
+    """
+    Reads part of an artifact's content by its ID (e.g. "a3"), starting at character offset.
+    Only read what you need; read further with a larger offset if required.
+    """
+    try:
+        artifact = (await registry_for(ctx)).get(str(artifact_id))
+        if artifact is None:
+            return f"Unknown artifact ID: {artifact_id}. Use list_artifacts to see the available artifacts."
+        max_chars = max(1, min(int(max_chars), 20000))
+        text = await run_blocking(read_text_range, artifact.path, int(offset), max_chars)
+        if not text:
+            return "No more content in this artifact."
+        return text
+    except FileExpiredError as e:
+        return str(e)
     except Exception as e:
-        print(e)
-        return f"Error generating campaign ideas: {e}"
+        return f"There was an error: {e}"
 
 
 async def read_campaign_ideas_names(ctx: Context) -> list:
@@ -227,6 +336,8 @@ async def read_campaign_ideas_names(ctx: Context) -> list:
             return idea_titles
         else:
             return "There are no campaign ideas available."
+    except FileExpiredError as e:
+        return str(e)
     except Exception as e:
         return f"There was an error: {e}"
 
@@ -257,25 +368,30 @@ async def generate_search_campaign(ctx: Context, selected_campaign: str) -> str:
         if selected_campaign.lower() not in idea_text.lower():
             return "Campaign idea not found in file."
 
-        selected_block = ""
-        for block in idea_text.split("---"):
-            if selected_campaign.lower() in block.lower():
-                selected_block = block
-                break
-
+        selected_block = find_idea_block(idea_text, selected_campaign)
         if not selected_block:
             return "Could not extract campaign section."
 
         # ---------------------------------------------------------------------
-        # 1. Extract Budget
+        # 1. Extract Budget, Keywords, Negative Keywords, Headlines, Descriptions, Final URL
         # ---------------------------------------------------------------------
-        budget_match = re.search(
-            r"Budget:\s*£?(\d+(?:\.\d+)?)(?:\s*/\s*day)?",
-            selected_block,
-            re.IGNORECASE,
-        )
-        budget_daily = float(budget_match.group(1)) if budget_match else 5.0
+        idea = parse_idea_block(selected_block)
+        budget_daily = idea.budget_daily
         budget_micros = int(budget_daily * 1_000_000)
+        keywords, keyword_cpcs = idea.keywords, idea.keyword_cpcs
+        negative_keywords = idea.negative_keywords
+        headlines = [sanitize_text(h) for h in idea.headlines]
+        descriptions = [sanitize_text(d) for d in idea.descriptions]
+        final_url = idea.final_url
+
+        if not keywords:
+            keywords = [selected_campaign]
+            keyword_cpcs = [DEFAULT_KEYWORD_CPC]
+
+        # Fix headline/description policy problems before anything is created; the checked text is sent as is
+        llm = await core.get_llm()
+        [ad_assets] = await enforce_ad_policy([{"headlines": headlines, "descriptions": descriptions}], llm)
+        headlines, descriptions = ad_assets["headlines"], ad_assets["descriptions"]
 
         # ---------------------------------------------------------------------
         # 2. Create Campaign Budget
@@ -287,8 +403,7 @@ async def generate_search_campaign(ctx: Context, selected_campaign: str) -> str:
         budget.delivery_method = client.enums.BudgetDeliveryMethodEnum.STANDARD
         budget.amount_micros = budget_micros
 
-        budget_response = await run_blocking(
-            budget_service.mutate_campaign_budgets,
+        budget_response = await budget_service.mutate_campaign_budgets(
             customer_id=customer_id,
             operations=[budget_operation],
         )
@@ -320,8 +435,7 @@ async def generate_search_campaign(ctx: Context, selected_campaign: str) -> str:
             client.enums.PositiveGeoTargetTypeEnum.PRESENCE_OR_INTEREST
         )
 
-        campaign_response = await run_blocking(
-            campaign_service.mutate_campaigns,
+        campaign_response = await campaign_service.mutate_campaigns(
             customer_id=customer_id,
             operations=[campaign_operation],
         )
@@ -337,68 +451,14 @@ async def generate_search_campaign(ctx: Context, selected_campaign: str) -> str:
         ad_group.campaign = campaign_resource
         ad_group.status = client.enums.AdGroupStatusEnum.ENABLED
 
-        ad_group_response = await run_blocking(
-            ad_group_service.mutate_ad_groups,
+        ad_group_response = await ad_group_service.mutate_ad_groups(
             customer_id=customer_id,
             operations=[ad_group_operation],
         )
         ad_group_resource = ad_group_response.results[0].resource_name
 
         # ---------------------------------------------------------------------
-        # 5. Extract Keywords, Negative Keywords, Headlines, Descriptions, Final URL
-        # ---------------------------------------------------------------------
-        def extract_section(text, section_name, next_section_name=None):
-            section = text.split(f"{section_name}:", 1)
-            if len(section) < 2:
-                return ""
-            content = section[1]
-            if next_section_name and next_section_name in content:
-                content = content.split(next_section_name, 1)[0]
-            return content.strip()
-
-        keywords_section = extract_section(selected_block, "Keywords", "Negative Keywords")
-        negative_section = extract_section(selected_block, "Negative Keywords", "Headlines")
-        headlines_section = extract_section(selected_block, "Headlines", "Descriptions")
-        descriptions_section = extract_section(selected_block, "Descriptions", "Final URL")
-        final_url = extract_section(selected_block, "Final URL")
-
-        # Parse lines
-        def parse_lines(section):
-            lines = []
-            for line in section.splitlines():
-                line = line.strip()
-                if not line:
-                    continue
-                if line.startswith("- "):
-                    line = line[2:]
-                lines.append(line)
-            return lines
-
-        keywords = []
-        keyword_cpcs = []
-        for line in parse_lines(keywords_section):
-            if "{" in line and "}" in line:
-                kw = line.split("{")[0].strip()
-                try:
-                    cpc = int(line.split("{")[1].replace("}", "").strip())
-                except Exception:
-                    cpc = 1_500_000
-                keywords.append(kw)
-                keyword_cpcs.append(cpc)
-            else:
-                keywords.append(line)
-                keyword_cpcs.append(1_500_000)
-
-        negative_keywords = parse_lines(negative_section)
-        headlines = parse_lines(headlines_section)
-        descriptions = parse_lines(descriptions_section)
-
-        if not keywords:
-            keywords = [selected_campaign]
-            keyword_cpcs = [1_500_000]
-
-        # ---------------------------------------------------------------------
-        # 6. Add Keywords to Ad Group
+        # 5. Add Keywords to Ad Group
         # ---------------------------------------------------------------------
         keyword_service = client.get_service("AdGroupCriterionService")
         keyword_ops = []
@@ -413,14 +473,13 @@ async def generate_search_campaign(ctx: Context, selected_campaign: str) -> str:
             criterion.cpc_bid_micros = (cpc // BILLABLE_UNIT) * BILLABLE_UNIT
             keyword_ops.append(op)
 
-        await run_blocking(
-            keyword_service.mutate_ad_group_criteria,
+        await keyword_service.mutate_ad_group_criteria(
             customer_id=customer_id,
             operations=keyword_ops,
         )
 
         # ---------------------------------------------------------------------
-        # 7. Add Negative Keywords via Shared Set
+        # 6. Add Negative Keywords via Shared Set
         # ---------------------------------------------------------------------
         # if negative_keywords:
         #     # Create shared set
@@ -482,18 +541,17 @@ async def generate_search_campaign(ctx: Context, selected_campaign: str) -> str:
         rsa = client.get_type("ResponsiveSearchAdInfo")
         for headline in headlines:
             asset = client.get_type("AdTextAsset")
-            asset.text = sanitize_text(headline)
+            asset.text = headline
             rsa.headlines.append(asset)
         for description in descriptions:
             asset = client.get_type("AdTextAsset")
-            asset.text = sanitize_text(description)
+            asset.text = description
             rsa.descriptions.append(asset)
 
         ad.responsive_search_ad = rsa
         ad_group_ad.ad = ad
 
-        await run_blocking(
-            ad_service.mutate_ad_group_ads,
+        await ad_service.mutate_ad_group_ads(
             customer_id=customer_id,
             operations=[ad_operation],
         )
@@ -509,24 +567,31 @@ async def generate_search_campaign(ctx: Context, selected_campaign: str) -> str:
             "Ad is paused for review."
         )
 
+    except AdPolicyError as e:
+        return f"Campaign not created: {e}"
+    except FileExpiredError as e:
+        return f"Campaign not created: {e}"
     except Exception as e:
         print(e, flush=True)
         return f"Error creating search campaign: {e}"
 
 
 async def get_all_google_ads_campaign_details(ctx: Context):
-    """Fetch ALL campaigns along with their ad groups, ads, keywords, and budgets."""
+    """Fetch ALL campaigns along with their ad groups, ads, keywords, and budgets. On large accounts use query_google_ads_account instead."""
     customer_id = await ctx.store.get("google_customer_id", "")
+    refresh_token = await ctx.store.get("google_refresh_token", "")
 
     client = await get_google_client(ctx)
     if isinstance(client, str):
         return client
 
-    ga_service = client.get_service("GoogleAdsService")
-    budget_service = client.get_service("CampaignBudgetService")
+    # Usually already prefetched in the background when the session started, with the same credentials
+    return await prefetch.get_snapshot(refresh_token, customer_id, load_account_snapshot, client, customer_id)
 
-    def fetch_all_details_sync():
-        results = {"campaigns": {}}
+
+async def load_account_snapshot(client: AsyncGoogleAdsClient, customer_id: str) -> str:
+    async def fetch_all_details():
+        account = Account()
 
         # ----------------- 1. Campaigns + Ad Groups -----------------
         query_campaigns = """
@@ -544,124 +609,70 @@ async def get_all_google_ads_campaign_details(ctx: Context):
             ORDER BY campaign.id, ad_group.id
         """
 
-        stream = ga_service.search_stream(customer_id=customer_id, query=query_campaigns)
-        for batch in stream:
-            for row in batch.results:
-                c = row.campaign
-                ag = row.ad_group
-                campaign_id = c.id
-                ag_id = ag.id
-
-                # ----------------- Get actual budget amount -----------------
-                budget_amount = None
-                if c.campaign_budget:
-                    budget_query = f"""
-                        SELECT
-                            campaign_budget.amount_micros
-                        FROM campaign_budget
-                        WHERE campaign_budget.resource_name = '{c.campaign_budget}'
-                    """
-                    budget_stream = ga_service.search_stream(customer_id=customer_id, query=budget_query)
-                    for b_batch in budget_stream:
-                        for b_row in b_batch.results:
-                            budget_amount = b_row.campaign_budget.amount_micros / 1_000_000  # Convert to standard units (£/day)
-
-                if campaign_id not in results["campaigns"]:
-                    results["campaigns"][campaign_id] = {
-                        "id": c.id,
-                        "name": c.name,
-                        "budget": budget_amount,
-                        "status": getattr(c.status, "name", c.status),
-                        "serving_status": getattr(c.serving_status, "name", c.serving_status),
-                        "ad_groups": {}
-                    }
-
-                campaign = results["campaigns"][campaign_id]
-                if ag_id not in campaign["ad_groups"]:
-                    campaign["ad_groups"][ag_id] = {
-                        "id": ag.id,
-                        "name": ag.name,
-                        "status": getattr(ag.status, "name", ag.status),
-                        "ads": [],
-                        "keywords": [],
-                        "negative_keywords": []
-                    }
+        async for row in client.search_stream(customer_id, query_campaigns):
+            c = row.campaign
 
-        # ----------------- 2. Ads -----------------
-        for campaign_id, campaign in results["campaigns"].items():
-            for ag_id, ad_group in campaign["ad_groups"].items():
-                query_ads = f"""
+            # ----------------- Get actual budget amount -----------------
+            budget_amount = None
+            if c.campaign_budget and c.id not in account.campaigns:
+                budget_query = f"""
                     SELECT
-                        ad_group_ad.ad.id,
-                        ad_group_ad.status,
-                        ad_group_ad.ad.final_urls,
-                        ad_group_ad.ad.responsive_search_ad.headlines,
-                        ad_group_ad.ad.responsive_search_ad.descriptions
-                    FROM ad_group_ad
-                    WHERE ad_group_ad.ad_group = 'customers/{customer_id}/adGroups/{ag_id}'
+                        campaign_budget.amount_micros
+                    FROM campaign_budget
+                    WHERE campaign_budget.resource_name = '{c.campaign_budget}'
                 """
-                stream_ads = ga_service.search_stream(customer_id=customer_id, query=query_ads)
-                for batch in stream_ads:
-                    for row in batch.results:
-                        ad_obj = row.ad_group_ad.ad
-                        ad_group["ads"].append({
-                            "id": ad_obj.id,
-                            "status": getattr(row.ad_group_ad, "status", None),
-                            "final_urls": list(ad_obj.final_urls),
-                            "headlines": [h.text for h in getattr(ad_obj.responsive_search_ad, "headlines", [])],
-                            "descriptions": [d.text for d in getattr(ad_obj.responsive_search_ad, "descriptions", [])],
-                        })
+                async for b_row in client.search_stream(customer_id, budget_query):
+                    budget_amount = b_row.campaign_budget.amount_micros / 1_000_000  # Convert to standard units (£/day)
+
+            add_ad_group_row(account, row, budget_amount)
+
+        # ----------------- 2. Ads -----------------
+        for ad_group in account.ad_groups():
+            query_ads = f"""
+                SELECT
+                    ad_group_ad.ad.id,
+                    ad_group_ad.status,
+                    ad_group_ad.ad.final_urls,
+                    ad_group_ad.ad.responsive_search_ad.headlines,
+                    ad_group_ad.ad.responsive_search_ad.descriptions
+                FROM ad_group_ad
+                WHERE ad_group_ad.ad_group = 'customers/{customer_id}/adGroups/{ad_group.id}'
+            """
+            async for row in client.search_stream(customer_id, query_ads):
+                ad_group.ads.append(ad_from_row(row))
 
         # ----------------- 3. Keywords -----------------
-        for campaign_id, campaign in results["campaigns"].items():
-            for ag_id, ad_group in campaign["ad_groups"].items():
-                query_keywords = f"""
-                    SELECT
-                        ad_group_criterion.keyword.text,
-                        ad_group_criterion.keyword.match_type,
-                        ad_group_criterion.status,
-                        ad_group_criterion.cpc_bid_micros
-                    FROM ad_group_criterion
-                    WHERE ad_group_criterion.type = KEYWORD
-                      AND ad_group_criterion.ad_group = 'customers/{customer_id}/adGroups/{ag_id}'
-                """
-                stream_kw = ga_service.search_stream(customer_id=customer_id, query=query_keywords)
-                for batch in stream_kw:
-                    for row in batch.results:
-                        kw = row.ad_group_criterion
-                        ad_group["keywords"].append({
-                            "text": kw.keyword.text,
-                            "match_type": getattr(kw.keyword.match_type, "name", kw.keyword.match_type),
-                            "status": getattr(kw, "status", None),
-                            "cpc_bid_micros": kw.cpc_bid_micros,
-                            "cpc_bid_gbp": kw.cpc_bid_micros / 1_000_000 if kw.cpc_bid_micros else None
-                        })
+        for ad_group in account.ad_groups():
+            query_keywords = f"""
+                SELECT
+                    ad_group_criterion.keyword.text,
+                    ad_group_criterion.keyword.match_type,
+                    ad_group_criterion.status,
+                    ad_group_criterion.cpc_bid_micros
+                FROM ad_group_criterion
+                WHERE ad_group_criterion.type = KEYWORD
+                  AND ad_group_criterion.ad_group = 'customers/{customer_id}/adGroups/{ad_group.id}'
+            """
+            async for row in client.search_stream(customer_id, query_keywords):
+                ad_group.keywords.append(keyword_from_criterion(row.ad_group_criterion))
 
         # ----------------- 4. Ad Group Negative Keywords -----------------
-        for campaign_id, campaign in results["campaigns"].items():
-            for ag_id, ad_group in campaign["ad_groups"].items():
-                query_negative_kw = f"""
-                    SELECT
-                        ad_group_criterion.keyword.text,
-                        ad_group_criterion.keyword.match_type,
-                        ad_group_criterion.status
-                    FROM ad_group_criterion
-                    WHERE ad_group_criterion.type = KEYWORD
-                      AND ad_group_criterion.negative = TRUE
-                      AND ad_group_criterion.ad_group = 'customers/{customer_id}/adGroups/{ag_id}'
-                """
-                stream_neg_kw = ga_service.search_stream(customer_id=customer_id, query=query_negative_kw)
-                for batch in stream_neg_kw:
-                    for row in batch.results:
-                        kw = row.ad_group_criterion
-                        ad_group["negative_keywords"].append({
-                            "text": kw.keyword.text,
-                            "match_type": getattr(kw.keyword.match_type, "name", kw.keyword.match_type),
-                            "status": getattr(kw, "status", None)
-                        })
+        for ad_group in account.ad_groups():
+            query_negative_kw = f"""
+                SELECT
+                    ad_group_criterion.keyword.text,
+                    ad_group_criterion.keyword.match_type,
+                    ad_group_criterion.status
+                FROM ad_group_criterion
+                WHERE ad_group_criterion.type = KEYWORD
+                  AND ad_group_criterion.negative = TRUE
+                  AND ad_group_criterion.ad_group = 'customers/{customer_id}/adGroups/{ad_group.id}'
+            """
+            async for row in client.search_stream(customer_id, query_negative_kw):
+                ad_group.negative_keywords.append(keyword_from_criterion(row.ad_group_criterion))
 
         # ----------------- 5. Campaign Negative Keywords -----------------
-        for campaign_id, campaign in results["campaigns"].items():
+        for campaign in account.campaigns.values():
             query_campaign_neg_kw = f"""
                 SELECT
                     campaign_criterion.keyword.text,
@@ -670,21 +681,81 @@ async def get_all_google_ads_campaign_details(ctx: Context):
                 FROM campaign_criterion
                 WHERE campaign_criterion.type = KEYWORD
                   AND campaign_criterion.negative = TRUE
-                  AND campaign_criterion.campaign = 'customers/{customer_id}/campaigns/{campaign_id}'
+                  AND campaign_criterion.campaign = 'customers/{customer_id}/campaigns/{campaign.id}'
             """
-            stream_campaign_neg_kw = ga_service.search_stream(customer_id=customer_id, query=query_campaign_neg_kw)
-            for batch in stream_campaign_neg_kw:
-                for row in batch.results:
-                    kw = row.campaign_criterion
-                    campaign.setdefault("negative_keywords", []).append({
-                        "text": kw.keyword.text,
-                        "match_type": getattr(kw.keyword.match_type, "name", kw.keyword.match_type),
-                        "status": getattr(kw, "status", None)
-                    })
+            async for row in client.search_stream(customer_id, query_campaign_neg_kw):
+                campaign.negative_keywords.append(keyword_from_criterion(row.campaign_criterion))
+
+        return account
+
+    account = await fetch_all_details()
+    return to_compact_text(account)
+
+
+async def query_google_ads_account(
+    ctx: Context,
+    resource: str,
+    fields: list = None,
+    campaign_id: str = "",
+    ad_group_id: str = "",
+    status: str = "",
+    text_contains: str = "",
+    cursor: str = "",
+    page_size: int = 100,
+) -> str:
+    """
+    Query one part of the user's Google Ads account, returning a CSV page of matching rows.
+    Prefer this over get_all_google_ads_campaign_details for large accounts or specific questions.
+
+    Parameters:
+    - resource: one of "campaigns", "ad_groups", "keywords", "ads"
+    - fields: list of columns to return; omit for all columns. Available columns:
+        campaigns: campaign_id, campaign_name, status, serving_status, budget_gbp, channel_type
+        ad_groups: ad_group_id, ad_group_name, status, cpc_bid_gbp, campaign_id, campaign_name
+        keywords: criterion_id, text, match_type, status, negative, cpc_bid_gbp, ad_group_id, ad_group_name, campaign_id, campaign_name
+        ads: ad_id, status, final_urls, headlines, descriptions, ad_group_id, campaign_id
+    - campaign_id: only rows in this campaign; omit for all
+    - ad_group_id: only rows in this ad group; omit for all (not valid for campaigns)
+    - status: "ENABLED", "PAUSED" or "REMOVED"; omit for everything except REMOVED
+    - text_contains: only rows whose name (or keyword text) contains this text; omit for all (not valid for ads)
+    - cursor: omit for the first page, otherwise the next_cursor value from the previous page
+    - page_size: rows per page, at most 500
+    """
+    customer_id = await ctx.store.get("google_customer_id", "")
+
+    client = await get_google_client(ctx)
+    if isinstance(client, str):
+        return client
+
+    try:
+        query, fields = build_query(resource, fields, campaign_id, ad_group_id, status, text_contains)
+        offset = decode_cursor(query, cursor)
+    except ValueError as e:
+        return f"Invalid query: {e}"
+
+    page_size = max(1, min(int(page_size or 100), MAX_PAGE_SIZE))
+
+    try:
+        # GAQL has no OFFSET, so fetch up to the end of this page (plus one row to detect more)
+        # and skip the rows already returned.
+        rows = []
+        n = 0
+        async for row in client.search_stream(customer_id, f"{query} LIMIT {offset + page_size + 1}"):
+            if n >= offset:
+                rows.append(row)
+            n += 1
+    except Exception as e:
+        return f"Error querying Google Ads account: {e}"
 
-        return results
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if not rows:
+        return f"No {resource} found."
 
-    return await run_blocking(fetch_all_details_sync)
+    result = f"{resource} rows {offset + 1}-{offset + len(rows)}:\n{format_rows(resource, fields, rows)}"
+    if has_more:
+        result += f"\nnext_cursor: {encode_cursor(query, offset + page_size)}"
+    return result
 
 
 async def manage_ad_group_keywords(ctx: Context, ad_group_id: str, add_keywords: list, remove_keywords: list):
@@ -714,7 +785,7 @@ async def manage_ad_group_keywords(ctx: Context, ad_group_id: str, add_keywords:
     ad_group_criterion_service = client.get_service("AdGroupCriterionService")
     ad_group_service = client.get_service("AdGroupService")
 
-    def sync_manage_keywords():
+    async def manage_keywords():
         added = []
         removed = []
 
@@ -726,12 +797,9 @@ async def manage_ad_group_keywords(ctx: Context, ad_group_id: str, add_keywords:
                 FROM ad_group_criterion
                 WHERE ad_group.id = {ad_group_id} AND ad_group_criterion.type = KEYWORD
             """
-            ga_service = client.get_service("GoogleAdsService")
             existing_kw = {}
-            stream = ga_service.search_stream(customer_id=customer_id, query=query)
-            for batch in stream:
-                for row in batch.results:
-                    existing_kw[row.ad_group_criterion.keyword.text] = row.ad_group_criterion.criterion_id
+            async for row in client.search_stream(customer_id, query):
+                existing_kw[row.ad_group_criterion.keyword.text] = row.ad_group_criterion.criterion_id
 
             for text in remove_keywords:
                 if text in existing_kw:
@@ -740,7 +808,7 @@ async def manage_ad_group_keywords(ctx: Context, ad_group_id: str, add_keywords:
                     )
                     op = client.get_type("AdGroupCriterionOperation")
                     op.remove = resource_name
-                    response = ad_group_criterion_service.mutate_ad_group_criteria(
+                    response = await ad_group_criterion_service.mutate_ad_group_criteria(
                         customer_id=customer_id, operations=[op]
                     )
                     removed.append(response.results[0].resource_name)
@@ -760,7 +828,7 @@ async def manage_ad_group_keywords(ctx: Context, ad_group_id: str, add_keywords:
             if kw.get("cpc_bid_gbp") is not None:
                 criterion.cpc_bid_micros = int(kw["cpc_bid_gbp"] * 1_000_000)
 
-            response = ad_group_criterion_service.mutate_ad_group_criteria(
+            response = await ad_group_criterion_service.mutate_ad_group_criteria(
                 customer_id=customer_id, operations=[operation]
             )
             added.append(response.results[0].resource_name)
@@ -768,7 +836,7 @@ async def manage_ad_group_keywords(ctx: Context, ad_group_id: str, add_keywords:
 
         return {"added": added, "removed": removed}
 
-    return await run_blocking(sync_manage_keywords)
+    return await manage_keywords()
 
 
 async def manage_ad_group_ads(ctx: Context, ad_group_id: str, create_ads: list, remove_ad_ids: list):
@@ -802,7 +870,14 @@ async def manage_ad_group_ads(ctx: Context, ad_group_id: str, create_ads: list,
     ad_group_ad_service = client.get_service("AdGroupAdService")
     ad_group_service = client.get_service("AdGroupService")
 
-    def sync_manage_ads():
+    # Validate and repair every new ad before any of them are created
+    if create_ads:
+        try:
+            create_ads = await enforce_ad_policy(create_ads, await core.get_llm())
+        except AdPolicyError as e:
+            return f"No ads were changed: {e}"
+
+    async def manage_ads():
         created = []
         removed = []
 
@@ -830,7 +905,7 @@ async def manage_ad_group_ads(ctx: Context, ad_group_id: str, create_ads: list,
             ad_obj.ad.final_urls.extend(final_urls)
             ad_obj.status = AdGroupAdStatusEnum.AdGroupAdStatus.PAUSED
 
-            resp = ad_group_ad_service.mutate_ad_group_ads(
+            resp = await ad_group_ad_service.mutate_ad_group_ads(
                 customer_id=customer_id, operations=[op]
             )
             created.append(resp.results[0].resource_name)
@@ -840,14 +915,14 @@ async def manage_ad_group_ads(ctx: Context, ad_group_id: str, create_ads: list,
             resource_name = ad_group_ad_service.ad_group_ad_path(customer_id, ad_group_id, ad_id)
             op = client.get_type("AdGroupAdOperation")
             op.remove = resource_name
-            resp = ad_group_ad_service.mutate_ad_group_ads(
+            resp = await ad_group_ad_service.mutate_ad_group_ads(
                 customer_id=customer_id, operations=[op]
             )
             removed.append(resp.results[0].resource_name)
 
         return {"created": created, "removed": removed}
 
-    return await run_blocking(sync_manage_ads)
+    return await manage_ads()
 
 
 async def manage_ad_groups(ctx: Context, campaign_id: str, create_ad_groups:list, remove_ad_group_ids: list):
@@ -872,7 +947,7 @@ async def manage_ad_groups(ctx: Context, campaign_id: str, create_ad_groups:list
         return client
     ad_group_service = client.get_service("AdGroupService")
 
-    def sync_manage_ad_groups():
+    async def manage_groups():
         created = []
         removed = []
 
@@ -885,7 +960,7 @@ async def manage_ad_groups(ctx: Context, campaign_id: str, create_ad_groups:list
             status_str = ag.get("status", "ENABLED").upper()
             ad_group.status = getattr(client.enums.AdGroupStatusEnum, status_str)
 
-            response = ad_group_service.mutate_ad_groups(
+            response = await ad_group_service.mutate_ad_groups(
                 customer_id=customer_id, operations=[operation]
             )
             created.append(response.results[0].resource_name)
@@ -895,14 +970,14 @@ async def manage_ad_groups(ctx: Context, campaign_id: str, create_ad_groups:list
             resource_name = ad_group_service.ad_group_path(customer_id, ag_id)
             op = client.get_type("AdGroupOperation")
             op.remove = resource_name
-            response = ad_group_service.mutate_ad_groups(
+            response = await ad_group_service.mutate_ad_groups(
                 customer_id=customer_id, operations=[op]
             )
             removed.append(response.results[0].resource_name)
 
         return {"created": created, "removed": removed}
 
-    return await run_blocking(sync_manage_ad_groups)
+    return await manage_groups()
 
 
 async def adjust_campaign_budget(ctx: Context, campaign_id: str, new_budget: float) -> str:
@@ -914,7 +989,6 @@ async def adjust_campaign_budget(ctx: Context, campaign_id: str, new_budget: flo
 
     budget_micros = int(new_budget * 1_000_000)
 
-    campaign_service = client.get_service("CampaignService")
     budget_service = client.get_service("CampaignBudgetService")
 
     try:
@@ -924,13 +998,7 @@ async def adjust_campaign_budget(ctx: Context, campaign_id: str, new_budget: flo
             FROM campaign
             WHERE campaign.id = {campaign_id}
         """
-        search_response = await run_blocking(
-            client.get_service("GoogleAdsService").search,
-            customer_id=customer_id,
-            query=query,
-        )
-
-        rows = list(search_response)
+        rows = await client.search(customer_id, query)
         if not rows:
             return f"Campaign with ID {campaign_id} not found."
 
@@ -944,8 +1012,7 @@ async def adjust_campaign_budget(ctx: Context, campaign_id: str, new_budget: flo
         mask = FieldMask(paths=["amount_micros"])
         client.copy_from(budget_operation.update_mask, mask)
 
-        await run_blocking(
-            budget_service.mutate_campaign_budgets,
+        await budget_service.mutate_campaign_budgets(
             customer_id=customer_id,
             operations=[budget_operation],
         )
@@ -0,0 +1,136 @@
+"""
+Compares the old nested-dict account details with the slotted account model on a
+synthetic 10k-keyword account: retained memory and the size of the text handed to the LLM.
+
+Run: python benchmarks/account_model.py
+"""
+import os
+import sys
+import tracemalloc
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent.account_model import Account, add_ad_group_row, ad_from_row, keyword_from_criterion, to_compact_text
+
+N_CAMPAIGNS = 20
+N_AD_GROUPS = 25
+N_KEYWORDS = 20
+N_ADS = 2
+
+
+def enum(name):
+    return SimpleNamespace(name=name)
+
+
+ENABLED, EXACT, PHRASE = enum("ENABLED"), enum("EXACT"), enum("PHRASE")
+
+
+def synthetic_rows():
+    """Yields (ad_group_row, ad_rows, keyword_criteria) shaped like GoogleAdsRow results."""
+    for c in range(N_CAMPAIGNS):
+        campaign = SimpleNamespace(id=1000 + c, name=f"Campaign {c} – Road Bikes", status=ENABLED, serving_status=enum("SERVING"))
+        for g in range(N_AD_GROUPS):
+            ag_id = 100000 + c * N_AD_GROUPS + g
+            ad_group = SimpleNamespace(id=ag_id, name=f"Ad Group {g} – Carbon Frames", status=ENABLED)
+            ad_rows = [
+                SimpleNamespace(ad_group_ad=SimpleNamespace(
+                    status=enum("PAUSED"),
+                    ad=SimpleNamespace(
+                        id=ag_id * 10 + a,
+                        final_urls=["https://www.example.com/road-bikes"],
+                        responsive_search_ad=SimpleNamespace(
+                            headlines=[SimpleNamespace(text=f"Carbon Road Bike {h}") for h in range(10)],
+                            descriptions=[SimpleNamespace(text=f"Lightweight carbon road bikes with free UK delivery {d}") for d in range(3)],
+                        ),
+                    ),
+                ))
+                for a in range(N_ADS)
+            ]
+            keywords = [
+                SimpleNamespace(
+                    keyword=SimpleNamespace(text=f"carbon road bike size {c}-{g}-{k}", match_type=EXACT if k % 2 else PHRASE),
+                    status=ENABLED,
+                    cpc_bid_micros=450000 + k * 10000,
+                )
+                for k in range(N_KEYWORDS)
+            ]
+            yield SimpleNamespace(campaign=campaign, ad_group=ad_group), ad_rows, keywords
+
+
+def build_dicts(rows):
+    """The shape get_all_google_ads_campaign_details returned before the account model."""
+    results = {"campaigns": {}}
+    for row, ad_rows, keywords in rows:
+        c, ag = row.campaign, row.ad_group
+        campaign = results["campaigns"].setdefault(c.id, {
+            "id": c.id, "name": c.name, "budget": 5.0,
+            "status": c.status.name, "serving_status": c.serving_status.name, "ad_groups": {},
+        })
+        ad_group = campaign["ad_groups"].setdefault(ag.id, {
+            "id": ag.id, "name": ag.name, "status": ag.status.name,
+            "ads": [], "keywords": [], "negative_keywords": [],
+        })
+        for ad_row in ad_rows:
+            ad = ad_row.ad_group_ad.ad
+            ad_group["ads"].append({
+                "id": ad.id,
+                "status": ad_row.ad_group_ad.status.name,
+                "final_urls": list(ad.final_urls),
+                "headlines": [h.text for h in ad.responsive_search_ad.headlines],
+                "descriptions": [d.text for d in ad.responsive_search_ad.descriptions],
+            })
+        for kw in keywords:
+            ad_group["keywords"].append({
+                "text": kw.keyword.text,
+                "match_type": kw.keyword.match_type.name,
+                "status": kw.status.name,
+                "cpc_bid_micros": kw.cpc_bid_micros,
+                "cpc_bid_gbp": kw.cpc_bid_micros / 1_000_000,
+            })
+    return results
+
+
+def build_model(rows):
+    account = Account()
+    for row, ad_rows, keywords in rows:
+        ad_group = add_ad_group_row(account, row, 5.0)
+        ad_group.ads.extend(ad_from_row(r) for r in ad_rows)
+        ad_group.keywords.extend(keyword_from_criterion(kw) for kw in keywords)
+    return account
+
+
+def measure(build, rows):
+    tracemalloc.start()
+    result = build(rows)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size
+
+
+def get_token_counter():
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding("cl100k_base")
+        return lambda text: len(encoding.encode(text)), "cl100k_base"
+    except Exception:
+        # Rough fallback when tiktoken or its encoding files are unavailable
+        return lambda text: len(text) // 4, "chars/4 estimate"
+
+
+if __name__ == "__main__":
+    rows = list(synthetic_rows())
+    n_keywords = N_CAMPAIGNS * N_AD_GROUPS * N_KEYWORDS
+
+    dicts, dict_bytes = measure(build_dicts, rows)
+    account, model_bytes = measure(build_model, rows)
+
+    dict_text = str(dicts)
+    model_text = to_compact_text(account)
+    count_tokens, tokenizer = get_token_counter()
+
+    print(f"Synthetic account: {N_CAMPAIGNS} campaigns, {N_CAMPAIGNS * N_AD_GROUPS} ad groups, {n_keywords} keywords")
+    print(f"Tokens counted with {tokenizer}")
+    print(f"{'':<16}{'memory (KiB)':>14}{'chars':>12}{'tokens':>10}")
+    print(f"{'nested dicts':<16}{dict_bytes / 1024:>14.0f}{len(dict_text):>12}{count_tokens(dict_text):>10}")
+    print(f"{'account model':<16}{model_bytes / 1024:>14.0f}{len(model_text):>12}{count_tokens(model_text):>10}")
@@ -0,0 +1,165 @@
+"""
+pytest-benchmark micro-benchmarks for the pure-Python hot paths: idea block parsing for
+generate_search_campaign, file_to_text on each upload type, the keyword report writer,
+account snapshot assembly from canned rows and the bot's NDJSON stream parser.
+
+Setup:  pip install -r requirements-dev.txt
+Run:    python -m pytest benchmarks/bench_hot_paths.py --benchmark-json=results.json
+Check:  python benchmarks/check_regressions.py benchmarks/baseline.json results.json
+
+The baseline was recorded on one machine; re-record it on the machine that runs the check:
+        python -m pytest benchmarks/bench_hot_paths.py --benchmark-json=benchmarks/baseline.json
+"""
+import asyncio
+import json
+import os
+import sys
+
+import docx
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "bot"))
+
+import fakes  # noqa: E402  (also sets APP_URL, which helpers need at import)
+from agent import tools  # noqa: E402
+from agent.campaign_ideas import find_idea_block, parse_idea_block  # noqa: E402
+from bots.ads_bot import ResponseStreamParser  # noqa: E402
+from helpers import file_helpers  # noqa: E402
+
+N_IDEAS = 20
+N_REPORT_ROWS = 2000
+N_TABLE_ROWS = 2000
+N_PARAGRAPHS = 500
+N_PDF_PAGES = 20
+N_STREAM_LINES = 2000
+
+
+def idea_block(n: int) -> str:
+    keywords = "\n".join(f"- road bike {n}-{k} {{{1_000_000 + k * 10_000}}}" for k in range(20))
+    negatives = "\n".join(f"- free bike {k}" for k in range(10))
+    headlines = "\n".join(f"- Road Bikes Sale {h}" for h in range(15))
+    descriptions = "\n".join(f"- Lightweight carbon road bikes with free UK delivery {d}" for d in range(4))
+    return (
+        f"# Idea #{n}: Road Bikes Campaign {n}\nBudget: £{10 + n}/day\nSummary:\nCarbon road bikes for commuters.\n\n"
+        f"Keywords:\n{keywords}\n\nNegative Keywords:\n{negatives}\n\nHeadlines:\n{headlines}\n\n"
+        f"Descriptions:\n{descriptions}\n\nFinal URL: https://www.example.com/road-bikes/{n}\n"
+    )
+
+
+def write_pdf(path: str, pages: int):
+    """A minimal text PDF, so no PDF writer is needed to build the fixture."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for p in range(pages):
+        lines = "".join(f"(Road bike product line {p}-{i}: carbon frames, free delivery) Tj T* " for i in range(40))
+        stream = f"BT /F1 10 Tf 12 TL 40 800 Td {lines}ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>"
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for i, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n{obj}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{o:010d} 00000 n \n" for o in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+@pytest.fixture(scope="module")
+def upload_files(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("uploads")
+    table = pd.DataFrame({
+        "product": [f"Road bike {i}" for i in range(N_TABLE_ROWS)],
+        "price": [499 + i for i in range(N_TABLE_ROWS)],
+        "description": [f"Carbon frame road bike, size {i % 7}, free delivery" for i in range(N_TABLE_ROWS)],
+    })
+    paths = {ext: str(directory / f"products.{ext}") for ext in ("csv", "xlsx", "docx", "pdf")}
+    table.to_csv(paths["csv"], index=False)
+    table.to_excel(paths["xlsx"], index=False)
+    document = docx.Document()
+    for i in range(N_PARAGRAPHS):
+        document.add_paragraph(f"Road bike product line {i}: carbon frames, disc brakes and free UK delivery.")
+    document.save(paths["docx"])
+    write_pdf(paths["pdf"], N_PDF_PAGES)
+    return paths
+
+
+def test_parse_idea_block(benchmark):
+    ideas_text = "\n\n---\n\n".join(idea_block(n) for n in range(1, N_IDEAS + 1))
+
+    def parse():
+        return parse_idea_block(find_idea_block(ideas_text, f"Road Bikes Campaign {N_IDEAS}"))
+
+    idea = benchmark(parse)
+    assert len(idea.keywords) == 20 and len(idea.headlines) == 15 and idea.budget_daily == 10 + N_IDEAS
+
+
+@pytest.mark.parametrize("ext", ["csv", "xlsx", "docx", "pdf"])
+def test_file_to_text(benchmark, upload_files, ext):
+    text = benchmark(file_helpers.file_to_text, upload_files[ext])
+    assert "Road bike" in text
+
+
+def test_keyword_report(benchmark, tmp_path, monkeypatch):
+    monkeypatch.setattr(file_helpers, "FILE_SERVE_DIR", str(tmp_path))
+    rows = [
+        {"keyword": f"road bike {i}", "avg_monthly_searches": 10000 - i, "competition": "MEDIUM",
+         "competition_index": 50, "low_bid": 300000, "high_bid": 900000}
+        for i in range(N_REPORT_ROWS)
+    ]
+
+    async def write_rows():
+        writer = file_helpers.KeywordReportWriter()
+        for row in rows:
+            await writer.write(row)
+        return await writer.close()
+
+    def write_report():
+        _, path = asyncio.run(write_rows())
+        os.remove(path)
+
+    benchmark(write_report)
+
+
+class CannedRowsClient:
+    async def search_stream(self, customer_id, query):
+        for row in fakes._account_rows(query):
+            yield row
+
+
+def test_account_snapshot(benchmark, monkeypatch):
+    monkeypatch.setattr(fakes, "N_CAMPAIGNS", 20)
+    monkeypatch.setattr(fakes, "N_AD_GROUPS", 10)
+    monkeypatch.setattr(fakes, "N_KEYWORDS", 20)
+
+    snapshot = benchmark(lambda: asyncio.run(tools.load_account_snapshot(CannedRowsClient(), fakes.CUSTOMER_ID)))
+    assert "Campaign 19" in snapshot
+
+
+def test_ndjson_stream(benchmark):
+    stream = b"".join(
+        (json.dumps({"response": f"Here are your keyword ideas, part {i} – £{i}/day "}) + "\n").encode("utf-8")
+        for i in range(N_STREAM_LINES)
+    )
+    chunks = [stream[i:i + 1024] for i in range(0, len(stream), 1024)]
+
+    def parse():
+        parser = ResponseStreamParser()
+        responses = []
+        for chunk in chunks:
+            responses.extend(parser.feed(chunk))
+        return responses + parser.close()
+
+    assert len(benchmark(parse)) == N_STREAM_LINES
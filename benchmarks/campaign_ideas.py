@@ -0,0 +1,66 @@
+"""
+Wall time of campaign ideas generation vs. n_ideas: one streamed call for every idea
+(the old behaviour) against concurrent shards. Bedrock is replaced by a fake LLM that
+streams each idea at a fixed output rate after a fixed time to first token.
+
+Run: python benchmarks/campaign_ideas.py
+"""
+import asyncio
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from agent import campaign_ideas, prompts
+
+prompts.PROMPTS_DIR = os.path.join(ROOT, "agent")
+
+FIRST_TOKEN_SECONDS = 0.5
+SECONDS_PER_IDEA = 0.4
+N_IDEAS = (5, 10, 20, 40)
+
+
+class FakeLLM:
+    """Streams the number of ideas asked for in the system message."""
+
+    async def astream_chat(self, messages):
+        system_text = "".join(getattr(b, "text", "") for b in messages[-1].blocks)
+        n = int(system_text.split("Generate exactly ")[1].split()[0])
+
+        async def gen():
+            await asyncio.sleep(FIRST_TOKEN_SECONDS)
+            for i in range(n):
+                await asyncio.sleep(SECONDS_PER_IDEA)
+                # Titles are unique per call so de-duplication doesn't hide ideas
+                yield SimpleNamespace(delta=f"# Idea #{i + 1}: Campaign {id(messages)}-{i}\nBudget: £10/day\nSummary:\nText\n\n---\n\n")
+
+        return gen()
+
+
+async def run(n_ideas, per_shard, max_concurrency):
+    async def on_idea(block):
+        pass
+
+    start = time.perf_counter()
+    ideas = await campaign_ideas.generate_ideas(FakeLLM(), "", n_ideas, "", on_idea, per_shard, max_concurrency)
+    assert len(ideas) == n_ideas
+    return time.perf_counter() - start
+
+
+async def main():
+    per_shard = campaign_ideas.IDEAS_PER_SHARD
+    concurrency = campaign_ideas.MAX_CONCURRENT_IDEA_SHARDS
+    print(f"Fake LLM: {FIRST_TOKEN_SECONDS}s to first token, {SECONDS_PER_IDEA}s per idea")
+    print(f"Sharded: {per_shard} ideas per shard, {concurrency} shards at a time")
+    print(f"{'n_ideas':>8}{'single call (s)':>18}{'sharded (s)':>14}{'speed-up':>10}")
+    for n in N_IDEAS:
+        single = await run(n, n, 1)
+        sharded = await run(n, per_shard, concurrency)
+        print(f"{n:>8}{single:>18.2f}{sharded:>14.2f}{single / sharded:>9.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,46 @@
+"""
+Compares a pytest-benchmark JSON run against the stored baseline and fails when any
+benchmark's median got slower than the threshold allows.
+
+Run: python benchmarks/check_regressions.py benchmarks/baseline.json results.json [--threshold 0.25]
+"""
+import argparse
+import json
+import sys
+
+
+def medians(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return {b["fullname"]: b["stats"]["median"] for b in json.load(f)["benchmarks"]}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown, 0.25 = 25%%")
+    args = parser.parse_args()
+
+    baseline, current = medians(args.baseline), medians(args.current)
+    regressions = 0
+    print(f"{'benchmark':<60}{'baseline (ms)':>15}{'current (ms)':>15}{'change':>9}")
+    for name, before in baseline.items():
+        after = current.get(name)
+        if after is None:
+            print(f"{name:<60}{before * 1000:>15.3f}{'missing':>15}")
+            continue
+        change = after / before - 1
+        flag = ""
+        if change > args.threshold:
+            regressions += 1
+            flag = "  REGRESSION"
+        print(f"{name:<60}{before * 1000:>15.3f}{after * 1000:>15.3f}{change:>+9.0%}{flag}")
+
+    if regressions:
+        print(f"\n{regressions} benchmark(s) more than {args.threshold:.0%} slower than the baseline")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
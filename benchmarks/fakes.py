@@ -0,0 +1,249 @@
+"""
+Offline stand-ins for the API's external services, used by the load test:
+
+- FakeBedrock: a scripted streaming function-calling LLM in place of BedrockConverse.
+  Messages mentioning "account" call get_all_google_ads_campaign_details, messages
+  mentioning "keyword" call google_ads_keyword_search, anything else (and every tool
+  result) gets a streamed answer.
+- Google Ads: in-process fake services behind the real AsyncGoogleAdsClient, so the
+  client's metadata, metrics and tracing paths still run.
+- Azure Tables: an in-memory table behind the real get_user_data/store_user_data.
+
+Run the API with the fakes installed: python benchmarks/fakes.py [port]
+Latencies are set with the FAKE_* environment variables below.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("APP_URL", "http://localhost")
+
+from llama_index.core.base.llms.types import ChatMessage, ChatResponse, TextBlock, ToolCallBlock
+from llama_index.core.llms.callbacks import llm_chat_callback
+from llama_index.core.llms.mock import MockFunctionCallingLLM
+
+LLM_FIRST_TOKEN_SECONDS = float(os.getenv("FAKE_LLM_FIRST_TOKEN_SECONDS", 0.6))
+LLM_TOKENS_PER_SECOND = float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", 60))
+LLM_ANSWER_TOKENS = int(os.getenv("FAKE_LLM_ANSWER_TOKENS", 150))
+GOOGLE_ADS_RPC_SECONDS = float(os.getenv("FAKE_GOOGLE_ADS_RPC_SECONDS", 0.08))
+AZURE_TABLE_SECONDS = float(os.getenv("FAKE_AZURE_TABLE_SECONDS", 0.03))
+
+CUSTOMER_ID = "1234567890"
+N_CAMPAIGNS = 5
+N_AD_GROUPS = 4
+N_KEYWORDS = 15
+N_KEYWORD_IDEAS = 300
+
+ANSWER_WORDS = "Here is what I found for your Google Ads account and the next steps I suggest".split()
+
+
+# ----------------- Bedrock -----------------
+
+class FakeBedrock(MockFunctionCallingLLM):
+    @classmethod
+    def class_name(cls) -> str:
+        return "FakeBedrock"
+
+    @staticmethod
+    def _script(messages, tools) -> ToolCallBlock:
+        last = messages[-1] if messages else None
+        if not tools or last is None or last.role.value != "user":
+            return None
+        text = (last.content or "").lower()
+        n = sum(m.role.value == "user" for m in messages)
+        if "account" in text:
+            return ToolCallBlock(tool_call_id=f"call-{n}", tool_name="get_all_google_ads_campaign_details", tool_kwargs={})
+        if "keyword" in text:
+            return ToolCallBlock(
+                tool_call_id=f"call-{n}", tool_name="google_ads_keyword_search", tool_kwargs={"keywords": ["road bikes"]},
+            )
+        return None
+
+    @llm_chat_callback()
+    async def astream_chat(self, messages, **kwargs):
+        tool_call = self._script(messages, kwargs.get("tools"))
+
+        async def gen():
+            await asyncio.sleep(LLM_FIRST_TOKEN_SECONDS)
+            if tool_call:
+                yield ChatResponse(
+                    message=ChatMessage(role="assistant", blocks=[TextBlock(text=""), tool_call]), delta="",
+                    additional_kwargs={"prompt_tokens": 2000, "completion_tokens": 20},
+                )
+                return
+            text = ""
+            for i in range(LLM_ANSWER_TOKENS):
+                await asyncio.sleep(1 / LLM_TOKENS_PER_SECOND)
+                delta = ANSWER_WORDS[i % len(ANSWER_WORDS)] + " "
+                text += delta
+                yield ChatResponse(message=ChatMessage(role="assistant", content=text), delta=delta)
+            yield ChatResponse(
+                message=ChatMessage(role="assistant", content=text), delta="",
+                additional_kwargs={"prompt_tokens": 2000, "completion_tokens": LLM_ANSWER_TOKENS},
+            )
+
+        return gen()
+
+    @llm_chat_callback()
+    async def achat(self, messages, **kwargs):
+        # Summaries and ad policy repairs
+        await asyncio.sleep(LLM_FIRST_TOKEN_SECONDS)
+        return ChatResponse(message=ChatMessage(role="assistant", content="Summary of the earlier conversation."))
+
+
+# ----------------- Google Ads -----------------
+
+def _enum(name):
+    return SimpleNamespace(name=name)
+
+
+def _account_rows(query: str) -> list:
+    if "FROM ad_group_ad" in query:
+        return [
+            SimpleNamespace(ad_group_ad=SimpleNamespace(
+                status=_enum("ENABLED"),
+                ad=SimpleNamespace(
+                    id=900 + a, final_urls=["https://www.example.com/"],
+                    responsive_search_ad=SimpleNamespace(
+                        headlines=[SimpleNamespace(text=f"Road Bikes {h}") for h in range(10)],
+                        descriptions=[SimpleNamespace(text=f"Lightweight road bikes with free delivery {d}") for d in range(3)],
+                    ),
+                ),
+            ))
+            for a in range(2)
+        ]
+    if "FROM ad_group_criterion" in query:
+        if "negative = TRUE" in query:
+            return []
+        return [
+            SimpleNamespace(ad_group_criterion=SimpleNamespace(
+                keyword=SimpleNamespace(text=f"road bike {k}", match_type=_enum("PHRASE")),
+                status=_enum("ENABLED"), cpc_bid_micros=500000,
+            ))
+            for k in range(N_KEYWORDS)
+        ]
+    if "FROM campaign_criterion" in query:
+        return []
+    if "FROM campaign_budget" in query:
+        return [SimpleNamespace(campaign_budget=SimpleNamespace(amount_micros=10_000_000))]
+    if "FROM ad_group" in query:
+        return [
+            SimpleNamespace(
+                campaign=SimpleNamespace(
+                    id=100 + c, name=f"Campaign {c}", campaign_budget=f"customers/{CUSTOMER_ID}/campaignBudgets/{c}",
+                    status=_enum("ENABLED"), serving_status=_enum("SERVING"),
+                ),
+                ad_group=SimpleNamespace(id=1000 + c * N_AD_GROUPS + g, name=f"Ad Group {g}", status=_enum("ENABLED")),
+            )
+            for c in range(N_CAMPAIGNS) for g in range(N_AD_GROUPS)
+        ]
+    return []
+
+
+async def _stream(items, batch_size=1000):
+    for i in range(0, len(items), batch_size):
+        yield items[i:i + batch_size]
+
+
+class FakeGoogleAdsService:
+    async def search_stream(self, customer_id, query, metadata=None):
+        await asyncio.sleep(GOOGLE_ADS_RPC_SECONDS)
+
+        async def batches():
+            async for batch in _stream(_account_rows(query)):
+                yield SimpleNamespace(results=batch)
+
+        return batches()
+
+
+class FakeKeywordPlanIdeaService:
+    async def generate_keyword_ideas(self, request, metadata=None):
+        await asyncio.sleep(GOOGLE_ADS_RPC_SECONDS)
+        seed = request.keyword_seed.keywords[0]
+
+        async def ideas():
+            for i in range(N_KEYWORD_IDEAS):
+                yield SimpleNamespace(text=f"{seed} {i}", keyword_idea_metrics=SimpleNamespace(
+                    avg_monthly_searches=10000 - i * 10, competition=_enum("MEDIUM"),
+                    low_top_of_page_bid_micros=300000, high_top_of_page_bid_micros=900000, competition_index=50,
+                ))
+
+        return ideas()
+
+
+class FakeMutateService:
+    """Accepts any mutate_* call and returns one result per operation."""
+
+    def __getattr__(self, name):
+        async def call(*args, customer_id=None, operations=(), metadata=None, **kwargs):
+            await asyncio.sleep(GOOGLE_ADS_RPC_SECONDS)
+            return SimpleNamespace(results=[
+                SimpleNamespace(resource_name=f"customers/{customer_id}/{name}/{i}") for i in range(len(operations))
+            ])
+        return call
+
+
+FAKE_SERVICES = {
+    "GoogleAdsService": FakeGoogleAdsService(),
+    "KeywordPlanIdeaService": FakeKeywordPlanIdeaService(),
+}
+
+
+# ----------------- Azure Tables -----------------
+
+# user_id -> (customer_id, refresh_token); every simulated user is already authenticated
+users = {}
+
+
+def _get_user_data(user_id: str):
+    time.sleep(AZURE_TABLE_SECONDS)
+    return users.setdefault(user_id, (CUSTOMER_ID, f"refresh-{user_id}"))
+
+
+def _store_user_data(user_id: str, google_creds: dict):
+    time.sleep(AZURE_TABLE_SECONDS)
+    users[user_id] = (google_creds.get("customer_id", ""), google_creds.get("refresh_token", ""))
+    return True
+
+
+# ----------------- Wiring -----------------
+
+def install():
+    """Points the API at the fakes and keeps its files in a temporary directory."""
+    from agent import core, prompts, sessions
+    from helpers import azure_tables, file_helpers, google_ads_client, scraper
+
+    async def get_access_token(refresh_token):
+        return "fake-access-token"
+
+    google_ads_client._get_service = lambda name: FAKE_SERVICES.get(name) or FakeMutateService()
+    google_ads_client.get_access_token = get_access_token
+
+    azure_tables._get_user_data = _get_user_data
+    azure_tables._store_user_data = _store_user_data
+
+    tmp = tempfile.mkdtemp(prefix="ads-loadtest-")
+    file_helpers.FILE_SERVE_DIR = os.path.join(tmp, "files")
+    file_helpers.USER_UPLOADS_DIR = os.path.join(tmp, "uploads")
+    file_helpers.ARTIFACTS_DIR = os.path.join(tmp, "artifacts")
+    sessions.SPILL_DIR = os.path.join(tmp, "sessions")
+    scraper.SCRAPE_CACHE_DIR = os.path.join(tmp, "pages")
+    prompts.PROMPTS_DIR = os.path.join(ROOT, "agent")
+
+    core._llm = FakeBedrock()
+    from llama_index.core.instrumentation import get_dispatcher
+    get_dispatcher().add_event_handler(core.LLMMetricsHandler())
+    get_dispatcher().add_event_handler(core.LLMTracingHandler())
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    install()
+    import server
+    uvicorn.run(server.app, host="127.0.0.1", port=int(sys.argv[1]) if len(sys.argv) > 1 else 8000, log_level="warning")
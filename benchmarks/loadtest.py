@@ -0,0 +1,234 @@
+"""
+End-to-end load test: N simulated Teams users chatting through bot/app.py and server.py,
+fully offline. The API runs with the fakes in benchmarks/fakes.py (scripted Bedrock,
+in-process Google Ads, in-memory Azure Tables); the bot's replies go to a fake Bot
+Framework connector run by this script, which is how turn timings are observed.
+
+Per turn it records TTFB (first reply carrying model output, after the "Thinking..." card)
+and turn latency (the bot finishing the activity), and samples the RSS of both processes.
+
+Run: python benchmarks/loadtest.py --users 20 --turns 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import aiohttp
+from aiohttp import web
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPT = [
+    "Hi, what can you help me with?",
+    "Show me a summary of my account",
+    "Find keyword ideas for road bikes",
+    "Thanks, what should I do next?",
+]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def rss_mb(pid: int) -> float:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def reply_text(activity: dict) -> str:
+    """The text of a bot reply, whether plain or inside the adaptive card."""
+    if activity.get("text"):
+        return activity["text"]
+    for attachment in activity.get("attachments") or []:
+        body = (attachment.get("content") or {}).get("body") or [{}]
+        return body[0].get("text", "")
+    return ""
+
+
+class Connector:
+    """Fake Bot Framework connector: receives the bot's replies and updates."""
+
+    def __init__(self):
+        # conversation id -> time of the first reply with model output for the current turn
+        self.first_output = {}
+        self.n_activities = 0
+
+    def record(self, conversation_id: str, activity: dict):
+        self.n_activities += 1
+        text = reply_text(activity)
+        if text and text != "Thinking..." and conversation_id not in self.first_output:
+            self.first_output[conversation_id] = time.perf_counter()
+
+    async def send(self, request):
+        self.record(request.match_info["conversation_id"], await request.json())
+        return web.json_response({"id": f"activity-{self.n_activities}"})
+
+    def app(self):
+        app = web.Application()
+        app.router.add_post("/v3/conversations/{conversation_id}/activities", self.send)
+        app.router.add_post("/v3/conversations/{conversation_id}/activities/{activity_id}", self.send)
+        app.router.add_put("/v3/conversations/{conversation_id}/activities/{activity_id}", self.send)
+        return app
+
+
+async def wait_for_port(port: int, process, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Process exited with {process.returncode} before listening on {port}")
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.2)
+    raise TimeoutError(f"Nothing listening on {port} after {timeout}s")
+
+
+async def simulate_user(n: int, args, session, bot_url: str, connector_url: str, connector: Connector, turns: list):
+    conversation_id = f"conversation-{n}"
+    await asyncio.sleep(args.ramp * n / max(1, args.users))
+    for turn in range(args.turns):
+        activity = {
+            "type": "message",
+            "id": f"{n}-{turn}",
+            "channelId": "msteams",
+            "serviceUrl": connector_url,
+            "from": {"id": f"loadtest-user-{n}", "name": f"User {n}"},
+            "recipient": {"id": "bot", "name": "Ads bot"},
+            "conversation": {"id": conversation_id},
+            "text": SCRIPT[turn % len(SCRIPT)],
+        }
+        connector.first_output.pop(conversation_id, None)
+        start = time.perf_counter()
+        async with session.post(bot_url, json=activity) as resp:
+            await resp.read()
+            ok = resp.status < 400
+        end = time.perf_counter()
+        first = connector.first_output.get(conversation_id)
+        turns.append({
+            "user": n, "turn": turn, "ok": ok, "latency": end - start,
+            "ttfb": (first - start) if first else None,
+        })
+        await asyncio.sleep(args.think_time)
+
+
+def percentiles(values: list) -> dict:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None}
+    if len(values) == 1:
+        return {"p50": values[0], "p95": values[0], "p99": values[0]}
+    q = statistics.quantiles(values, n=100, method="inclusive")
+    return {"p50": q[49], "p95": q[94], "p99": q[98]}
+
+
+async def run(args) -> dict:
+    api_port, bot_port, connector_port = free_port(), free_port(), free_port()
+    env = {**os.environ, "APP_URL": "http://127.0.0.1", "PYTHONUNBUFFERED": "1"}
+    output = None if args.verbose else subprocess.DEVNULL
+
+    api = subprocess.Popen([sys.executable, os.path.join(ROOT, "benchmarks", "fakes.py"), str(api_port)],
+                           cwd=ROOT, env=env, stdout=output, stderr=output)
+    bot = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "bot", "app.py")], cwd=ROOT, stdout=output, stderr=output,
+        env={**env, "PYTHONPATH": ROOT, "PORT": str(bot_port), "BACKEND_URL": f"http://127.0.0.1:{api_port}/prompt",
+             "STREAMING": "false" if args.no_streaming else "true",
+             "MicrosoftAppId": "", "MicrosoftAppPassword": ""},
+    )
+
+    connector = Connector()
+    runner = web.AppRunner(connector.app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", connector_port).start()
+
+    rss = {"api": [], "bot": []}
+
+    async def sample_rss():
+        while True:
+            rss["api"].append(rss_mb(api.pid))
+            rss["bot"].append(rss_mb(bot.pid))
+            await asyncio.sleep(0.5)
+
+    try:
+        await wait_for_port(api_port, api)
+        await wait_for_port(bot_port, bot)
+        sampler = asyncio.create_task(sample_rss())
+        turns = []
+        timeout = aiohttp.ClientTimeout(total=None)
+        async with aiohttp.ClientSession(timeout=timeout, connector=aiohttp.TCPConnector(limit=0)) as session:
+            start = time.perf_counter()
+            await asyncio.gather(*(
+                simulate_user(n, args, session, f"http://127.0.0.1:{bot_port}/api/messages",
+                              f"http://127.0.0.1:{connector_port}", connector, turns)
+                for n in range(args.users)
+            ))
+            elapsed = time.perf_counter() - start
+        sampler.cancel()
+    finally:
+        for process in (api, bot):
+            process.terminate()
+            process.wait()
+        await runner.cleanup()
+
+    ok = [t for t in turns if t["ok"]]
+    return {
+        "users": args.users,
+        "turns": len(turns),
+        "errors": len(turns) - len(ok),
+        "elapsed": elapsed,
+        "throughput": len(ok) / elapsed,
+        "ttfb": percentiles([t["ttfb"] for t in ok if t["ttfb"] is not None]),
+        "latency": percentiles([t["latency"] for t in ok]),
+        "rss_mb": {name: {"peak": max(v, default=0), "final": v[-1] if v else 0} for name, v in rss.items()},
+    }
+
+
+def report(results: dict):
+    def fmt(value):
+        return f"{value:.2f}" if value is not None else "-"
+
+    print(f"{results['users']} users, {results['turns']} turns ({results['errors']} failed) "
+          f"in {results['elapsed']:.1f}s: {results['throughput']:.2f} turns/s")
+    print(f"{'':<16}{'p50 (s)':>10}{'p95 (s)':>10}{'p99 (s)':>10}")
+    for name in ("ttfb", "latency"):
+        p = results[name]
+        print(f"{name:<16}{fmt(p['p50']):>10}{fmt(p['p95']):>10}{fmt(p['p99']):>10}")
+    print(f"{'RSS (MB)':<16}{'peak':>10}{'final':>10}")
+    for name, r in results["rss_mb"].items():
+        print(f"{name:<16}{r['peak']:>10.0f}{r['final']:>10.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10, help="concurrent simulated users")
+    parser.add_argument("--turns", type=int, default=len(SCRIPT), help="turns per user")
+    parser.add_argument("--ramp", type=float, default=2.0, help="seconds over which users start")
+    parser.add_argument("--think-time", type=float, default=0.5, help="seconds between a user's turns")
+    parser.add_argument("--no-streaming", action="store_true", help="run the bot with STREAMING=false")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--verbose", action="store_true", help="show API and bot output")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    report(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Prompt tokens per turn over a long synthetic session: the previous Memory(token_limit=10000)
+against the summarizing SessionMemory, which compacts large messages into artifacts once
+their turn is over. Every turn has a large tool output (keyword dumps, account trees), every
+fifth turn uploads a file (saved as an artifact and announced by ID, as the server does) and
+every seventh user message pastes a long keyword list inline. Tokens are measured with the
+memory token hook; the summarizer is a fake LLM so only memory handling is timed.
+
+Run: python benchmarks/memory.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import helpers.file_helpers as file_helpers
+from llama_index.core.llms import ChatMessage
+from llama_index.core.memory import Memory
+from agent import memory as session_memory
+from agent.artifacts import add_text, get_registry
+
+N_TURNS = 40
+TOOL_OUTPUT_LINES = 600
+ATTACHMENT_LINES = 800
+PASTED_LINES = 300
+
+
+class FakeSummarizer:
+    async def achat(self, messages):
+        return SimpleNamespace(message=SimpleNamespace(content="Summary of earlier turns. " * 40))
+
+
+def keyword_dump(turn):
+    return "\n".join(f"keyword {turn}-{i},{1000 + i},HIGH,1.2,3.4" for i in range(TOOL_OUTPUT_LINES))
+
+
+def attachment(turn):
+    return "\n".join(f"Product line {turn}-{i}: premium widgets for small business" for i in range(ATTACHMENT_LINES))
+
+
+def pasted_keywords(turn):
+    return "\n".join(f"widget keyword {turn}-{i}" for i in range(PASTED_LINES))
+
+
+def user_prompt(memory, turn):
+    prompt = f"Turn {turn}: find keywords for my widgets"
+    if turn % 7 == 3:
+        prompt = f"{prompt}, starting from these:\n{pasted_keywords(turn)}"
+    if turn % 5 == 0:
+        text = attachment(turn)
+        path = file_helpers.save_artifact(memory.session_id, text)
+        artifact = add_text(get_registry(memory.session_id), "upload", path, f"products-{turn}.xlsx", text)
+        prompt = (
+            "SYSTEM: User's uploaded attachments (artifact ID | kind | name | size | summary), used as reference "
+            f"data for Google Ads Campaign generation, read them with read_artifact if needed:\n{artifact.describe()}\n"
+            f"\n\nUSER: {prompt}"
+        )
+    return prompt
+
+
+async def run_session(memory, tokens, kept, largest):
+    session_memory.token_hooks[:] = [lambda session_id, n: tokens.append(n)]
+    for turn in range(N_TURNS):
+        await memory.aput(ChatMessage(role="user", content=user_prompt(memory, turn)))
+        messages = await memory.aget()
+        kept.append(sum(m.role.value == "user" for m in messages) - 1)
+        if not isinstance(memory, session_memory.SessionMemory):
+            tokens.append(sum(memory._estimate_token_count(m) for m in messages))
+        await memory.aput_messages([
+            ChatMessage(role="assistant", content="", additional_kwargs={"tool_calls": [{"id": f"t{turn}"}]}),
+            ChatMessage(role="tool", content=keyword_dump(turn), additional_kwargs={"tool_call_id": f"t{turn}"}),
+            ChatMessage(role="assistant", content="Here are the top keywords for your widgets."),
+        ])
+        # What stays in the history once the turn is over, i.e. what later turns carry along
+        largest.append(max(memory._estimate_token_count(m) for m in await memory.aget_all()))
+
+
+def artifact_stats(session_id):
+    saved = get_registry(session_id).list("saved_output")
+    return len(saved), sum(os.path.getsize(a.path) for a in saved)
+
+
+async def main():
+    file_helpers.ARTIFACTS_DIR = tempfile.mkdtemp()
+    results = {}
+    for name, memory in (
+        ("Memory(10000)", Memory.from_defaults(token_limit=10000)),
+        ("SessionMemory", session_memory.create_memory(FakeSummarizer())),
+    ):
+        tokens, kept, largest = [], [], []
+        start = time.perf_counter()
+        await run_session(memory, tokens, kept, largest)
+        results[name] = (tokens, kept, max(largest), *artifact_stats(memory.session_id), time.perf_counter() - start)
+
+    print(f"{N_TURNS} turns, tool output ~{TOOL_OUTPUT_LINES} lines/turn, upload every 5 turns, "
+          f"{PASTED_LINES} pasted keywords every 7 turns")
+    print("Pasted-keyword turns include the pasted text itself, which is sent in full on its own turn.")
+    print(f"{'':<16}{'max tokens':>12}{'max (no paste)':>16}{'mean tokens':>13}{'earlier turns kept':>20}"
+          f"{'largest kept msg':>18}{'compacted':>11}{'artifact KB':>13}{'time (s)':>10}")
+    for name, (tokens, kept, largest, n_saved, saved_bytes, elapsed) in results.items():
+        plain = [t for turn, t in enumerate(tokens) if turn % 7 != 3]
+        print(f"{name:<16}{max(tokens):>12}{max(plain):>16}{sum(tokens) // len(tokens):>13}{sum(kept) / len(kept):>20.1f}"
+              f"{largest:>18}{n_saved:>11}{saved_bytes // 1024:>13}{elapsed:>10.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -17,8 +17,11 @@ from botbuilder.schema import Activity, ActivityTypes
 
 from bots import AdsBot
 from config import DefaultConfig
+# Shared with the API, so both are configured alike and write to the same trace file (PYTHONPATH has the app root)
+from helpers.tracing import setup_tracing
 
 CONFIG = DefaultConfig()
+setup_tracing("ads-bot")
 
 # Create adapter.
 # See https://aka.ms/about-bot-adapter to learn more about how bots work.
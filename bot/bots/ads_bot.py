@@ -3,14 +3,59 @@
 
 from typing import List
 import aiohttp
+import codecs
 import os
 import json
 from botbuilder.core import ActivityHandler, TurnContext, MessageFactory
 from botbuilder.schema import ChannelAccount, Attachment, Activity
+from opentelemetry import trace
+from opentelemetry.trace import SpanKind
+from helpers.tracing import trace_headers
 
+tracer = trace.get_tracer("ads-bot")
 
 
 STREAMING = os.getenv('STREAMING', 'false').lower() == 'true'
+BACKEND_URL = os.getenv('BACKEND_URL', 'http://127.0.0.1:8000/prompt')
+
+class ResponseStreamParser:
+    """Parses the backend's NDJSON stream ({"response": ...} per line) from raw byte chunks."""
+
+    def __init__(self):
+        # Incremental, so a character split across chunks isn't lost
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+        self._buffer = ""
+
+    def feed(self, chunk: bytes) -> list:
+        self._buffer += self._decoder.decode(chunk)
+        responses = []
+        # Only complete lines are parsed; the last one may still be arriving
+        *lines, self._buffer = self._buffer.split("\n")
+        for i, line in enumerate(lines):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError:
+                # Not a full JSON yet, wait for more chunks
+                self._buffer = "\n".join(lines[i:] + [self._buffer])
+                break
+            if "response" in data:
+                responses.append(data["response"])
+        return responses
+
+    def close(self) -> list:
+        """Handles whatever is left once the stream ends."""
+        buffer, self._buffer = (self._buffer + self._decoder.decode(b"", final=True)).strip(), ""
+        if not buffer:
+            return []
+        try:
+            data = json.loads(buffer)
+        except json.JSONDecodeError:
+            return [buffer]
+        return [data["response"]] if "response" in data else []
+
 
 class AdsBot(ActivityHandler):
     async def on_members_added_activity(
@@ -24,7 +69,7 @@ class AdsBot(ActivityHandler):
                 
 
     async def send_to_backend(self, prompt: str, user_id: str, attachments: list):
-        url = "http://127.0.0.1:8000/prompt"
+        url = BACKEND_URL
 
         # Convert Attachment objects to dicts
         serialized_attachments = []
@@ -42,46 +87,38 @@ class AdsBot(ActivityHandler):
             "attachments": serialized_attachments,
         }
 
+        # Not made current: this generator is suspended between chunks
+        span = tracer.start_span("bot send_to_backend", kind=SpanKind.CLIENT, attributes={"user_id": user_id})
         try:
             async with aiohttp.ClientSession() as session:
-                async with session.post(url, json=payload, timeout=None) as resp:
+                async with session.post(url, json=payload, headers=trace_headers(span), timeout=None) as resp:
+                    span.set_attribute("http.status_code", resp.status)
                     if resp.status != 200:
                         yield f"Backend error: {resp.status}"
-                    buffer = ""
+                    parser = ResponseStreamParser()
+                    first_chunk = True
                     async for chunk in resp.content.iter_chunked(1024):
                         if not chunk:
                             continue
-                        text = chunk.decode("utf-8", errors="ignore")
-                        buffer += text
-
-                        # Try to split buffer into lines and parse JSON
-                        while "\n" in buffer:
-                            line, buffer = buffer.split("\n", 1)
-                            line = line.strip()
-                            if not line:
-                                continue
-                            try:
-                                data = json.loads(line)
-                                # Yield the 'response' field
-                                if "response" in data:
-                                    yield data["response"]
-                            except json.JSONDecodeError:
-                                # Not a full JSON yet, wait for more chunks
-                                buffer = line + "\n" + buffer
-                                break
-                    # Handle leftover buffer at the end
-                    if buffer.strip():
-                        try:
-                            data = json.loads(buffer)
-                            if "response" in data:
-                                yield data["response"]
-                        except json.JSONDecodeError:
-                            yield buffer.strip()
+                        if first_chunk:
+                            span.add_event("first chunk")
+                            first_chunk = False
+                        for response in parser.feed(chunk):
+                            yield response
+                    for response in parser.close():
+                        yield response
         except Exception as e:
+            span.record_exception(e)
             yield f"Error contacting backend: {e}"
+        finally:
+            span.end()
 
 
     async def on_message_activity(self, turn_context: TurnContext):
+        with tracer.start_as_current_span("bot turn"):
+            await self.handle_message(turn_context)
+
+    async def handle_message(self, turn_context: TurnContext):
         try:
 
             user_prompt = turn_context.activity.text
@@ -2,9 +2,10 @@ from azure.data.tables import TableServiceClient, UpdateMode
 from azure.core.exceptions import ResourceNotFoundError
 from azure.core.credentials import AzureSasCredential
 import os
-import asyncio
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 import base64
+from helpers.metrics import run_in_executor, track_azure_table
+from helpers.tracing import span
 
 
 ACCOUNT_NAME = os.getenv("AZURE_ACCOUNT_NAME", "")
@@ -69,13 +70,13 @@ def _get_user_data(user_id: str):
     
 
 async def store_user_data(user_id: str, google_creds: dict):
-    loop = asyncio.get_running_loop()
-    return await loop.run_in_executor(None, _store_user_data, user_id, google_creds)
+    with track_azure_table("store_user_data"), span("AzureTables store_user_data"):
+        return await run_in_executor(_store_user_data, user_id, google_creds)
 
 
 async def get_user_data(user_id: str):
-    loop = asyncio.get_running_loop()
-    return await loop.run_in_executor(None, _get_user_data, user_id)
+    with track_azure_table("get_user_data"), span("AzureTables get_user_data"):
+        return await run_in_executor(_get_user_data, user_id)
 
 
 def encrypt_token(token: str) -> str:
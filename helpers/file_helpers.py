@@ -1,58 +1,112 @@
 import os
 import re
+import shutil
 import uuid
-import asyncio
 import csv
+import gzip
 import pandas as pd
 import docx
 import pdfplumber
 import aiohttp
+from helpers import file_lifecycle
+from helpers.metrics import run_in_executor
 
 APP_URL = os.getenv("APP_URL", "")
 FILE_SERVE_DIR = '/var/www/html/bot/static/files'
 USER_UPLOADS_DIR = '/app/user_uploads'
+ARTIFACTS_DIR = '/app/artifacts'
 
 CLIENT_ID = os.getenv("MicrosoftAppId", "")
 CLIENT_SECRET = os.getenv("MicrosoftAppPassword", "")
 TENANT_ID = os.getenv("MicrosoftAppTenantId", "")
 
 
-async def create_keyword_report_file(data: list) -> str:
-    file_name = f"{str(uuid.uuid4())[:6]}_keyword_statistics.csv"
-    file_path = f"{FILE_SERVE_DIR}/{file_name}"
-
-    os.makedirs(FILE_SERVE_DIR, exist_ok=True)
-
-    headers = [
-        "Keyword",
-        "Average Monthly Searches",
-        "Competition",
-        "Competition Index",
-        "Low Top of Page Bid (micros)",
-        "High Top of Page Bid (micros)"
-    ]
-
-    def write_csv():
-        with open(file_path, mode="w", newline="", encoding="utf-8") as f:
-            writer = csv.DictWriter(f, fieldnames=headers)
-            writer.writeheader()
-            for row in data:
-                writer.writerow({
-                    "Keyword": row.get("keyword", ""),
-                    "Average Monthly Searches": row.get("avg_monthly_searches", "N/A"),
-                    "Competition": row.get("competition", "N/A"),
-                    "Competition Index": row.get("competition_index", "N/A"),
-                    "Low Top of Page Bid (micros)": row.get("low_bid", "0"),
-                    "High Top of Page Bid (micros)": row.get("high_bid", "100000")
-                })
-
-    loop = asyncio.get_event_loop()
-    await loop.run_in_executor(None, write_csv)
-
-    return f"{APP_URL}/downloads/{file_name}", file_path
-
-
-def create_ads_campaign_file(data: str) -> str:
+# Report header -> (row field, type, value written when the field is missing)
+KEYWORD_REPORT_COLUMNS = [
+    ("Keyword", "keyword", str, ""),
+    ("Average Monthly Searches", "avg_monthly_searches", int, "N/A"),
+    ("Competition", "competition", str, "N/A"),
+    ("Competition Index", "competition_index", int, "N/A"),
+    ("Low Top of Page Bid (micros)", "low_bid", int, 0),
+    ("High Top of Page Bid (micros)", "high_bid", int, 100000),
+]
+
+# Reports are stored gzipped under a download URL without ".gz"; nginx's gzip_static serves them
+# as they are, or gunzips them for clients that don't accept gzip.
+COMPRESS_REPORTS = os.getenv("COMPRESS_REPORTS", "true").lower() == "true"
+
+
+class FileExpiredError(FileNotFoundError):
+    """A session's report or upload that was deleted to stay within the disk quota while still in use."""
+
+
+class KeywordReportWriter:
+    """
+    Writes keyword ideas to the report CSV as they arrive, in batches of BATCH_SIZE rows,
+    instead of collecting every row in memory first. Opening, writing and closing the file
+    run in a thread, off the event loop. Gzip-compressed unless COMPRESS_REPORTS is off.
+    The finished report counts towards owner's disk quota.
+    """
+
+    BATCH_SIZE = 500
+
+    def __init__(self, owner: str = "", compress: bool = COMPRESS_REPORTS):
+        self.owner = owner
+        self.compress = compress
+        self.file_name = f"{str(uuid.uuid4())[:6]}_keyword_statistics.csv"
+        self.file_path = f"{FILE_SERVE_DIR}/{self.file_name}" + (".gz" if compress else "")
+        self.rows_written = 0
+        self._file = None
+        self._writer = None
+        self._pending = []
+
+    def _write_rows(self, rows: list):
+        if self._file is None:
+            os.makedirs(FILE_SERVE_DIR, exist_ok=True)
+            if self.compress:
+                self._file = gzip.open(self.file_path, mode="wt", compresslevel=6, newline="", encoding="utf-8")
+            else:
+                self._file = open(self.file_path, mode="w", newline="", encoding="utf-8")
+            self._writer = csv.writer(self._file)
+            self._writer.writerow([header for header, _, _, _ in KEYWORD_REPORT_COLUMNS])
+        self._writer.writerows(rows)
+
+    def _finish(self):
+        self._write_rows(self._pending)
+        self._pending = []
+        self._file.close()
+        file_lifecycle.track(self.file_path, self.owner)
+
+    def _discard(self):
+        if self._file is not None:
+            self._file.close()
+            os.remove(self.file_path)
+
+    async def write(self, row: dict):
+        values = []
+        for _, key, cast, default in KEYWORD_REPORT_COLUMNS:
+            value = row.get(key)
+            values.append(default if value is None else cast(value))
+        self._pending.append(values)
+        self.rows_written += 1
+        if len(self._pending) >= self.BATCH_SIZE:
+            rows, self._pending = self._pending, []
+            await run_in_executor(self._write_rows, rows)
+
+    async def close(self):
+        """Flushes and closes the report, returning (download URL, file path). Empty reports aren't created."""
+        if not self.rows_written:
+            return None, None
+        await run_in_executor(self._finish)
+        return f"{APP_URL}/downloads/{self.file_name}", self.file_path
+
+    async def abort(self):
+        """Closes and deletes an unfinished report."""
+        self._pending = []
+        await run_in_executor(self._discard)
+
+
+def create_ads_campaign_file(data: str = "", owner: str = "") -> str:
     file_name = f"{str(uuid.uuid4())[:6]}_ads_campaign_ideas.txt"
     file_path = f"{FILE_SERVE_DIR}/{file_name}"
 
@@ -61,23 +115,55 @@ def create_ads_campaign_file(data: str) -> str:
 
     with open(file_path, 'w') as f:
         f.write(data.strip())
+    file_lifecycle.track(file_path, owner)
 
     return f"{APP_URL}/downloads/{file_name}", file_path
 
 
+def append_to_file(file_path: str, data: str):
+    with open(file_path, 'a') as f:
+        f.write(data)
+
+
+def finish_report(file_path: str, owner: str = "") -> str:
+    """
+    Counts a report written in parts towards owner's disk quota and, unless COMPRESS_REPORTS
+    is off, replaces it with its gzipped copy. Returns its path; the download URL doesn't change.
+    """
+    if not COMPRESS_REPORTS:
+        file_lifecycle.track(file_path, owner)
+        return file_path
+    gz_path = f"{file_path}.gz"
+    with open(file_path, 'rb') as src, gzip.open(gz_path, 'wb', compresslevel=6) as dst:
+        shutil.copyfileobj(src, dst)
+    file_lifecycle.track(gz_path, owner)
+    file_lifecycle.remove(file_path)
+    return gz_path
+
+
 def file_to_text(file_path: str) -> str:
+    if not os.path.exists(file_path):
+        raise FileExpiredError(
+            f"The file {os.path.basename(file_path)} has expired and was deleted to free disk space. "
+            "Create it again, e.g. re-run the keyword search or campaign ideas, or ask the user to upload it again."
+        )
+    file_lifecycle.touch(file_path)
     if file_path.endswith(('.xlsx', '.xls')):
         # Read Excel and convert to CSV text
         df = pd.read_excel(file_path)
         return df.to_csv(index=False)
     
-    elif file_path.endswith('.csv'):
+    elif file_path.endswith(('.csv', '.csv.gz')):
         df = pd.read_csv(file_path)
         return df.to_csv(index=False)
     
     elif file_path.endswith(('.txt', 'html', 'htm')):
         with open(file_path, 'r', encoding='utf-8') as f:
             return f.read()
+
+    elif file_path.endswith('.txt.gz'):
+        with gzip.open(file_path, 'rt', encoding='utf-8') as f:
+            return f.read()
     
     elif file_path.endswith('.docx'):
         doc = docx.Document(file_path)
@@ -103,26 +189,43 @@ def text_to_file(user_id: str, text_data: str, filename: str) -> str:
         print(f"Local Path: {local_path}", flush=True)
         with open(local_path, 'w') as f:
             f.write(text_data)
+        file_lifecycle.track(local_path, user_id)
         return local_path
     except:
         try:
             local_path = f"{USER_UPLOADS_DIR}/{user_id}/{file_uid}.txt"
             with open(local_path, 'w') as f:
                 f.write(text_data)
+            file_lifecycle.track(local_path, user_id)
             return local_path
         except Exception as e:
             raise e
 
 
 
+def save_artifact(session_id: str, text: str) -> str:
+    """Writes text kept out of the chat history (large messages, extracted upload text) to the session's artifacts folder."""
+    os.makedirs(f"{ARTIFACTS_DIR}/{session_id}", exist_ok=True)
+    file_path = f"{ARTIFACTS_DIR}/{session_id}/{uuid.uuid4().hex[:8]}.txt"
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    return file_path
+
+
+def read_text_range(file_path: str, offset: int = 0, max_chars: int = 4000) -> str:
+    return file_to_text(file_path)[offset:offset + max_chars]
+
+
+def remove_artifacts(session_id: str):
+    shutil.rmtree(f"{ARTIFACTS_DIR}/{session_id}", ignore_errors=True)
+
+
 def sanitize_text(text: str) -> str:
     # Remove prohibited symbols
     return re.sub(r"[#\$]{2,}", "", text).strip()
 
 
 async def handle_attachments(user_id: str, attachment_urls: list):
-    os.makedirs(f"{USER_UPLOADS_DIR}/{user_id}", exist_ok=True)
-
     results = []
 
     async with aiohttp.ClientSession() as session:
@@ -143,8 +246,11 @@ async def handle_attachments(user_id: str, attachment_urls: list):
 
                     # Write file to user uploads directory
                     content = await resp.read()
+                    # Created right before the write; the orphan sweep may remove it while it's empty
+                    os.makedirs(f"{USER_UPLOADS_DIR}/{user_id}", exist_ok=True)
                     with open(local_path, "wb") as f:
                         f.write(content)
+                    file_lifecycle.track(local_path, user_id)
 
                 # Extract text content
                 try:
@@ -0,0 +1,172 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+import os
+import shutil
+import threading
+import time
+
+# Disk space one user's reports and uploads may use; their least recently used files are removed beyond it.
+USER_DISK_QUOTA_MB = int(os.getenv("USER_DISK_QUOTA_MB", 200))
+# Disk space all tracked files may use together.
+DISK_QUOTA_MB = int(os.getenv("DISK_QUOTA_MB", 5000))
+# Untracked files (e.g. left over from before a restart) older than this are removed by sweep_orphans.
+ORPHAN_MIN_AGE = int(os.getenv("ORPHAN_MIN_AGE", 60 * 60))
+ORPHAN_SWEEP_INTERVAL = int(os.getenv("ORPHAN_SWEEP_INTERVAL", 60 * 60))
+
+
+@dataclass(slots=True)
+class TrackedFile:
+    path: str
+    owner: str
+    size: int
+    created: float
+
+
+# path -> TrackedFile, least recently used first
+_files = OrderedDict()
+# owner -> paths, least recently used first
+_by_owner = {}
+_owner_bytes = {}
+_total_bytes = 0
+# Files are tracked from the event loop and removed from executor threads
+_lock = threading.Lock()
+
+
+def _delete(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _forget(path: str) -> TrackedFile:
+    global _total_bytes
+    tracked = _files.pop(path, None)
+    if tracked is None:
+        return None
+    paths = _by_owner[tracked.owner]
+    del paths[path]
+    _owner_bytes[tracked.owner] -= tracked.size
+    # Zero-byte files leave the owner at 0 bytes while it still has files, so go by the paths
+    if not paths:
+        del _by_owner[tracked.owner]
+        del _owner_bytes[tracked.owner]
+    _total_bytes -= tracked.size
+    return tracked
+
+
+def _evict(owner: str, keep: str) -> list:
+    """Picks least recently used files to remove until the owner's and the global quota are met."""
+    evicted = []
+    user_quota, disk_quota = USER_DISK_QUOTA_MB * 1024 * 1024, DISK_QUOTA_MB * 1024 * 1024
+    while USER_DISK_QUOTA_MB and _owner_bytes.get(owner, 0) > user_quota:
+        path = next((p for p in _by_owner[owner] if p != keep), None)
+        if path is None:
+            break
+        evicted.append(_forget(path))
+    while DISK_QUOTA_MB and _total_bytes > disk_quota:
+        path = next((p for p in _files if p != keep), None)
+        if path is None:
+            break
+        evicted.append(_forget(path))
+    return evicted
+
+
+def track(path: str, owner: str):
+    """
+    Records a file a user's session created (or its new size after it was written to),
+    removing that user's or anyone's least recently used files if a quota is exceeded.
+    """
+    global _total_bytes
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return
+    owner = owner or ""
+    with _lock:
+        previous = _forget(path)
+        _files[path] = TrackedFile(path, owner, size, previous.created if previous else time.time())
+        _by_owner.setdefault(owner, OrderedDict())[path] = None
+        _owner_bytes[owner] = _owner_bytes.get(owner, 0) + size
+        _total_bytes += size
+        evicted = _evict(owner, keep=path)
+    for tracked in evicted:
+        print(f"Disk quota exceeded, removed {tracked.path} ({tracked.size} bytes, owner {tracked.owner})", flush=True)
+        _delete(tracked.path)
+
+
+def touch(path: str):
+    """Marks a tracked file as used, so quota eviction removes it last."""
+    with _lock:
+        tracked = _files.get(path)
+        if tracked:
+            _files.move_to_end(path)
+            _by_owner[tracked.owner].move_to_end(path)
+
+
+def remove(path: str):
+    with _lock:
+        _forget(path)
+    _delete(path)
+
+
+def remove_owner(owner: str, created_before: float = None) -> int:
+    """
+    Removes the tracked files of a user, e.g. when their session expires. created_before
+    spares files of a newer session. Returns the number removed.
+    """
+    with _lock:
+        removed = [
+            _forget(path) for path in list(_by_owner.get(owner or "", ()))
+            if created_before is None or _files[path].created < created_before
+        ]
+    for tracked in removed:
+        _delete(tracked.path)
+    return len(removed)
+
+
+def total_bytes() -> int:
+    return _total_bytes
+
+
+def sweep_orphans(dirs: list, min_age: int = ORPHAN_MIN_AGE) -> int:
+    """
+    Removes files under dirs that aren't tracked and are older than min_age, then any
+    directories left empty that are also older than min_age (a new one may be about to be
+    written to). Returns the number of files removed.
+    """
+    cutoff = time.time() - min_age
+    removed = 0
+    for directory in dirs:
+        for root, _, names in os.walk(directory, topdown=False):
+            for name in names:
+                path = os.path.join(root, name)
+                with _lock:
+                    tracked = path in _files
+                try:
+                    if not tracked and os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        removed += 1
+                except OSError:
+                    pass
+            if root != directory:
+                try:
+                    if os.path.getmtime(root) < cutoff:
+                        os.rmdir(root)
+                except OSError:
+                    pass
+    if removed:
+        print(f"Removed {removed} orphaned files", flush=True)
+    return removed
+
+
+def clear_dirs(dirs: list):
+    """Empties directories whose contents only live as long as the process, e.g. session artifacts."""
+    for directory in dirs:
+        if os.path.isdir(directory):
+            for name in os.listdir(directory):
+                path = os.path.join(directory, name)
+                if os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    _delete(path)
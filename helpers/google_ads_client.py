@@ -0,0 +1,198 @@
+import asyncio
+import os
+import time
+import grpc
+from collections import OrderedDict
+from importlib import import_module
+from inspect import iscoroutinefunction
+from google.ads.googleads import util
+from google.ads.googleads.client import GoogleAdsClient
+from google.api_core.exceptions import GoogleAPICallError
+from helpers.google_ads_token import refresh_access_token
+from helpers.metrics import track_rpc
+from helpers.tracing import span
+from opentelemetry.trace import SpanKind
+
+API_VERSION = "v22"
+ENDPOINT = "googleads.googleapis.com:443"
+
+# Same limits the google-ads library applies to its own channels.
+CHANNEL_OPTIONS = [
+    ("grpc.max_metadata_size", 16 * 1024 * 1024),
+    ("grpc.max_receive_message_length", 64 * 1024 * 1024),
+]
+
+FAILURE_METADATA_KEY = f"google.ads.googleads.{API_VERSION}.errors.googleadsfailure-bin"
+
+# Refresh access tokens this many seconds before Google says they expire.
+TOKEN_EXPIRY_MARGIN = 120
+# Access tokens kept for this many users; the least recently used are dropped beyond it.
+ACCESS_TOKEN_CACHE_SIZE = int(os.getenv("ACCESS_TOKEN_CACHE_SIZE", 1000))
+
+# One multiplexed grpc.aio channel per process; per-user auth travels as call metadata.
+_channel = None
+_services = {}
+
+# Types and enums don't depend on credentials, so a single credential-less client serves everyone.
+_types = GoogleAdsClient(credentials=None, developer_token="", use_proto_plus=True, version=API_VERSION)
+
+# refresh_token -> (access_token, expires_at), least recently used first
+_access_tokens = OrderedDict()
+# refresh_token -> lock, only while its token is being refreshed
+_token_locks = {}
+
+# Called as hook(customer_id) after every mutate RPC, e.g. to drop cached account data.
+mutate_hooks = []
+
+
+class GoogleAdsRequestError(Exception):
+    """Raised when a Google Ads RPC fails. The message lists the API's error details."""
+
+    @classmethod
+    def from_call_error(cls, error: GoogleAPICallError):
+        messages = []
+        try:
+            trailing = error.response.trailing_metadata() or []
+            for key, value in trailing:
+                if key == FAILURE_METADATA_KEY:
+                    failure = type(_types.get_type("GoogleAdsFailure")).deserialize(value)
+                    messages = [e.message for e in failure.errors]
+        except Exception:
+            pass
+        return cls("; ".join(messages) if messages else str(error))
+
+
+def _get_channel():
+    global _channel
+    if _channel is None:
+        _channel = grpc.aio.secure_channel(ENDPOINT, grpc.ssl_channel_credentials(), options=CHANNEL_OPTIONS)
+    return _channel
+
+
+def _get_service(name: str):
+    """Returns the generated async service client for `name`, bound to the shared channel."""
+    if name not in _services:
+        module_path = f"google.ads.googleads.{API_VERSION}.services.services.{util.convert_upper_case_to_snake_case(name)}"
+        client_class = getattr(import_module(f"{module_path}.async_client"), f"{name}AsyncClient")
+        transport_class = getattr(import_module(f"{module_path}.transports.grpc_asyncio"), f"{name}GrpcAsyncIOTransport")
+        _services[name] = client_class(transport=transport_class(channel=_get_channel()))
+    return _services[name]
+
+
+async def get_access_token(refresh_token: str) -> str:
+    token, expires_at = _access_tokens.get(refresh_token, ("", 0))
+    if time.time() < expires_at:
+        _access_tokens.move_to_end(refresh_token)
+        return token
+
+    lock = _token_locks.setdefault(refresh_token, asyncio.Lock())
+    try:
+        async with lock:
+            token, expires_at = _access_tokens.get(refresh_token, ("", 0))
+            if time.time() >= expires_at:
+                token, expires_in = await refresh_access_token(refresh_token)
+                _access_tokens[refresh_token] = (token, time.time() + expires_in - TOKEN_EXPIRY_MARGIN)
+                _access_tokens.move_to_end(refresh_token)
+                while len(_access_tokens) > ACCESS_TOKEN_CACHE_SIZE:
+                    _access_tokens.popitem(last=False)
+    finally:
+        # A caller still waiting on it finds the fresh token; a new one would get a new lock and do the same
+        if not lock.locked() and _token_locks.get(refresh_token) is lock:
+            del _token_locks[refresh_token]
+    return token
+
+
+class AsyncService:
+    """Wraps a generated async service client, adding auth metadata and readable errors to every RPC."""
+
+    def __init__(self, name: str, service, client: "AsyncGoogleAdsClient"):
+        self._name = name
+        self._service = service
+        self._client = client
+
+    def __getattr__(self, name):
+        attr = getattr(self._service, name)
+        if not iscoroutinefunction(attr):
+            # Path helpers etc.
+            return attr
+
+        async def call(*args, **kwargs):
+            metadata = await self._client.metadata()
+            try:
+                with track_rpc(self._name, name), span(f"GoogleAds {self._name}.{name}", kind=SpanKind.CLIENT):
+                    return await attr(*args, metadata=metadata, **kwargs)
+            except GoogleAPICallError as e:
+                raise GoogleAdsRequestError.from_call_error(e) from e
+            finally:
+                # Failed mutates may still have partially applied
+                if name.startswith("mutate"):
+                    for hook in mutate_hooks:
+                        hook(kwargs.get("customer_id"))
+
+        return call
+
+
+class AsyncGoogleAdsClient:
+    """
+    Native asyncio Google Ads client. RPCs run on a shared grpc.aio channel and
+    stream results into the event loop, so no executor thread is held per call.
+    """
+
+    def __init__(self, refresh_token: str, developer_token: str, login_customer_id: str = None):
+        self.refresh_token = refresh_token
+        self.developer_token = developer_token
+        self.login_customer_id = login_customer_id
+        self.enums = _types.enums
+
+    @staticmethod
+    def get_type(name: str):
+        return _types.get_type(name)
+
+    @staticmethod
+    def copy_from(destination, origin):
+        return GoogleAdsClient.copy_from(destination, origin)
+
+    async def metadata(self):
+        access_token = await get_access_token(self.refresh_token)
+        metadata = [
+            ("authorization", f"Bearer {access_token}"),
+            ("developer-token", self.developer_token),
+        ]
+        if self.login_customer_id:
+            metadata.append(("login-customer-id", str(self.login_customer_id)))
+        return metadata
+
+    def get_service(self, name: str) -> AsyncService:
+        return AsyncService(name, _get_service(name), self)
+
+    async def search_stream(self, customer_id: str, query: str):
+        """Yields GoogleAdsRow objects as each streamed batch arrives."""
+        metadata = await self.metadata()
+        try:
+            with track_rpc("GoogleAdsService", "search_stream"), \
+                    span("GoogleAds GoogleAdsService.search_stream", current=False, kind=SpanKind.CLIENT):
+                stream = await _get_service("GoogleAdsService").search_stream(
+                    customer_id=customer_id, query=query, metadata=metadata
+                )
+                async for batch in stream:
+                    for row in batch.results:
+                        yield row
+        except GoogleAPICallError as e:
+            raise GoogleAdsRequestError.from_call_error(e) from e
+
+    async def search(self, customer_id: str, query: str) -> list:
+        return [row async for row in self.search_stream(customer_id, query)]
+
+    async def generate_keyword_ideas(self, request):
+        """Yields keyword ideas, following result pages as needed."""
+        metadata = await self.metadata()
+        try:
+            with track_rpc("KeywordPlanIdeaService", "generate_keyword_ideas"), \
+                    span("GoogleAds KeywordPlanIdeaService.generate_keyword_ideas", current=False, kind=SpanKind.CLIENT):
+                pager = await _get_service("KeywordPlanIdeaService").generate_keyword_ideas(
+                    request=request, metadata=metadata
+                )
+                async for idea in pager:
+                    yield idea
+        except GoogleAPICallError as e:
+            raise GoogleAdsRequestError.from_call_error(e) from e
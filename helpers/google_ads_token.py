@@ -1,54 +1,91 @@
+from base64 import urlsafe_b64encode
+from urllib.parse import parse_qs, urlencode, urlsplit
+import hashlib
 import os
-from google_auth_oauthlib.flow import Flow
+import secrets
+import aiohttp
 
 CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
 CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
 REDIRECT_URI = os.getenv("APP_URL") + "/callback"
 SCOPES = ["https://www.googleapis.com/auth/adwords"]
+AUTH_URI = "https://accounts.google.com/o/oauth2/auth"
+TOKEN_URI = "https://oauth2.googleapis.com/token"
+TOKEN_TIMEOUT = aiohttp.ClientTimeout(total=30)
+
+# The parts of the consent URL that are the same for every user
+AUTH_PARAMS = {
+    "response_type": "code",
+    "client_id": CLIENT_ID,
+    "redirect_uri": REDIRECT_URI,
+    "scope": " ".join(SCOPES),
+    "access_type": "offline",
+    "prompt": "consent",
+    "include_granted_scopes": "true",
+    "code_challenge_method": "S256",
+}
 
 
 async def get_google_ads_auth_url():
+    """
+    Builds the Google consent URL. Returns (url, state, code_verifier); the state and PKCE
+    code verifier must be kept for the token exchange in get_google_ads_token.
+    """
+    state = secrets.token_urlsafe(30)
+    code_verifier = secrets.token_urlsafe(96)
+    code_challenge = urlsafe_b64encode(hashlib.sha256(code_verifier.encode()).digest()).decode().rstrip("=")
+    authorization_url = f"{AUTH_URI}?{urlencode({**AUTH_PARAMS, 'state': state, 'code_challenge': code_challenge})}"
+    return authorization_url, state, code_verifier
+
+
+async def _post_token_request(data: dict) -> dict:
+    async with aiohttp.ClientSession() as session:
+        async with session.post(TOKEN_URI, data=data, timeout=TOKEN_TIMEOUT) as resp:
+            try:
+                payload = await resp.json()
+            except (aiohttp.ContentTypeError, ValueError):
+                # 5xx pages and proxies answer with HTML or plain text
+                body = (await resp.text(errors="replace")).strip()
+                raise RuntimeError(f"Token request failed ({resp.status}): {body[:200] or resp.reason}")
+            if resp.status != 200 or not isinstance(payload, dict):
+                detail = payload.get("error_description", payload) if isinstance(payload, dict) else payload
+                raise RuntimeError(f"Token request failed ({resp.status}): {detail}")
+    return payload
+
+
+async def get_google_ads_token(state, auth_resp, code_verifier=None):
+    """
+    Exchanges the authorization code in the callback URL for tokens, without blocking the
+    event loop. Returns (access token, refresh token).
+    """
+    query = parse_qs(urlsplit(str(auth_resp)).query)
+    if "error" in query:
+        raise RuntimeError(f"Authorization failed: {query['error'][0]}")
+    if query.get("state", [None])[0] != state:
+        raise RuntimeError("Authorization failed: state mismatch")
+    if "code" not in query:
+        raise RuntimeError("Authorization failed: no code in the callback")
+
+    data = {
+        "grant_type": "authorization_code",
+        "code": query["code"][0],
+        "redirect_uri": REDIRECT_URI,
+        "client_id": CLIENT_ID,
+        "client_secret": CLIENT_SECRET,
+    }
+    if code_verifier:
+        data["code_verifier"] = code_verifier
+    payload = await _post_token_request(data)
+    return payload["access_token"], payload.get("refresh_token", "")
+
 
-    flow = Flow.from_client_config(
-        {
-            "web": {
-                "client_id": CLIENT_ID,
-                "client_secret": CLIENT_SECRET,
-                "redirect_uris": [REDIRECT_URI],
-                "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                "token_uri": "https://oauth2.googleapis.com/token",
-            }
-        },
-        scopes=SCOPES
-    )
-    flow.redirect_uri = REDIRECT_URI
-    authorization_url, state = flow.authorization_url(
-        access_type="offline",
-        prompt="consent",
-        include_granted_scopes="true"
-    )
-
-    return authorization_url, state
-
-
-async def get_google_ads_token(state, auth_resp):
-    flow = Flow.from_client_config(
-        {
-            "web": {
-                "client_id": CLIENT_ID,
-                "client_secret": CLIENT_SECRET,
-                "redirect_uris": [REDIRECT_URI],
-                "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                "token_uri": "https://oauth2.googleapis.com/token",
-            }
-        },
-        scopes=SCOPES,
-        state=state
-    )
-
-    flow.redirect_uri = REDIRECT_URI
-
-    flow.fetch_token(authorization_response=auth_resp)
-
-    credentials = flow.credentials
-    return credentials
\ No newline at end of file
+async def refresh_access_token(refresh_token: str):
+    """Exchanges a refresh token for an access token without blocking the event loop."""
+    data = {
+        "grant_type": "refresh_token",
+        "refresh_token": refresh_token,
+        "client_id": CLIENT_ID,
+        "client_secret": CLIENT_SECRET,
+    }
+    payload = await _post_token_request(data)
+    return payload["access_token"], int(payload.get("expires_in", 3600))
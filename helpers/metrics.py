@@ -0,0 +1,103 @@
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from contextlib import contextmanager
+import asyncio
+import functools
+import threading
+import time
+
+# Tools, Google Ads and Bedrock calls range from milliseconds to minutes (keyword searches, idea generation)
+SLOW_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600)
+
+TOOL_DURATION = Histogram(
+    "ads_tool_duration_seconds", "Agent tool call latency", ["tool", "outcome"], buckets=SLOW_BUCKETS,
+)
+GOOGLE_ADS_RPCS = Counter(
+    "ads_google_ads_rpcs_total", "Google Ads RPCs", ["service", "method", "status"],
+)
+GOOGLE_ADS_RPC_DURATION = Histogram(
+    "ads_google_ads_rpc_duration_seconds", "Google Ads RPC latency, including reading streamed results",
+    ["service", "method"], buckets=SLOW_BUCKETS,
+)
+LLM_TIME_TO_FIRST_TOKEN = Histogram(
+    "ads_llm_time_to_first_token_seconds", "Bedrock time to the first streamed token", buckets=SLOW_BUCKETS,
+)
+LLM_TOKENS_PER_SECOND = Histogram(
+    "ads_llm_output_tokens_per_second", "Bedrock output tokens per second",
+    buckets=(5, 10, 20, 30, 50, 75, 100, 150, 200, 300),
+)
+LLM_TOKENS = Counter("ads_llm_tokens_total", "Bedrock tokens", ["kind"])
+AZURE_TABLE_DURATION = Histogram(
+    "ads_azure_table_duration_seconds", "Azure Table Storage operation latency", ["operation"],
+)
+ACTIVE_SESSIONS = Gauge("ads_active_sessions", "User sessions held in memory")
+SPILLED_SESSIONS = Gauge("ads_spilled_sessions", "Idle user sessions spilled to disk")
+TRACKED_FILE_BYTES = Gauge("ads_tracked_file_bytes", "Disk used by generated reports and uploads")
+EXECUTOR_QUEUE_DEPTH = Gauge("ads_executor_queue_depth", "Jobs waiting for a thread in the default executor")
+
+# Tool results that start with one of these are errors reported back to the LLM
+ERROR_PREFIXES = ("error", "there was an error")
+
+
+async def run_in_executor(func, *args, **kwargs):
+    """
+    Runs a blocking function in the default executor, counted in EXECUTOR_QUEUE_DEPTH until
+    a thread picks it up. Use it for all default executor work so the gauge sees every job.
+    """
+    # Taken by whichever comes first: the job starting, or the caller giving up on it (cancelled before it ran)
+    counted = threading.Lock()
+
+    def run():
+        if counted.acquire(blocking=False):
+            EXECUTOR_QUEUE_DEPTH.dec()
+        return func(*args, **kwargs)
+
+    EXECUTOR_QUEUE_DEPTH.inc()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(None, run)
+    finally:
+        if counted.acquire(blocking=False):
+            EXECUTOR_QUEUE_DEPTH.dec()
+
+
+def instrument_tool(func):
+    """Records the latency and outcome of an async agent tool."""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            result = await func(*args, **kwargs)
+            if not (isinstance(result, str) and result.lower().startswith(ERROR_PREFIXES)):
+                outcome = "ok"
+            return result
+        finally:
+            TOOL_DURATION.labels(func.__name__, outcome).observe(time.perf_counter() - start)
+    return wrapper
+
+
+@contextmanager
+def track_rpc(service: str, method: str):
+    start = time.perf_counter()
+    status = "OK"
+    try:
+        yield
+    except Exception as e:
+        status = getattr(getattr(e, "grpc_status_code", None), "name", None) or type(e).__name__
+        raise
+    finally:
+        GOOGLE_ADS_RPCS.labels(service, method, status).inc()
+        GOOGLE_ADS_RPC_DURATION.labels(service, method).observe(time.perf_counter() - start)
+
+
+@contextmanager
+def track_azure_table(operation: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        AZURE_TABLE_DURATION.labels(operation).observe(time.perf_counter() - start)
+
+
+def render():
+    """Returns (body, content type) for the /metrics endpoint."""
+    return generate_latest(), CONTENT_TYPE_LATEST
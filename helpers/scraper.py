@@ -0,0 +1,303 @@
+from bs4 import BeautifulSoup
+from dataclasses import dataclass
+from helpers.metrics import run_in_executor
+from helpers.tracing import span
+from opentelemetry.trace import SpanKind
+import aiohttp
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+import zlib
+from urllib.parse import urldefrag, urljoin, urlsplit
+
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+# Seconds allowed for one page, from connecting to the last byte.
+SCRAPE_TIMEOUT = int(os.getenv("SCRAPE_TIMEOUT", 15))
+# Pages are cut off after this many bytes.
+SCRAPE_MAX_BYTES = int(os.getenv("SCRAPE_MAX_BYTES", 2 * 1024 * 1024))
+# Concurrent connections per host, and in total.
+SCRAPE_PER_HOST = int(os.getenv("SCRAPE_PER_HOST", 4))
+SCRAPE_CONCURRENCY = int(os.getenv("SCRAPE_CONCURRENCY", 16))
+
+# Extracted page text is cached here with the page's ETag and Last-Modified.
+SCRAPE_CACHE_DIR = os.getenv("SCRAPE_CACHE_DIR", "/app/cache/pages")
+# Cached pages are used as they are for this many seconds, then revalidated with a conditional GET.
+SCRAPE_CACHE_TTL = int(os.getenv("SCRAPE_CACHE_TTL", 24 * 60 * 60))
+# Cached pages not fetched or revalidated for this many seconds are removed by the orphan sweep.
+SCRAPE_CACHE_MAX_AGE = int(os.getenv("SCRAPE_CACHE_MAX_AGE", 7 * 24 * 60 * 60))
+
+# Crawl budgets: pages fetched, link depth from the start page, and page bytes downloaded in total.
+CRAWL_MAX_PAGES = int(os.getenv("CRAWL_MAX_PAGES", 30))
+CRAWL_MAX_DEPTH = int(os.getenv("CRAWL_MAX_DEPTH", 2))
+CRAWL_MAX_BYTES = int(os.getenv("CRAWL_MAX_BYTES", 10 * 1024 * 1024))
+
+USER_AGENT = "Mozilla/5.0 (compatible; AdsManagerBot/1.0)"
+TEXT_CONTENT_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
+# Elements whose text is boilerplate, not page content
+BOILERPLATE_TAGS = ["script", "style", "noscript", "template", "svg", "iframe", "nav", "aside"]
+# Links to these aren't followed when crawling
+SKIPPED_EXTENSIONS = re.compile(
+    r"\.(jpe?g|png|gif|webp|svg|ico|css|js|json|xml|pdf|zip|gz|rar|mp3|mp4|mov|avi|woff2?|ttf|docx?|xlsx?|pptx?)$", re.I
+)
+SITEMAP_LOC = re.compile(r"<loc>\s*(.*?)\s*</loc>", re.I | re.S)
+
+
+@dataclass(slots=True)
+class Page:
+    url: str
+    text: str = ""
+    error: str = ""
+    truncated: bool = False
+    # "hit" (fresh), "revalidated" (304), "miss" or "" when caching didn't apply
+    cache: str = ""
+    # Bytes downloaded for the page (when it was first fetched, for cached pages)
+    size: int = 0
+    links: list = None
+
+
+def _cached_page(url: str, entry: dict, cache: str) -> Page:
+    return Page(url, text=entry["text"], truncated=entry["truncated"], cache=cache,
+                size=entry.get("size", 0), links=entry.get("links", []))
+
+
+def _cache_path(url: str) -> str:
+    return os.path.join(SCRAPE_CACHE_DIR, f"{hashlib.sha256(url.encode()).hexdigest()}.json")
+
+
+def load_cached(url: str) -> dict:
+    try:
+        with open(_cache_path(url), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def store_cached(url: str, entry: dict):
+    """Writes the entry atomically, so concurrent scrapes of the same URL never read half a file."""
+    path = _cache_path(url)
+    tmp_path = f"{path}.{os.getpid()}.{id(entry)}.tmp"
+    try:
+        os.makedirs(SCRAPE_CACHE_DIR, exist_ok=True)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Could not cache {url}: {e}", flush=True)
+
+
+def extract_page(body: bytes, encoding: str = None, base_url: str = "") -> tuple:
+    """
+    The visible text of an HTML page, without scripts, styles and navigation, and the
+    http(s) links on it (navigation included). Returns (text, links). CPU bound.
+    """
+    soup = BeautifulSoup(body, HTML_PARSER, from_encoding=encoding)
+    links = {}
+    for a in soup.find_all("a", href=True):
+        link = urldefrag(urljoin(base_url, a["href"].strip())).url
+        if link.startswith(("http://", "https://")):
+            links[link] = None
+    for tag in soup(BOILERPLATE_TAGS):
+        tag.decompose()
+    for tag in soup.select('[role="navigation"]'):
+        tag.decompose()
+    return soup.get_text(separator=" ", strip=True), list(links)
+
+
+async def read_limited(response, max_bytes: int = SCRAPE_MAX_BYTES) -> tuple:
+    """Reads a response body up to max_bytes. Returns (body, whether it was cut off)."""
+    chunks = []
+    size = 0
+    async for chunk in response.content.iter_chunked(64 * 1024):
+        chunks.append(chunk)
+        size += len(chunk)
+        if size >= max_bytes:
+            return b"".join(chunks)[:max_bytes], True
+    return b"".join(chunks), False
+
+
+def create_session() -> aiohttp.ClientSession:
+    """A session bounded by SCRAPE_TIMEOUT and the per-host and total connection limits."""
+    return aiohttp.ClientSession(
+        timeout=aiohttp.ClientTimeout(total=SCRAPE_TIMEOUT),
+        connector=aiohttp.TCPConnector(limit=SCRAPE_CONCURRENCY, limit_per_host=SCRAPE_PER_HOST),
+        headers={"User-Agent": USER_AGENT},
+    )
+
+
+async def fetch_page(session: aiohttp.ClientSession, url: str) -> Page:
+    """
+    A page's text, from the cache while it's fresh or the server answers a conditional GET
+    with 304, otherwise downloaded and extracted in the default executor. Errors are returned
+    on the Page.
+    """
+    try:
+        with span("scrape page", attributes={"url": url}, kind=SpanKind.CLIENT) as s:
+            cached = await run_in_executor(load_cached, url)
+            if cached and time.time() - cached["fetched_at"] < SCRAPE_CACHE_TTL:
+                s.set_attribute("cache", "hit")
+                return _cached_page(url, cached, "hit")
+
+            headers = {}
+            if cached and cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached and cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+            async with session.get(url, headers=headers) as response:
+                if response.status == 304 and cached:
+                    cached["fetched_at"] = time.time()
+                    await run_in_executor(store_cached, url, cached)
+                    s.set_attribute("cache", "revalidated")
+                    return _cached_page(url, cached, "revalidated")
+                response.raise_for_status()
+                if response.content_type not in TEXT_CONTENT_TYPES:
+                    return Page(url, error=f"Unsupported content type: {response.content_type}")
+                body, truncated = await read_limited(response)
+                encoding = response.charset
+                final_url = str(response.url)
+                entry = {
+                    "url": url,
+                    "size": len(body),
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                    "fetched_at": time.time(),
+                    "truncated": truncated,
+                }
+                cacheable = "no-store" not in response.headers.get("Cache-Control", "")
+            s.set_attribute("cache", "miss")
+            s.set_attribute("bytes", len(body))
+            text, links = await run_in_executor(extract_page, body, encoding, final_url)
+            if cacheable:
+                entry["text"] = text
+                entry["links"] = links
+                await run_in_executor(store_cached, url, entry)
+        return Page(url, text=text, truncated=truncated, cache="miss", size=len(body), links=links)
+    except asyncio.TimeoutError:
+        return Page(url, error=f"Timed out after {SCRAPE_TIMEOUT}s")
+    except Exception as e:
+        return Page(url, error=str(e) or type(e).__name__)
+
+
+async def scrape(urls: list) -> list:
+    """Fetches the URLs concurrently, returning a Page for each in the same order."""
+    async with create_session() as session:
+        return await asyncio.gather(*(fetch_page(session, url) for url in urls))
+
+
+def _site(url: str) -> str:
+    return urlsplit(url).netloc.lower().removeprefix("www.")
+
+
+def _crawlable(url: str, site: str) -> bool:
+    parts = urlsplit(url)
+    return parts.scheme in ("http", "https") and _site(url) == site and not SKIPPED_EXTENSIONS.search(parts.path)
+
+
+def _sitemap_text(body: bytes) -> str:
+    """A sitemap's XML; .xml.gz sitemaps arrive still gzipped, and are unpacked up to SCRAPE_MAX_BYTES."""
+    if body[:2] == b"\x1f\x8b":
+        body = zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(body, SCRAPE_MAX_BYTES)
+    return body.decode("utf-8", errors="replace")
+
+
+async def sitemap_urls(session: aiohttp.ClientSession, url: str, limit: int) -> list:
+    """
+    Page URLs listed in a sitemap, following one level of sitemap index. Returns at most
+    limit URLs, or none if there is no readable sitemap.
+    """
+    urls = []
+    sitemaps = [url]
+    for depth in range(2):
+        nested = []
+        for sitemap in sitemaps:
+            try:
+                async with session.get(sitemap) as response:
+                    if response.status != 200:
+                        continue
+                    body, _ = await read_limited(response)
+                text = _sitemap_text(body)
+            except Exception as e:
+                print(f"Failed to read sitemap {sitemap}: {e}", flush=True)
+                continue
+            for loc in SITEMAP_LOC.findall(text):
+                loc = loc.replace("&amp;", "&")
+                if loc.lower().split("?")[0].endswith((".xml", ".xml.gz")):
+                    nested.append(loc)
+                elif len(urls) < limit:
+                    urls.append(loc)
+        if len(urls) >= limit or not nested:
+            break
+        sitemaps = nested[:5]
+    return urls
+
+
+async def crawl(start_url: str, max_pages: int = CRAWL_MAX_PAGES, max_depth: int = CRAWL_MAX_DEPTH,
+                max_bytes: int = CRAWL_MAX_BYTES) -> list:
+    """
+    Breadth-first crawl of a website from start_url (a page or a sitemap.xml), staying on
+    its domain. The site's sitemap.xml seeds the first level when there is one. Each level is
+    fetched concurrently within the connection limits, until max_pages, max_depth or
+    max_bytes is reached. Returns the pages read, without errors or duplicate content.
+    """
+    site = _site(start_url)
+    origin = "{0.scheme}://{0.netloc}".format(urlsplit(start_url))
+    pages = []
+    seen_urls = set()
+    seen_content = set()
+    downloaded = 0
+    limit = asyncio.Semaphore(SCRAPE_CONCURRENCY)
+
+    async def fetch(session, url):
+        nonlocal downloaded
+        async with limit:
+            # Checked as each fetch starts, so the byte budget is overshot by at most the pages in flight
+            if downloaded >= max_bytes:
+                return None
+            page = await fetch_page(session, url)
+            # Pages from the cache weren't downloaded again (page.size is from when they were)
+            if page.cache not in ("hit", "revalidated"):
+                downloaded += page.size
+            return page
+
+    async with create_session() as session:
+        if urlsplit(start_url).path.lower().endswith(".xml"):
+            level = await sitemap_urls(session, start_url, max_pages)
+        else:
+            level = [start_url, *await sitemap_urls(session, f"{origin}/sitemap.xml", max_pages)]
+
+        for depth in range(max_depth + 1):
+            batch = []
+            for url in level:
+                url = urldefrag(url).url
+                if url not in seen_urls and _crawlable(url, site):
+                    seen_urls.add(url)
+                    batch.append(url)
+            batch = batch[:max_pages - len(pages)]
+            if not batch:
+                break
+
+            next_level = []
+            for page in await asyncio.gather(*(fetch(session, url) for url in batch)):
+                if page is None:
+                    continue
+                if page.error:
+                    print(f"Failed to fetch {page.url}: {page.error}", flush=True)
+                    continue
+                next_level.extend(page.links or [])
+                digest = hashlib.sha1(page.text.encode()).digest()
+                if page.text and digest not in seen_content:
+                    seen_content.add(digest)
+                    pages.append(page)
+            if len(pages) >= max_pages or downloaded >= max_bytes:
+                break
+            level = next_level
+
+    print(f"Crawled {start_url}: {len(pages)} pages, {downloaded} bytes", flush=True)
+    return pages
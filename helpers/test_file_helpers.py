@@ -0,0 +1,13 @@
+import pytest
+from helpers import file_lifecycle
+from helpers.file_helpers import FileExpiredError, file_to_text
+
+
+def test_file_to_text_reports_files_removed_by_the_quota(tmp_path):
+    path = tmp_path / "keywords.txt"
+    path.write_text("widgets")
+    file_lifecycle.track(str(path), "u1")
+    assert file_to_text(str(path)) == "widgets"
+    file_lifecycle.remove(str(path))
+    with pytest.raises(FileExpiredError, match="keywords.txt has expired"):
+        file_to_text(str(path))
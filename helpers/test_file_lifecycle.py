@@ -0,0 +1,102 @@
+import os
+import time
+from collections import OrderedDict
+import pytest
+from helpers import file_lifecycle
+
+
+@pytest.fixture(autouse=True)
+def empty_tracker(monkeypatch):
+    monkeypatch.setattr(file_lifecycle, "_files", OrderedDict())
+    monkeypatch.setattr(file_lifecycle, "_by_owner", {})
+    monkeypatch.setattr(file_lifecycle, "_owner_bytes", {})
+    monkeypatch.setattr(file_lifecycle, "_total_bytes", 0)
+
+
+def write(tmp_path, name, size):
+    path = str(tmp_path / name)
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    return path
+
+
+def test_user_quota_removes_least_recently_used(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_lifecycle, "USER_DISK_QUOTA_MB", 1)
+    mb = 1024 * 1024
+    old, used, new = (write(tmp_path, name, mb // 2) for name in ("old", "used", "new"))
+    file_lifecycle.track(old, "u1")
+    file_lifecycle.track(used, "u1")
+    file_lifecycle.touch(old)
+    file_lifecycle.track(new, "u1")
+    assert not os.path.exists(used)
+    assert os.path.exists(old) and os.path.exists(new)
+    assert file_lifecycle.total_bytes() == mb
+
+
+def test_global_quota_removes_anyones_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_lifecycle, "DISK_QUOTA_MB", 1)
+    mb = 1024 * 1024
+    first = write(tmp_path, "first", mb // 2 + 1)
+    second = write(tmp_path, "second", mb // 2)
+    file_lifecycle.track(first, "u1")
+    file_lifecycle.track(second, "u2")
+    assert not os.path.exists(first)
+    assert file_lifecycle.total_bytes() == mb // 2
+
+
+def test_retracking_updates_the_size(tmp_path):
+    path = write(tmp_path, "report.csv", 10)
+    file_lifecycle.track(path, "u1")
+    with open(path, "ab") as f:
+        f.write(b"y" * 5)
+    file_lifecycle.track(path, "u1")
+    assert file_lifecycle.total_bytes() == 15
+
+
+def test_remove_owner_with_zero_byte_files(tmp_path):
+    empty = write(tmp_path, "empty", 0)
+    other = write(tmp_path, "other", 0)
+    file_lifecycle.track(empty, "u1")
+    file_lifecycle.track(other, "u1")
+    file_lifecycle.remove(empty)
+    assert file_lifecycle.remove_owner("u1") == 1
+    assert not os.path.exists(other)
+    assert file_lifecycle._by_owner == {} and file_lifecycle._owner_bytes == {}
+
+
+def test_remove_owner_spares_newer_files(tmp_path):
+    old = write(tmp_path, "old", 1)
+    file_lifecycle.track(old, "u1")
+    cutoff = time.time() + 1
+    file_lifecycle._files[old].created = cutoff - 2
+    new = write(tmp_path, "new", 1)
+    file_lifecycle.track(new, "u1")
+    file_lifecycle._files[new].created = cutoff
+    assert file_lifecycle.remove_owner("u1", created_before=cutoff) == 1
+    assert not os.path.exists(old) and os.path.exists(new)
+
+
+def test_sweep_orphans_spares_tracked_and_recent_files(tmp_path):
+    tracked = write(tmp_path, "tracked", 1)
+    file_lifecycle.track(tracked, "u1")
+    os.makedirs(tmp_path / "sub")
+    orphan = write(tmp_path, "sub/orphan", 1)
+    recent = write(tmp_path, "recent", 1)
+    hour_ago = time.time() - 3600
+    for path in (tracked, orphan):
+        os.utime(path, (hour_ago, hour_ago))
+    assert file_lifecycle.sweep_orphans([str(tmp_path)], min_age=60) == 1
+    # Removing the orphan just changed the directory, so it goes on the next sweep
+    assert os.listdir(tmp_path / "sub") == []
+    assert os.path.exists(tracked) and os.path.exists(recent)
+
+
+def test_sweep_orphans_keeps_new_empty_directories(tmp_path):
+    os.makedirs(tmp_path / "new_user")
+    old = tmp_path / "old_user"
+    os.makedirs(old)
+    hour_ago = time.time() - 3600
+    os.utime(old, (hour_ago, hour_ago))
+    file_lifecycle.sweep_orphans([str(tmp_path)], min_age=60)
+    assert (tmp_path / "new_user").exists()
+    assert not old.exists()
@@ -0,0 +1,44 @@
+import asyncio
+import os
+
+os.environ.setdefault("APP_URL", "http://localhost")
+
+from collections import OrderedDict  # noqa: E402
+import pytest  # noqa: E402
+from helpers import google_ads_client  # noqa: E402
+
+
+@pytest.fixture
+def refreshes(monkeypatch):
+    calls = []
+
+    async def refresh_access_token(refresh_token):
+        calls.append(refresh_token)
+        await asyncio.sleep(0.01)
+        return f"access-{refresh_token}", 3600
+
+    monkeypatch.setattr(google_ads_client, "refresh_access_token", refresh_access_token)
+    monkeypatch.setattr(google_ads_client, "_access_tokens", OrderedDict())
+    monkeypatch.setattr(google_ads_client, "_token_locks", {})
+    return calls
+
+
+def test_concurrent_callers_share_one_refresh(refreshes):
+    async def run():
+        return await asyncio.gather(*(google_ads_client.get_access_token("r1") for _ in range(5)))
+
+    assert asyncio.run(run()) == ["access-r1"] * 5
+    assert refreshes == ["r1"]
+    assert google_ads_client._token_locks == {}
+
+
+def test_token_cache_keeps_the_most_recently_used(refreshes, monkeypatch):
+    monkeypatch.setattr(google_ads_client, "ACCESS_TOKEN_CACHE_SIZE", 2)
+
+    async def run():
+        for refresh_token in ("r1", "r2", "r1", "r3"):
+            await google_ads_client.get_access_token(refresh_token)
+
+    asyncio.run(run())
+    assert list(google_ads_client._access_tokens) == ["r1", "r3"]
+    assert refreshes == ["r1", "r2", "r3"]
@@ -0,0 +1,43 @@
+import asyncio
+import os
+
+os.environ.setdefault("APP_URL", "http://localhost")
+
+from aiohttp import web  # noqa: E402
+from aiohttp.test_utils import TestServer  # noqa: E402
+import pytest  # noqa: E402
+from helpers import google_ads_token  # noqa: E402
+
+
+def post_token_request(monkeypatch, handler):
+    async def run():
+        app = web.Application()
+        app.router.add_post("/token", handler)
+        async with TestServer(app) as server:
+            monkeypatch.setattr(google_ads_token, "TOKEN_URI", str(server.make_url("/token")))
+            return await google_ads_token.refresh_access_token("r1")
+    return asyncio.run(run())
+
+
+def test_refresh_returns_the_access_token(monkeypatch):
+    async def token(request):
+        assert (await request.post())["refresh_token"] == "r1"
+        return web.json_response({"access_token": "a1", "expires_in": 1800})
+
+    assert post_token_request(monkeypatch, token) == ("a1", 1800)
+
+
+def test_oauth_errors_are_token_errors(monkeypatch):
+    async def token(request):
+        return web.json_response({"error": "invalid_grant", "error_description": "Token has been revoked."}, status=400)
+
+    with pytest.raises(RuntimeError, match=r"Token request failed \(400\): Token has been revoked."):
+        post_token_request(monkeypatch, token)
+
+
+def test_non_json_error_pages_are_token_errors(monkeypatch):
+    async def token(request):
+        return web.Response(text="<html>502 Bad Gateway</html>", content_type="text/html", status=502)
+
+    with pytest.raises(RuntimeError, match=r"Token request failed \(502\): <html>502 Bad Gateway</html>"):
+        post_token_request(monkeypatch, token)
@@ -0,0 +1,138 @@
+import asyncio
+import gzip
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+import pytest
+from helpers import scraper
+
+PAGE = b"""<html><body><nav>Home | About</nav><script>var x = 1;</script>
+<h1>Widgets</h1><p>Premium widgets.</p>
+<a href="/about#team">About</a><a href="mailto:hi@example.com">Mail</a><a href="https://other.example/">Other</a>
+</body></html>"""
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(scraper, "SCRAPE_CACHE_DIR", str(tmp_path))
+
+
+def serve(routes, run):
+    """Runs run(base_url) against a local server with the given path -> handler routes."""
+    async def main():
+        app = web.Application()
+        for path, handler in routes.items():
+            app.router.add_get(path, handler)
+        async with TestServer(app) as server:
+            return await run(str(server.make_url("")).rstrip("/"))
+    return asyncio.run(main())
+
+
+def test_extract_page_drops_boilerplate_and_collects_links():
+    text, links = scraper.extract_page(PAGE, base_url="https://example.com/")
+    assert text == "Widgets Premium widgets. About Mail Other"
+    assert links == ["https://example.com/about", "https://other.example/"]
+
+
+def test_crawlable_stays_on_site_and_skips_files():
+    assert scraper._crawlable("https://www.example.com/a", "example.com")
+    assert not scraper._crawlable("https://example.com/logo.png", "example.com")
+    assert not scraper._crawlable("https://other.example/", "example.com")
+
+
+def test_fetch_page_caches_and_revalidates(monkeypatch):
+    requests = []
+
+    async def page(request):
+        requests.append(request.headers.get("If-None-Match"))
+        if request.headers.get("If-None-Match") == '"v1"':
+            return web.Response(status=304)
+        return web.Response(body=PAGE, content_type="text/html", headers={"ETag": '"v1"'})
+
+    async def run(base):
+        async with scraper.create_session() as session:
+            first = await scraper.fetch_page(session, f"{base}/")
+            fresh = await scraper.fetch_page(session, f"{base}/")
+            monkeypatch.setattr(scraper, "SCRAPE_CACHE_TTL", 0)
+            revalidated = await scraper.fetch_page(session, f"{base}/")
+        return first, fresh, revalidated
+
+    first, fresh, revalidated = serve({"/": page}, run)
+    assert [first.cache, fresh.cache, revalidated.cache] == ["miss", "hit", "revalidated"]
+    assert first.text == fresh.text == revalidated.text
+    assert requests == [None, '"v1"']
+
+
+def test_fetch_page_errors_and_limits():
+    async def image(request):
+        return web.Response(body=b"\x89PNG", content_type="image/png")
+
+    async def missing(request):
+        return web.Response(status=404)
+
+    async def large(request):
+        return web.Response(text="x" * (scraper.SCRAPE_MAX_BYTES + 1), content_type="text/plain")
+
+    async def run(base):
+        return await scraper.scrape([f"{base}/image", f"{base}/missing", f"{base}/large"])
+
+    image_page, missing_page, large_page = serve({"/image": image, "/missing": missing, "/large": large}, run)
+    assert image_page.error == "Unsupported content type: image/png"
+    assert "404" in missing_page.error
+    assert large_page.truncated and large_page.size == scraper.SCRAPE_MAX_BYTES
+
+
+def test_crawl_follows_links_within_budgets():
+    async def page(request):
+        n = int(request.match_info.get("n", 0))
+        links = "".join(f'<a href="/page/{n * 2 + i}">next</a>' for i in (1, 2))
+        return web.Response(text=f"<p>Page {n}</p>{links}<a href='/copy'>copy</a>", content_type="text/html")
+
+    async def no_sitemap(request):
+        return web.Response(status=404)
+
+    routes = {"/": page, "/page/{n}": page, "/copy": page, "/sitemap.xml": no_sitemap}
+    pages = serve(routes, lambda base: scraper.crawl(f"{base}/", max_pages=10, max_depth=2))
+    # Depth 2 reaches pages 0-6; the copy of page 0 is dropped as duplicate content
+    assert sorted(p.text for p in pages) == [f"Page {n} next next copy" for n in range(7)]
+
+    pages = serve(routes, lambda base: scraper.crawl(f"{base}/", max_pages=2))
+    assert len(pages) == 2
+
+
+def test_crawl_reads_gzipped_nested_sitemaps():
+    async def index(request):
+        base = f"http://{request.host}"
+        return web.Response(text=f"<sitemapindex><sitemap><loc>{base}/pages.xml.gz</loc></sitemap></sitemapindex>")
+
+    async def pages(request):
+        base = f"http://{request.host}"
+        xml = "".join(f"<url><loc>{base}/p{n}</loc></url>" for n in range(3))
+        return web.Response(body=gzip.compress(f"<urlset>{xml}</urlset>".encode()), content_type="application/gzip")
+
+    async def page(request):
+        return web.Response(text=f"<p>{request.path}</p>", content_type="text/html")
+
+    routes = {"/sitemap.xml": index, "/pages.xml.gz": pages, "/{name}": page}
+    pages_read = serve(routes, lambda base: scraper.crawl(f"{base}/sitemap.xml", max_depth=0))
+    assert sorted(p.text for p in pages_read) == ["/p0", "/p1", "/p2"]
+
+
+def test_cached_pages_dont_use_the_byte_budget():
+    async def page(request):
+        n = int(request.match_info.get("n", 0))
+        return web.Response(text=f"<p>{'x' * 1000} {n}</p><a href='/page/{n + 1}'>next</a>", content_type="text/html")
+
+    async def no_sitemap(request):
+        return web.Response(status=404)
+
+    routes = {"/": page, "/page/{n}": page, "/sitemap.xml": no_sitemap}
+
+    async def run(base):
+        first = await scraper.crawl(f"{base}/", max_pages=5, max_depth=4, max_bytes=5000)
+        # Everything is cached now; a budget that only fits one download still reaches every page
+        again = await scraper.crawl(f"{base}/", max_pages=5, max_depth=4, max_bytes=1500)
+        return first, again
+
+    first, again = serve(routes, run)
+    assert len(first) == 5
+    assert [p.cache for p in again] == ["hit"] * 5
@@ -0,0 +1,120 @@
+from opentelemetry import propagate, trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+from opentelemetry.trace import SpanKind, Status, StatusCode
+from contextlib import contextmanager
+from datetime import datetime
+import functools
+import json
+import os
+import sys
+
+# "console" prints spans to stdout, "file" appends them as JSON lines to TRACE_FILE; unset disables tracing.
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "").lower()
+TRACE_FILE = os.getenv("TRACE_FILE", "/var/log/traces.jsonl")
+
+# A proxy until setup_tracing installs a provider; spans are no-ops while tracing is off.
+tracer = trace.get_tracer("ads-manager")
+
+
+def setup_tracing(service_name: str):
+    if TRACING_EXPORTER == "file":
+        exporter = ConsoleSpanExporter(
+            out=open(TRACE_FILE, "a", buffering=1),
+            formatter=lambda s: s.to_json(indent=None) + "\n",
+        )
+    elif TRACING_EXPORTER == "console":
+        exporter = ConsoleSpanExporter()
+    else:
+        return
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+
+
+@contextmanager
+def span(name: str, attributes: dict = None, current: bool = True, kind=SpanKind.INTERNAL, context=None):
+    """
+    Opens a span. Spans around async generators should pass current=False, since the
+    generator may be suspended and resumed in another context.
+    """
+    s = tracer.start_span(name, context=context, kind=kind, attributes=attributes)
+    if current:
+        with trace.use_span(s, end_on_exit=True):
+            yield s
+        return
+    try:
+        yield s
+    except Exception as e:
+        s.record_exception(e)
+        s.set_status(Status(StatusCode.ERROR, str(e)))
+        raise
+    finally:
+        s.end()
+
+
+def extract_context(headers):
+    """The trace context sent by the caller in its traceparent header, if any."""
+    return propagate.extract(dict(headers))
+
+
+def trace_headers(s) -> dict:
+    """traceparent headers that make the callee's spans children of span s."""
+    headers = {}
+    propagate.inject(headers, context=trace.set_span_in_context(s))
+    return headers
+
+
+def trace_tool(func):
+    """Runs an async agent tool inside a span."""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        with span(f"tool {func.__name__}"):
+            return await func(*args, **kwargs)
+    return wrapper
+
+
+# ----------------- Waterfall view of a trace file -----------------
+
+def _time(value: str) -> float:
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+def print_waterfall(path: str, trace_id: str = None, width: int = 50):
+    """Prints every trace in a TRACE_FILE (or just trace_id) as an indented timeline."""
+    traces = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                s = json.loads(line)
+                traces.setdefault(s["context"]["trace_id"], []).append(s)
+
+    for tid, spans in traces.items():
+        if trace_id and trace_id not in tid:
+            continue
+        start = min(_time(s["start_time"]) for s in spans)
+        total = max(_time(s["end_time"]) for s in spans) - start or 1e-9
+        ids = {s["context"]["span_id"] for s in spans}
+        children = {}
+        for s in spans:
+            parent = s["parent_id"] if s["parent_id"] in ids else None
+            children.setdefault(parent, []).append(s)
+
+        print(f"trace {tid} ({total * 1000:.0f} ms)")
+
+        def show(parent, depth):
+            for s in sorted(children.get(parent, []), key=lambda s: s["start_time"]):
+                offset, duration = _time(s["start_time"]) - start, _time(s["end_time"]) - _time(s["start_time"])
+                bar = " " * int(offset / total * width) + "#" * max(1, int(duration / total * width))
+                service = s["resource"]["attributes"].get("service.name", "")
+                print(f"  {bar:<{width}} {offset * 1000:>8.0f} ms {duration * 1000:>8.0f} ms  {'  ' * depth}{s['name']} [{service}]")
+                show(s["context"]["span_id"], depth + 1)
+
+        show(None, 0)
+        print()
+
+
+if __name__ == "__main__":
+    # python -m helpers.tracing [trace file] [trace id]
+    print_waterfall(sys.argv[1] if len(sys.argv) > 1 else TRACE_FILE, sys.argv[2] if len(sys.argv) > 2 else None)
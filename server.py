@@ -1,9 +1,21 @@
 from quart import Quart, request, jsonify, redirect, render_template_string, make_response
 from llama_index.core.agent.workflow import AgentStream, ToolCall
 from agent.core import create_agent
+from agent import prompts
+from agent.campaign_ideas import CampaignIdeaProgress
+from agent.artifacts import add_text, drop_registry, get_registry
+from agent.prefetch import cancel_prefetch, start_prefetch
+from agent.sessions import SPILL_DIR, SessionStore, google_creds_of, release_session
+from agent.tools import get_google_client, load_account_snapshot
 from helpers.google_ads_token import get_google_ads_auth_url, get_google_ads_token
 from helpers.azure_tables import get_user_data, store_user_data
-from helpers.file_helpers import handle_attachments
+from helpers.file_helpers import ARTIFACTS_DIR, FILE_SERVE_DIR, USER_UPLOADS_DIR, handle_attachments, remove_artifacts, save_artifact
+from helpers import file_lifecycle
+from helpers.scraper import SCRAPE_CACHE_DIR, SCRAPE_CACHE_MAX_AGE
+from helpers.metrics import ACTIVE_SESSIONS, SPILLED_SESSIONS, TRACKED_FILE_BYTES, render as render_metrics, run_in_executor
+from helpers.tracing import extract_context, setup_tracing, span, tracer
+from opentelemetry import trace
+from opentelemetry.trace import SpanKind
 import asyncio
 import os
 import time
@@ -13,53 +25,106 @@ import base64
 
 app = Quart(__name__)
 
-# In-memory storage for active user sessions
-user_agents = {}
+# Expired or evicted sessions waiting for their files to be removed
+session_cleanup_queue = asyncio.Queue()
+
+
+def evict_session(user_id, session):
+    """Called under user_agents_lock; file clean-up is left to cleanup_sessions."""
+    cancel_prefetch(user_id)
+    session_cleanup_queue.put_nowait((user_id, session, time.time()))
+
+
+# Active user sessions, cleared after SESSION_TIMEOUT (30 mins) of inactivity. Idle ones are spilled to disk.
+user_agents = SessionStore(on_evict=evict_session)
 user_agents_lock = asyncio.Lock()
+ACTIVE_SESSIONS.set_function(lambda: user_agents.resident)
+SPILLED_SESSIONS.set_function(lambda: user_agents.spilled)
+TRACKED_FILE_BYTES.set_function(file_lifecycle.total_bytes)
 
-# Check for inactive sessions, clear them from memory after 30 mins of inactivity.
-SESSION_TIMEOUT = 30 * 60
 
-async def cleanup_inactive_sessions():
+async def expire_inactive_sessions():
     while True:
-        await asyncio.sleep(300)
-        now = time.time()
+        await user_agents.wait_for_expiry()
         async with user_agents_lock:
-            inactive_users = [
-                user_id for user_id, (_, _, _, _, last_active) in user_agents.items()
-                if now - last_active > SESSION_TIMEOUT
-            ]
-            for user_id in inactive_users:
-                _, context, _, _, _ = user_agents[user_id]
-                keywords_file = await context.store.get('keywords_search_file', '')
-                campaign_ideas_file = await context.store.get('campaign_ideas_file', '')
-                uploaded_files = await context.store.get('uploaded_files', [])
-                if keywords_file:
-                    os.remove(keywords_file)
-                if campaign_ideas_file:
-                    os.remove(campaign_ideas_file)
-                if uploaded_files:
-                    for f in uploaded_files:
-                        os.remove(f)
-                del user_agents[user_id]
-                print(f"Cleared inactive session for user: {user_id}")
+            user_agents.expire()
+
+
+async def spill_idle_sessions():
+    while True:
+        await user_agents.wait_for_spill()
+        # One session per lock acquisition, so requests aren't held up behind a batch of spills
+        spilled = True
+        while spilled:
+            async with user_agents_lock:
+                try:
+                    spilled = await user_agents.spill_next()
+                except Exception as e:
+                    print(f"Error spilling session: {e}", flush=True)
+                    spilled = False
+
+
+def remove_session_files(user_id: str, session_id: str, files: list, evicted_at: float):
+    for f in files:
+        file_lifecycle.remove(f)
+    # Earlier reports and uploads of the session, which its context no longer refers to
+    file_lifecycle.remove_owner(user_id, created_before=evicted_at)
+    remove_artifacts(session_id)
+
+
+async def cleanup_sessions():
+    while True:
+        user_id, session, evicted_at = await session_cleanup_queue.get()
+        try:
+            session_id, files = await release_session(session)
+            await run_in_executor(remove_session_files, user_id, session_id, files, evicted_at)
+            drop_registry(session_id)
+            print(f"Cleared inactive session for user: {user_id}")
+        except Exception as e:
+            print(f"Error clearing session for user {user_id}: {e}", flush=True)
+
+
+async def sweep_orphan_files():
+    """Removes reports and uploads no session tracks, e.g. those left behind by a restart."""
+    while True:
+        await run_in_executor(file_lifecycle.sweep_orphans, [FILE_SERVE_DIR, USER_UPLOADS_DIR])
+        # Scraped pages outlive sessions and restarts, until they go unused for SCRAPE_CACHE_MAX_AGE
+        await run_in_executor(file_lifecycle.sweep_orphans, [SCRAPE_CACHE_DIR], SCRAPE_CACHE_MAX_AGE)
+        await asyncio.sleep(file_lifecycle.ORPHAN_SWEEP_INTERVAL)
+
+
+@app.route("/metrics")
+async def metrics():
+    body, content_type = render_metrics()
+    return body, 200, {"Content-Type": content_type}
 
 
 @app.before_serving
 async def startup_tasks():
-    app.add_background_task(cleanup_inactive_sessions)
+    setup_tracing("ads-api")
+    prompts.preload()
+    # Sessions don't survive a restart, so neither do their artifacts or spill files
+    file_lifecycle.clear_dirs([ARTIFACTS_DIR, SPILL_DIR])
+    app.add_background_task(expire_inactive_sessions)
+    app.add_background_task(cleanup_sessions)
+    app.add_background_task(spill_idle_sessions)
+    app.add_background_task(sweep_orphan_files)
     print("Clean-up task running...")
 
 
-async def stream_response(agent, full_prompt, context, memory):
+async def stream_response(agent, full_prompt, context, memory, request_span):
     try:
-        handler = agent.run(user_msg=full_prompt, ctx=context, memory=memory)
+        # The workflow's tasks copy the current context when they start, so tool and LLM spans nest under the request
+        with trace.use_span(request_span, end_on_exit=False):
+            handler = agent.run(user_msg=full_prompt, ctx=context, memory=memory)
         async for event in handler.stream_events():
             if isinstance(event, AgentStream):
                 if event.delta:
                     yield "".join(event.delta)
             elif isinstance(event, ToolCall):
-                yield f"\n\n**Using tool: {event.tool_name.replace("_", "-")}**\n\n"
+                yield f"\n\n**Using tool: {event.tool_name.replace('_', '-')}**\n\n"
+            elif isinstance(event, CampaignIdeaProgress):
+                yield f"\n\n{event.message}\n\n"
     except Exception as e:
         print(f"Error in LLM response: {e}", flush=True)
         yield f"Error: {e}"
@@ -77,6 +142,10 @@ async def prompt():
     if prompt.lower() == "refresh":
         async with user_agents_lock:
             if user_id in user_agents:
+                session_id = (await user_agents.load(user_id))[2].session_id
+                remove_artifacts(session_id)
+                drop_registry(session_id)
+                cancel_prefetch(user_id)
                 agent, context, memory = await create_agent()
                 user_agents[user_id] = (agent, context, memory, {}, time.time())
             return jsonify({"response": "Chat history has been refreshed."}), 200
@@ -88,81 +157,113 @@ async def prompt():
         user_auth_url = f"{BASE_URL}/authenticate?userId={url_safe_id}"
         return jsonify({"response": f"Please follow this link to authenticate: [Authenticate]({user_auth_url})"}), 200
     
-    # Check for existing user agent session or create a new one.
-    async with user_agents_lock:
-        if user_id not in user_agents:
-            agent, context, memory = await create_agent()
-            await context.store.set('user_id', user_id)
-            user_agents[user_id] = (agent, context, memory, {}, time.time())
-        else:
-            # Update timestamp
-            agent, context, memory, google_creds, _ = user_agents[user_id]
-            user_agents[user_id] = (agent, context, memory, google_creds, time.time())
-        agent, context, memory, _, _ = user_agents[user_id]
+    # Ended by generate() once the response has been streamed, so it covers the whole turn
+    request_span = tracer.start_span(
+        "POST /prompt", context=extract_context(request.headers), kind=SpanKind.SERVER, attributes={"user_id": user_id},
+    )
+    request_context = trace.set_span_in_context(request_span)
 
-        # Add google creds from Azure table if they exist
-        customer_id, refresh_token = await get_user_data(user_id)
-        await context.store.set("user_id", user_id)
-        if customer_id:
-            await context.store.set("google_customer_id", customer_id)
-        if refresh_token:
-            await context.store.set("google_refresh_token", refresh_token)
+    # generate() releases the hold once the response is streamed; a failure before that releases it here
+    held = False
+    try:
+        # Check for existing user agent session or create a new one.
+        with span("session admission", context=request_context):
+            async with user_agents_lock:
+                new_session = user_id not in user_agents
+                if new_session:
+                    agent, context, memory = await create_agent()
+                    await context.store.set('user_id', user_id)
+                    user_agents[user_id] = (agent, context, memory, {}, time.time())
+                else:
+                    # Update timestamp
+                    agent, context, memory, google_creds, _ = await user_agents.load(user_id)
+                    user_agents[user_id] = (agent, context, memory, google_creds, time.time())
+                agent, context, memory, _, _ = user_agents[user_id]
+                # Not spilled to disk while this turn runs; released by generate()
+                user_agents.hold(user_id)
+                held = True
+
+                # Add google creds from Azure table if they exist
+                customer_id, refresh_token = await get_user_data(user_id)
+                await context.store.set("user_id", user_id)
+                if customer_id:
+                    await context.store.set("google_customer_id", customer_id)
+                if refresh_token:
+                    await context.store.set("google_refresh_token", refresh_token)
+
+        # Warm the account snapshot while the LLM works out what to do with the first message
+        if new_session and customer_id and refresh_token:
+            client = await get_google_client(context)
+            start_prefetch(user_id, refresh_token, customer_id, load_account_snapshot, client, customer_id)
     
-    # Parse attachments and extract URLs for downloadable files
-    attachments_data = None
-    attached_files_data = ""
-    attached_file_paths = []
-    if attachments:
-        attachment_urls = []
-        for attachment in attachments:
-            if attachment.get('contentType') == 'text/html':
-                continue
-            content = attachment.get('content', {})
-            content_url = content.get('downloadUrl', '')
-            attachment_name = attachment.get('name', 'unknown.txt')
-            attachment_urls.append({"url": content_url, "name": attachment_name})
-            if content_url:
-                attachments_data = await handle_attachments(user_id, attachment_urls)
-        if attachments_data:
-            for data in attachments_data:
-                filename = data.get('filename', '')
-                content = data.get('text', '')
-                file_path = data.get('file_path', '')
-
-                attached_files_data += f"--- {filename} ---\n {content}\n---\n\n"
-                attached_file_paths.append(file_path)
-            await context.store.set("uploaded_files", attached_file_paths)
-
-    prompt_ext = ""
-    keywords_file = await context.store.get('keywords_search_file', '')
-    campaign_ideas_file = await context.store.get('campaign_ideas_file', '')
-
-    if keywords_file:
-        prompt_ext += f"Keyword search file path (use as reference data for Google Ads Campaign generation and adding keywords to existing ads.): {keywords_file}\n"
-    if campaign_ideas_file:
-        prompt_ext += f"Campaign ideas file path: {campaign_ideas_file}\n"
-    if attached_files_data:
-        prompt_ext += f"User's uploaded attachments data (use as reference data for Google Ads Campaign generation): {attached_files_data}\n"
+        # Parse attachments and extract URLs for downloadable files
+        attachments_data = None
+        attached_files_data = ""
+        attached_file_paths = await context.store.get("uploaded_files", [])
+        registry = get_registry(memory.session_id)
+        if attachments:
+            attachment_urls = []
+            for attachment in attachments:
+                if attachment.get('contentType') == 'text/html':
+                    continue
+                content = attachment.get('content', {})
+                content_url = content.get('downloadUrl', '')
+                attachment_name = attachment.get('name', 'unknown.txt')
+                attachment_urls.append({"url": content_url, "name": attachment_name})
+                if content_url:
+                    with span("handle attachments", context=request_context):
+                        attachments_data = await handle_attachments(user_id, attachment_urls)
+            if attachments_data:
+                for data in attachments_data:
+                    filename = data.get('filename', '')
+                    content = data.get('text', '')
+                    file_path = data.get('file_path', '')
+
+                    if not file_path:
+                        attached_files_data += f"{filename}: {content}\n"
+                        continue
+                    # The extracted text is kept as an artifact and only referred to by ID in the chat
+                    text_path = save_artifact(memory.session_id, content)
+                    artifact = add_text(registry, "upload", text_path, filename, content)
+                    attached_files_data += f"{artifact.describe()}\n"
+                    attached_file_paths.append(file_path)
+                await context.store.set("uploaded_files", attached_file_paths)
+
+        # Only new uploads are announced; earlier files stay available through the list_artifacts tool
+        prompt_ext = ""
+        if attached_files_data:
+            prompt_ext += (
+                "User's uploaded attachments (artifact ID | kind | name | size | summary), used as reference data for "
+                f"Google Ads Campaign generation, read them with read_artifact if needed:\n{attached_files_data}\n"
+            )
     
-    full_prompt = ""
-    if prompt_ext:
-        full_prompt = f"SYSTEM: {prompt_ext}\n\nUSER: {prompt}"
-    else:
-        full_prompt = prompt
+        full_prompt = ""
+        if prompt_ext:
+            full_prompt = f"SYSTEM: {prompt_ext}\n\nUSER: {prompt}"
+        else:
+            full_prompt = prompt
 
-    async def generate():
-        try:
-            async for chunk in stream_response(agent, full_prompt, context, memory):
-                if chunk:
-                    yield (json.dumps({"response": chunk}) + "\n").encode("utf-8")
-                    await asyncio.sleep(0.15)
-        except asyncio.CancelledError:
-            yield json.dumps({"response": "stream cancelled"}) + "\n"
-        except Exception as e:
-            yield json.dumps({"response": str(e)}) + "\n"
+        async def generate():
+            try:
+                async for chunk in stream_response(agent, full_prompt, context, memory, request_span):
+                    if chunk:
+                        yield (json.dumps({"response": chunk}) + "\n").encode("utf-8")
+                        await asyncio.sleep(0.15)
+            except asyncio.CancelledError:
+                yield json.dumps({"response": "stream cancelled"}) + "\n"
+            except Exception as e:
+                yield json.dumps({"response": str(e)}) + "\n"
+            finally:
+                user_agents.release(user_id)
+                request_span.end()
 
-    res = await make_response(generate())
-    res.timeout = None
+        res = await make_response(generate())
+        res.timeout = None
+    except BaseException:
+        if held:
+            user_agents.release(user_id)
+        request_span.end()
+        raise
     return res
 
 
@@ -171,17 +272,18 @@ async def authenticate():
     raw = request.args.get("userId", "")
     user_id = base64.urlsafe_b64decode(raw.encode()).decode()
 
-    auth_url, state = await get_google_ads_auth_url()
+    auth_url, state, code_verifier = await get_google_ads_auth_url()
 
     # Store Google credentials in user's agent lock
     async with user_agents_lock:
         if user_id in user_agents:
-            agent, context, memory, google_creds, _ = user_agents[user_id]
+            agent, context, memory, google_creds, _ = await user_agents.load(user_id)
         else:
             google_creds = {}
             agent, context, memory = await create_agent()
         google_creds['auth_url'] = auth_url
         google_creds['state'] = state
+        google_creds['code_verifier'] = code_verifier
         google_creds['access_token'] = ""
         google_creds['refresh_token'] = ""
         user_agents[user_id] = (agent, context, memory, google_creds, time.time())
@@ -189,6 +291,28 @@ async def authenticate():
     return redirect(auth_url)
 
 
+AUTH_FAILED_PAGE = """
+    <html>
+    <body style='font-family: sans-serif;'>
+        <p>Authentication failed.</p>
+        <p>{reason} Please contact an admin if the issue persists.</p>
+    </body>
+    </html>
+"""
+
+
+# OAuth state -> token exchange in progress, so a repeated callback waits for it instead of reusing the code
+token_exchanges = {}
+
+
+def find_user_by_state(state):
+    """The user whose pending Google sign-in has this OAuth state. Call under user_agents_lock."""
+    for user_id, session in user_agents.items():
+        if state and google_creds_of(session).get("state") == state:
+            return user_id
+    return None
+
+
 @app.route("/callback", methods=["GET", "POST"])
 async def callback():
     state = request.args.get("state")
@@ -196,65 +320,82 @@ async def callback():
 
     async with user_agents_lock:
         # Find the user associated with this state
-        for user_id, (agent, context, memory, google_creds, _) in user_agents.items():
-            if google_creds.get("state") == state:
-                if not google_creds.get("refresh_token"):
-                    if not google_creds.get("access_token"):
-                        credentials = await get_google_ads_token(state, authorization_response)
-                        google_creds['access_token'] = credentials.token
-                        google_creds['refresh_token'] = credentials.refresh_token
-                        # Store user's data in Azure table
-                        stored = await store_user_data(user_id, google_creds)
-                        if stored:
-                            print("User data stored successfully.")
-                        else:
-                            print("There was an issue storing the user data.")
-                        
-                        await context.store.set("google_refresh_token", credentials.refresh_token)
-
-                # If it's a POST request, the user submitted their customer ID - store it in context for use in tools
-                if request.method == "POST":
-                    form_data = await request.form
-                    customer_id = form_data.get("customer_id").replace("-", "")
-                    google_creds["customer_id"] = customer_id
-                    # Store user's data in Azure table
-                    stored = await store_user_data(user_id, google_creds)
-                    if stored:
-                        print("User data stored successfully.")
-                    else:
-                        print("There was an issue storing the user data.")
-                    await context.store.set("google_customer_id", customer_id)
+        user_id = find_user_by_state(state)
+        if user_id is None:
+            return AUTH_FAILED_PAGE.format(reason="Invalid State.")
+        google_creds = google_creds_of(user_agents[user_id])
+        needs_token = not google_creds.get("refresh_token") and not google_creds.get("access_token")
+        code_verifier = google_creds.get("code_verifier")
 
-                    user_agents[user_id] = (agent, context, memory, google_creds, time.time())
+    # The token exchange is a round trip to Google, so it runs without holding the sessions lock
+    if needs_token:
+        exchange = token_exchanges.get(state)
+        if exchange is None:
+            exchange = token_exchanges[state] = asyncio.ensure_future(
+                get_google_ads_token(state, authorization_response, code_verifier)
+            )
+            exchange.add_done_callback(lambda _: token_exchanges.pop(state, None))
+        try:
+            access_token, refresh_token = await asyncio.shield(exchange)
+        except Exception as e:
+            print(f"Google token exchange failed for user {user_id}: {e}", flush=True)
+            return AUTH_FAILED_PAGE.format(reason="Google sign-in could not be completed.")
+
+        async with user_agents_lock:
+            # The session may have expired, or the user started a new sign-in, during the exchange
+            if find_user_by_state(state) != user_id:
+                return AUTH_FAILED_PAGE.format(reason="Your session expired, please sign in again.")
+            agent, context, memory, google_creds, _ = await user_agents.load(user_id)
+            google_creds['access_token'] = access_token
+            google_creds['refresh_token'] = refresh_token
+            await context.store.set("google_refresh_token", refresh_token)
+
+        # Store user's data in Azure table
+        stored = await store_user_data(user_id, google_creds)
+        if stored:
+            print("User data stored successfully.")
+        else:
+            print("There was an issue storing the user data.")
 
-                    return f"""
-                        <html>
-                        <body style='font-family: sans-serif;'>
-                            <h2>✅ Setup complete!</h2>
-                            <p>Customer ID saved. You can now return to the app and continue.</p>
-                        </body>
-                        </html>
-                    """
-
-                # Otherwise, show form to enter customer ID
-                return await render_template_string("""
-                    <html>
-                    <body style='font-family: sans-serif;'>
-                        <h2>Google Ads Authentication Successful!</h2>
-                        <p>Please enter your Google Ads Customer ID to complete setup:</p>
-                        <form method="post">
-                            <input type="text" name="customer_id" placeholder="123-456-7890" required>
-                            <button type="submit">Submit</button>
-                        </form>
-                    </body>
-                    </html>
-                """)
+    # If it's a POST request, the user submitted their customer ID - store it in context for use in tools
+    if request.method == "POST":
+        form_data = await request.form
+        customer_id = form_data.get("customer_id").replace("-", "")
+
+        async with user_agents_lock:
+            if find_user_by_state(state) != user_id:
+                return AUTH_FAILED_PAGE.format(reason="Your session expired, please sign in again.")
+            agent, context, memory, google_creds, _ = await user_agents.load(user_id)
+            google_creds["customer_id"] = customer_id
+            await context.store.set("google_customer_id", customer_id)
+            user_agents[user_id] = (agent, context, memory, google_creds, time.time())
+
+        # Store user's data in Azure table
+        stored = await store_user_data(user_id, google_creds)
+        if stored:
+            print("User data stored successfully.")
         else:
-            return f"""
-                <html>
-                <body style='font-family: sans-serif;'>
-                    <p>Authentication failed.</p>
-                    <p>Invalid State. Please contact an admin if the issue persists.</p>
-                </body>
-                </html>
-            """
+            print("There was an issue storing the user data.")
+
+        return f"""
+            <html>
+            <body style='font-family: sans-serif;'>
+                <h2>✅ Setup complete!</h2>
+                <p>Customer ID saved. You can now return to the app and continue.</p>
+            </body>
+            </html>
+        """
+
+    # Otherwise, show form to enter customer ID
+    return await render_template_string("""
+        <html>
+        <body style='font-family: sans-serif;'>
+            <h2>Google Ads Authentication Successful!</h2>
+            <p>Please enter your Google Ads Customer ID to complete setup:</p>
+            <form method="post">
+                <input type="text" name="customer_id" placeholder="123-456-7890" required>
+                <button type="submit">Submit</button>
+            </form>
+        </body>
+        </html>
+    """)
@@ -0,0 +1,24 @@
+import asyncio
+import os
+from types import SimpleNamespace
+
+os.environ.setdefault("APP_URL", "http://localhost")
+
+import server  # noqa: E402
+
+
+def test_failed_admission_releases_the_hold(monkeypatch):
+    async def get_user_data(user_id):
+        raise ConnectionError("table storage unavailable")
+
+    monkeypatch.setattr(server, "get_user_data", get_user_data)
+    monkeypatch.setattr(server, "user_agents", server.SessionStore(on_evict=lambda user_id, session: None))
+    memory = SimpleNamespace(session_id="s1")
+    server.user_agents["a"] = (object(), SimpleNamespace(), memory, {}, 0)
+
+    async def run():
+        response = await server.app.test_client().post("/prompt", json={"prompt": "Hi", "user_id": "a"})
+        assert response.status_code == 500
+
+    asyncio.run(run())
+    assert not server.user_agents._held